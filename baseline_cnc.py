@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — BASELINE STORICA (PUNTEGGI ASSOLUTI)   ║
+║                                                                      ║
+║  Distribuzioni di riferimento (percentili) di ogni driver, calcolate ║
+║  su un corpus storico e salvate in un piccolo file JSON: ogni sheet  ║
+║  può essere valutato da solo, senza attendere gli altri gruppi.      ║
+║                                                                      ║
+║  Uso:  python baseline_cnc.py  build  --baseline b.json <pdf/cart.>  ║
+║        python baseline_cnc.py  update --baseline b.json <pdf/cart.>  ║
+║        python baseline_cnc.py  show   --baseline b.json              ║
+║        python baseline_cnc.py  score  --baseline b.json  sheet.pdf   ║
+╚══════════════════════════════════════════════════════════════════════╝
+
+Usata anche da benchmark_cnc.py e multi_benchmark_cnc.py con --baseline.
+"""
+
+import argparse
+import bisect
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BASELINE_VERSION = 1
+
+# Punti per driver: fino a MAX_POINTS sheet la distribuzione è esatta,
+# oltre viene ricampionata in MAX_POINTS quantili pesati.
+MAX_POINTS = 101
+
+# Direzione di ogni driver: True = minore è meglio, False = maggiore è meglio,
+# None = driver già assoluto (0–100), valutato senza baseline
+DRIVER_DIRECTIONS = {
+    'Tempo ciclo complessivo': True,
+    'Tempo medio per operazione': True,
+    'N° utensili univoci': True,
+    'N° cambi utensile': True,
+    'Efficienza sequenza utensili': None,
+    'Score vita utile (non lineare)': None,
+    'Concentrazione utensile più impiegato': True,
+    'Penalità superamento vita (−50pt/utensile)': None,
+    'Rapporto taglio / (taglio + rapido)': False,
+    'Distanza complessiva': True,
+    'N° operazioni totali': True,
+    'Rapporto operazioni / utensile': True,
+    'Feedrate medio ponderato': False,
+    'Produttività [mm taglio / min ciclo]': False,
+}
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. DISTRIBUZIONI DI RIFERIMENTO
+# ═══════════════════════════════════════════════════════════════════
+
+def driver_values(m: dict) -> dict:
+    """Valori grezzi dei driver relativi di uno sheet (metriche di compute_metrics())."""
+    return {
+        'Tempo ciclo complessivo': m['total_time'],
+        'Tempo medio per operazione': m['total_time'] / m['n_ops'] if m['n_ops'] else 0,
+        'N° utensili univoci': m['n_products'],
+        'N° cambi utensile': m['tc_total'],
+        'Concentrazione utensile più impiegato': m['max_tool_pct_cycle'],
+        'Rapporto taglio / (taglio + rapido)': m['cut_ratio'],
+        'Distanza complessiva': m['total_cut'] + m['total_rapid'],
+        'N° operazioni totali': m['n_ops'],
+        'Rapporto operazioni / utensile': m['ops_per_tool'],
+        'Feedrate medio ponderato': m['weighted_feed'],
+        'Produttività [mm taglio / min ciclo]': m['productivity'],
+    }
+
+
+def new_baseline() -> dict:
+    return {
+        'version': BASELINE_VERSION,
+        'updated_at': None,
+        'n_sheets': 0,
+        'sheets': [],
+        'drivers': {name: {'n': 0, 'points': []}
+                    for name, lower in DRIVER_DIRECTIONS.items() if lower is not None},
+    }
+
+
+def merge_points(points: list, n: int, values: list):
+    """
+    Aggiunge nuovi valori a una distribuzione (punti ordinati che rappresentano n
+    osservazioni ciascuno con peso n/len(points)). Restituisce (punti, n).
+    """
+    total = n + len(values)
+    if total <= MAX_POINTS and n == len(points):
+        return sorted(points + values), total
+    w = n / len(points) if points else 0
+    weighted = sorted([(v, w) for v in points] + [(v, 1.0) for v in values])
+    out, cum, k = [], 0.0, 0
+    for v, wt in weighted:
+        cum += wt
+        # Quantili a metà di ciascuna delle MAX_POINTS fasce di uguale peso
+        while k < MAX_POINTS and (k + 0.5) * total / MAX_POINTS <= cum:
+            out.append(v)
+            k += 1
+    out.extend([weighted[-1][0]] * (MAX_POINTS - len(out)))
+    return out, total
+
+
+def update_baseline(baseline: dict, metrics_list: list, sheet_ids: list) -> int:
+    """
+    Aggiorna la baseline in modo incrementale con le metriche di nuovi sheet.
+    Gli sheet già inclusi (stesso id, prefisso dello SHA-256) vengono ignorati.
+    Restituisce il numero di sheet aggiunti.
+    """
+    known = set(baseline['sheets'])
+    new = [(m, sid) for m, sid in zip(metrics_list, sheet_ids) if sid not in known]
+    if not new:
+        return 0
+    values = [driver_values(m) for m, _ in new]
+    for name, entry in baseline['drivers'].items():
+        entry['points'], entry['n'] = merge_points(entry['points'], entry['n'], [v[name] for v in values])
+    baseline['sheets'].extend(sid for _, sid in new)
+    baseline['n_sheets'] += len(new)
+    baseline['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    return len(new)
+
+
+def load_baseline(path: str) -> dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Errore: baseline non leggibile: {path} ({e})")
+    if baseline.get('version') != BASELINE_VERSION:
+        sys.exit(f"Errore: versione della baseline non supportata: {path}")
+    return baseline
+
+
+def save_baseline(baseline: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def sheet_id(parsed: dict) -> str:
+    """Identificativo compatto di uno sheet: primi 16 caratteri dello SHA-256 del PDF."""
+    from warehouse_cnc import file_sha256
+    return file_sha256(parsed)[:16]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. SCORING ASSOLUTO
+# ═══════════════════════════════════════════════════════════════════
+
+def baseline_score(baseline: dict, driver: str, value: float, score: float) -> float:
+    """
+    Punteggio assoluto di un valore: percentile rispetto alla distribuzione storica
+    del driver (100 = migliore di tutto lo storico). I driver già assoluti e quelli
+    assenti dalla baseline mantengono il punteggio `score` ricevuto.
+    """
+    lower = DRIVER_DIRECTIONS.get(driver)
+    entry = baseline['drivers'].get(driver)
+    if lower is None or not entry or not entry['points']:
+        return score
+    points = entry['points']
+    # Rango medio tra i valori uguali: posizione del valore nella distribuzione
+    rank = (bisect.bisect_left(points, value) + bisect.bisect_right(points, value)) / 2
+    pct = rank / len(points)
+    return round((1 - pct) * 100 if lower else pct * 100, 1)
+
+
+def quantile(points: list, q: float) -> float:
+    return points[min(len(points) - 1, int(q * len(points)))]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def collect_metrics(args) -> tuple:
+    """(metrics_list, sheet_ids) dai PDF indicati o dall'archivio --from-db."""
+    from multi_benchmark_cnc import collect_pdfs, parse_pdf, compute_metrics, pdf_data, PageTextCache
+
+    tool_life_s = args.tool_life * 60
+    metrics_list, ids = [], []
+    if args.from_db:
+        from warehouse_cnc import connect, load_parsed
+        conn = connect(args.from_db)
+        try:
+            for (file_id,) in conn.execute("SELECT id FROM files ORDER BY id").fetchall():
+                parsed = load_parsed(conn, file_id)
+                m = compute_metrics(parsed, tool_life_s)
+                if m is not None:
+                    metrics_list.append(m)
+                    ids.append(parsed['sha256'][:16])
+        finally:
+            conn.close()
+    page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+    for pdf in collect_pdfs(args.inputs) if args.inputs else []:
+        print(f"  Parsing {pdf.name} ...")
+        parsed = parse_pdf(str(pdf), data=pdf_data(pdf), page_cache=page_cache)
+        m = compute_metrics(parsed, tool_life_s)
+        if m is not None:
+            metrics_list.append(m)
+            ids.append(sheet_id(parsed))
+    return metrics_list, ids
+
+
+def cmd_build(args):
+    if not args.inputs and not args.from_db:
+        sys.exit("Errore: indicare PDF, archivi o cartelle, oppure --from-db")
+    if args.command == 'update':
+        if not Path(args.baseline).exists():
+            sys.exit(f"Errore: baseline non trovata: {args.baseline} (usa 'build' per crearla)")
+        baseline = load_baseline(args.baseline)
+    else:
+        baseline = new_baseline()
+    metrics_list, ids = collect_metrics(args)
+    added = update_baseline(baseline, metrics_list, ids)
+    save_baseline(baseline, args.baseline)
+    print(f"\n  ✓ Baseline {args.baseline}: {added} sheet aggiunti, "
+          f"{len(ids) - added} già presenti, {baseline['n_sheets']} in totale\n")
+
+
+def cmd_show(args):
+    baseline = load_baseline(args.baseline)
+    print(f"\n  Baseline {args.baseline}: {baseline['n_sheets']} sheet, aggiornata {baseline['updated_at']}")
+    print(f"\n  {'DRIVER':<42} {'Dir.':>5} {'P10':>10} {'P25':>10} {'P50':>10} {'P75':>10} {'P90':>10}")
+    print(f"  {'─' * 42} {'─' * 5} {'─' * 10} {'─' * 10} {'─' * 10} {'─' * 10} {'─' * 10}")
+    for name, entry in baseline['drivers'].items():
+        if not entry['points']:
+            continue
+        direction = '↓' if DRIVER_DIRECTIONS[name] else '↑'
+        print(f"  {name:<42} {direction:>5}", end="")
+        for q in (0.10, 0.25, 0.50, 0.75, 0.90):
+            print(f" {quantile(entry['points'], q):>10.4g}", end="")
+        print()
+    print()
+
+
+def cmd_score(args):
+    from multi_benchmark_cnc import parse_pdf, compute_metrics, compute_all_scores, CATEGORY_WEIGHTS, apply_baseline
+
+    baseline = load_baseline(args.baseline)
+    for pdf in args.pdfs:
+        parsed = parse_pdf(pdf)
+        m = compute_metrics(parsed, args.tool_life * 60)
+        if m is None:
+            continue
+        drivers, cat_scores, totals = apply_baseline(compute_all_scores([m])[0], baseline)
+        print(f"\n  {m['group']}  ({Path(pdf).name}) — punteggio assoluto {totals[0]:.1f} / 100 "
+              f"su {baseline['n_sheets']} sheet storici")
+        print(f"  {'─' * 72}")
+        for cat, weight in CATEGORY_WEIGHTS.items():
+            print(f"  ▸ {cat} ({weight * 100:.0f}%): {cat_scores[0][cat]:.1f}")
+            for dcat, name, raws, scores, displays in drivers:
+                if dcat == cat:
+                    print(f"      {name:<44} {displays[0]:>16}  {scores[0]:>6.1f}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Baseline storica per punteggi assoluti",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python baseline_cnc.py build  --baseline baseline.json CASO_A/ CASO_B/B_OPERATION_SHEET/
+  python baseline_cnc.py update --baseline baseline.json --from-db results.sqlite
+  python baseline_cnc.py show   --baseline baseline.json
+  python baseline_cnc.py score  --baseline baseline.json NC02_SHEET.pdf
+  python multi_benchmark_cnc.py ./pdf_folder/ --baseline baseline.json --update-baseline
+        """)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help='Crea una nuova baseline da PDF o da un archivio --db')
+    p_update = sub.add_parser('update', help='Aggiunge nuovi sheet a una baseline esistente')
+    p_show = sub.add_parser('show', help='Percentili di riferimento di ogni driver')
+    p_score = sub.add_parser('score', help='Punteggio assoluto di singoli sheet')
+    for p in (p_build, p_update, p_show, p_score):
+        p.add_argument('--baseline', required=True, help='File JSON della baseline')
+    for p in (p_build, p_update):
+        p.add_argument('inputs', nargs='*', help='File PDF, archivi zip/tar e/o cartelle')
+        p.add_argument('--from-db', help='Usa i PDF archiviati da multi_benchmark_cnc.py --db')
+        p.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+    for p in (p_build, p_update, p_score):
+        p.add_argument('--tool-life', type=int, default=20,
+                       help='Soglia vita utile utensile in minuti (default: 20)')
+    p_score.add_argument('pdfs', nargs='+', help='PDF da valutare')
+
+    args = parser.parse_args()
+    if args.command in ('show', 'score') and not Path(args.baseline).exists():
+        sys.exit(f"Errore: baseline non trovata: {args.baseline}")
+    {'build': cmd_build, 'update': cmd_build, 'show': cmd_show, 'score': cmd_score}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
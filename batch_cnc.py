@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║          CNC OPERATION SHEET — BATCH MULTI-CASO DA MANIFEST          ║
+║                                                                      ║
+║  Più classifiche (casi) in una sola invocazione: il manifest JSON    ║
+║  elenca per ogni caso cartelle/PDF, soglia vita utile, profilo       ║
+║  macchina, librerie utensili e file di uscita. Tutti i PDF passano   ║
+║  per un unico pool di worker e un'unica cache delle pagine; un PDF   ║
+║  presente in più casi viene parsato una volta sola.                  ║
+║                                                                      ║
+║  Uso:  python batch_cnc.py  <manifest.json>  [opzioni]               ║
+║                                                                      ║
+║  Opzioni:                                                            ║
+║    --jobs N         Processi worker condivisi (sovrascrive manifest) ║
+║    --page-cache F   Cache SQLite del testo delle pagine              ║
+║    --only NOME      Esegue solo i casi indicati (ripetibile)         ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+from pathlib import Path
+
+# Chiavi ammesse: una chiave sconosciuta è quasi sempre un refuso nel manifest
+TOP_KEYS = {'jobs', 'page_cache', 'low_memory', 'timeout', 'max_rss', 'tool_life', 'cases'}
+CASE_KEYS = {'name', 'inputs', 'tool_life', 'machine', 'tc_optimum', 'library', 'pockets',
+             'report', 'xlsx', 'html', 'jsonl', 'db'}
+PATH_KEYS = ('report', 'xlsx', 'html', 'jsonl', 'db')
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. MANIFEST
+# ═══════════════════════════════════════════════════════════════════
+
+def load_manifest(path: str) -> dict:
+    """
+    Legge e valida il manifest. I percorsi relativi (inputs, library, file di
+    uscita, page_cache) sono risolti rispetto alla cartella del manifest; la
+    soglia vita utile del caso, se assente, è quella generale (default 20 min).
+    """
+    base = Path(path).resolve().parent
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('cases'), list) or not manifest['cases']:
+        raise ValueError("il manifest deve contenere una lista 'cases' non vuota")
+    unknown = set(manifest) - TOP_KEYS
+    if unknown:
+        raise ValueError(f"chiavi sconosciute nel manifest: {', '.join(sorted(unknown))}")
+    jobs = manifest.get('jobs', 1)
+    if isinstance(jobs, bool) or not isinstance(jobs, int) or jobs < 1:
+        raise ValueError(f"'jobs' deve essere un intero positivo, non {jobs!r}")
+
+    def resolve(p):
+        return str(p) if Path(p).is_absolute() else str(base / p)
+
+    names = set()
+    for k, case in enumerate(manifest['cases'], 1):
+        unknown = set(case) - CASE_KEYS
+        if unknown:
+            raise ValueError(f"caso {k}: chiavi sconosciute: {', '.join(sorted(unknown))}")
+        if not case.get('inputs'):
+            raise ValueError(f"caso {k}: 'inputs' mancante")
+        case.setdefault('name', Path(case['inputs'][0]).name)
+        if case['name'] in names:
+            raise ValueError(f"caso '{case['name']}' ripetuto")
+        names.add(case['name'])
+        case['inputs'] = [resolve(p) for p in case['inputs']]
+        case['library'] = [resolve(p) for p in case.get('library', [])]
+        case.setdefault('tool_life', manifest.get('tool_life', 20))
+        for key in PATH_KEYS:
+            if case.get(key):
+                case[key] = resolve(case[key])
+    if manifest.get('page_cache'):
+        manifest['page_cache'] = resolve(manifest['page_cache'])
+    return manifest
+
+
+def share_key(pdf):
+    """Identità di un PDF tra i casi: percorso risolto, o SHA-256 per i membri di un archivio."""
+    from multi_benchmark_cnc import ArchiveMember
+    return ('sha256', pdf.sha256) if isinstance(pdf, ArchiveMember) else ('path', pdf.resolve())
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. PARSING CONDIVISO
+# ═══════════════════════════════════════════════════════════════════
+
+def run_batch(manifest: dict):
+    """
+    Raccoglie i PDF di tutti i casi, li parsa una volta sola sullo stesso pool
+    e calcola le metriche di ogni caso appena il PDF è pronto. Restituisce i
+    casi con 'slots' = [(parsed, metriche)] nell'ordine di input del caso.
+    """
+    from multi_benchmark_cnc import (collect_pdfs, parse_pdf, pdf_data, compute_metrics, ingest_pdfs,
+                                     IsolatedParser, PageTextCache, JsonlWriter, parse_notes)
+
+    cases = manifest['cases']
+    unique, users = [], {}
+    for c, case in enumerate(cases):
+        case['pdfs'] = collect_pdfs(case['inputs'])
+        case['slots'] = [None] * len(case['pdfs'])
+        case['skipped'] = []
+        for i, pdf in enumerate(case['pdfs']):
+            key = share_key(pdf)
+            if key not in users:
+                users[key] = []
+                unique.append(pdf)
+            users[key].append((c, i))
+        print(f"  Caso {case['name']}: {len(case['pdfs'])} PDF")
+        if case.get('machine'):
+            from kinematics_cnc import load_profile
+            case['profile'] = load_profile(case['machine'])
+        if case.get('jsonl'):
+            Path(case['jsonl']).parent.mkdir(parents=True, exist_ok=True)
+            case['writer'] = JsonlWriter(open(case['jsonl'], 'w', encoding='utf-8'))
+    total = sum(len(case['pdfs']) for case in cases)
+    print(f"\n  PDF distinti da parsare: {len(unique)} su {total} ({total - len(unique)} condivisi tra casi)\n")
+
+    def on_parsed(u, pdf_path, parsed):
+        n_ops = sum(len(s['operations']) for s in parsed['setups'])
+        print(f"  → {pdf_path.name}: {n_ops} operazioni{parse_notes(parsed, manifest.get('page_cache'))}")
+        # Minimo cambi utensile: dipende solo dallo sheet, calcolato una volta per PDF condiviso
+        optimum = None
+        if n_ops and any(cases[c].get('tc_optimum') for c, _ in users[share_key(pdf_path)]):
+            from sequencing_cnc import tc_optimum
+            optimum = tc_optimum(parsed)
+            if not optimum[1]:
+                print(f"    ⚠ {pdf_path.name}: sequenza ottima non garantita (ricerca interrotta), driver 'Efficienza sequenza utensili' omesso")
+        for c, i in users[share_key(pdf_path)]:
+            case = cases[c]
+            sheet = parsed
+            if case.get('profile'):
+                from kinematics_cnc import retime_parsed
+                sheet = retime_parsed(parsed, case['profile'])
+            m = compute_metrics(sheet, case['tool_life'] * 60)
+            if case.get('tc_optimum') and m is not None:
+                m['tc_optimal'], m['tc_optimal_exact'] = optimum
+            case['slots'][i] = (parsed, m)
+            if case.get('writer'):
+                case['writer'].file(i, case['pdfs'][i], parsed, m)
+
+    def on_skipped(u, pdf_path, reason):
+        print(f"  ⚠ Saltato: {pdf_path.name} — {reason}")
+        for c, i in users[share_key(pdf_path)]:
+            cases[c]['skipped'].append((pdf_path, reason))
+            if cases[c].get('writer'):
+                cases[c]['writer'].write('skipped', index=i, path=str(pdf_path), reason=reason)
+
+    jobs = manifest.get('jobs', 1)
+    page_cache_path = manifest.get('page_cache')
+    low_memory = manifest.get('low_memory', False)
+    if manifest.get('timeout') or manifest.get('max_rss'):
+        isolated = IsolatedParser(jobs, manifest.get('timeout'), manifest.get('max_rss'), page_cache_path, low_memory)
+        isolated.run(unique, on_parsed, on_skipped)
+    elif jobs > 1:
+        ingest_pdfs(unique, on_parsed, workers=jobs, prefetch=2 * jobs,
+                    page_cache_path=page_cache_path, low_memory=low_memory)
+    else:
+        page_cache = PageTextCache(page_cache_path) if page_cache_path else None
+        for u, pdf in enumerate(unique):
+            on_parsed(u, pdf, parse_pdf(str(pdf), data=pdf_data(pdf), page_cache=page_cache, low_memory=low_memory))
+    return cases
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. CLASSIFICHE E USCITE
+# ═══════════════════════════════════════════════════════════════════
+
+def rank_case(case: dict, argv: list = None) -> dict:
+    """Classifica di un caso e relative uscite (report, xlsx, html, jsonl, db, magazzino)."""
+    from multi_benchmark_cnc import (compute_all_scores, dedupe_group_names, print_multi_report,
+                                     export_multi_xlsx)
+    valid = [slot for slot in case['slots'] if slot is not None and slot[1] is not None]
+    parsed_list = [p for p, _ in valid]
+    metrics_list = [m for _, m in valid]
+    if len(metrics_list) < 2:
+        print(f"  ⚠ Caso {case['name']}: servono almeno 2 gruppi validi, trovati {len(metrics_list)} — saltato")
+        if case.get('writer'):
+            case['writer'].write('end', n_files=len(case['pdfs']), n_ranked=0,
+                                 n_skipped=len(case['skipped']))
+            case['writer'].stream.close()
+        return {'name': case['name'], 'n': len(metrics_list), 'winner': None, 'total': None}
+    dedupe_group_names(metrics_list)
+    drivers, cat_scores, totals = compute_all_scores(metrics_list)
+    library = None
+    if case['library']:
+        from magazine_cnc import load_libraries
+        library = load_libraries(case['library'])
+    if case.get('writer'):
+        case['writer'].scores(metrics_list, [p['path'] for p in parsed_list], drivers, cat_scores, totals)
+        case['writer'].write('end', n_files=len(case['pdfs']), n_ranked=len(metrics_list),
+                             n_skipped=len(case['skipped']))
+        case['writer'].stream.close()
+
+    # Report console del caso: su stdout o nel file 'report'
+    if case.get('report'):
+        Path(case['report']).parent.mkdir(parents=True, exist_ok=True)
+        out = open(case['report'], 'w', encoding='utf-8')
+    else:
+        out = contextlib.nullcontext(sys.stdout)
+    with out as stream, contextlib.redirect_stdout(stream):
+        print(f"\n  ═══ CASO: {case['name']} ═══")
+        print_multi_report(metrics_list, drivers, cat_scores, totals)
+        if case.get('pockets'):
+            from magazine_cnc import build_groups, solve_magazine, print_magazine
+            groups = build_groups(metrics_list, totals)
+            print_magazine(groups, solve_magazine(groups, case['pockets']), case['pockets'], library or {})
+    if case.get('report'):
+        print(f"  ✓ Report del caso {case['name']} salvato in: {case['report']}")
+
+    for key in ('xlsx', 'html'):
+        if case.get(key):
+            Path(case[key]).parent.mkdir(parents=True, exist_ok=True)
+    if case.get('xlsx'):
+        export_multi_xlsx(metrics_list, drivers, cat_scores, totals, case['xlsx'])
+    if case.get('html'):
+        from report_html_cnc import export_html
+        size = export_html(metrics_list, drivers, cat_scores, totals, case['html'], f"Vendor Rating — {case['name']}")
+        print(f"  ✓ Report HTML ({size / 1024:.0f} KB) salvato in: {case['html']}")
+    if case.get('db'):
+        from warehouse_cnc import save_run
+        run_id = save_run(case['db'], case['name'], case['tool_life'] * 60, parsed_list, metrics_list,
+                          drivers, cat_scores, totals, argv=argv,
+                          machine=case['profile']['name'] if case.get('profile') else None,
+                          libraries=library)
+        print(f"  ✓ Run #{run_id} ({case['name']}) archiviato in: {case['db']}")
+
+    best = max(range(len(totals)), key=lambda i: totals[i])
+    return {'name': case['name'], 'n': len(metrics_list), 'winner': metrics_list[best]['group'],
+            'total': totals[best]}
+
+
+def print_summary(summary: list, elapsed: float):
+    W = 72
+    print("\n" + "═" * W)
+    print(f"{'RIEPILOGO BATCH':^{W}}")
+    print("═" * W)
+    print(f"  {'Caso':<32} {'Gruppi':>6}  {'1° classificato':<18} {'Punti':>7}")
+    print(f"  {'─' * 32} {'─' * 6}  {'─' * 18} {'─' * 7}")
+    for row in summary:
+        if row['winner'] is None:
+            print(f"  {row['name'][:32]:<32} {row['n']:>6}  {'—':<18} {'—':>7}")
+        else:
+            print(f"  {row['name'][:32]:<32} {row['n']:>6}  {row['winner'][:18]:<18} {row['total']:>7.1f}")
+    print(f"\n  {len(summary)} {'caso' if len(summary) == 1 else 'casi'} in {elapsed:.1f} s")
+    print("═" * W + "\n")
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Batch multi-caso da manifest, con pool e cache condivisi",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python batch_cnc.py batch_casi.json
+  python batch_cnc.py batch_casi.json --jobs 4 --page-cache pagine.sqlite
+  python batch_cnc.py batch_casi.json --only A_OPERATION_SHEET --only B_OPERATION_SHEET
+
+Manifest (JSON):
+  {"jobs": 4, "page_cache": "pagine.sqlite", "tool_life": 20,
+   "cases": [{"name": "A_GRUPPI", "inputs": ["CASO_A/A_GRUPPI_SELEZIONATI"],
+              "library": ["CASO_A/A_LIBRERIE_UTENSILI"], "pockets": 30,
+              "html": "risultati/a_gruppi.html", "report": "risultati/a_gruppi.txt"}]}
+        """)
+    parser.add_argument('manifest', help='File JSON con l\'elenco dei casi')
+    parser.add_argument('--jobs', type=int, default=None, help='Processi worker condivisi da tutti i casi')
+    parser.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine, condivisa')
+    parser.add_argument('--only', action='append', default=[], help='Esegue solo il caso indicato (ripetibile)')
+
+    args = parser.parse_args()
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Errore nel manifest: {e}")
+    if args.jobs is not None:
+        if args.jobs < 1:
+            sys.exit("Errore: --jobs deve essere un intero positivo")
+        manifest['jobs'] = args.jobs
+    if args.page_cache:
+        manifest['page_cache'] = args.page_cache
+    if args.only:
+        missing = set(args.only) - {c['name'] for c in manifest['cases']}
+        if missing:
+            sys.exit(f"Errore: casi non presenti nel manifest: {', '.join(sorted(missing))}")
+        manifest['cases'] = [c for c in manifest['cases'] if c['name'] in args.only]
+
+    t0 = time.perf_counter()
+    try:
+        cases = run_batch(manifest)
+    except ValueError as e:
+        sys.exit(f"Errore: {e}")
+    summary = [rank_case(case, argv=sys.argv[1:]) for case in cases]
+    print_summary(summary, time.perf_counter() - t0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║           CNC OPERATION SHEET — BENCHMARK DELLE PRESTAZIONI          ║
+║                                                                      ║
+║  Misure ripetibili dei tempi della suite, con soglie (budget) che    ║
+║  fanno fallire il comando se superate: utile prima di un merge.      ║
+║                                                                      ║
+║  Uso:  python bench_cnc.py  startup  [--runs N] [--budget-ms MS]     ║
+║        python bench_cnc.py  scaling  [--sizes 1000,10000]            ║
+║        python bench_cnc.py  golden   [--update] [--engine mod:fn]    ║
+║        python bench_cnc.py  align    [--sizes 500,2000] [--budget-s] ║
+║        python bench_cnc.py  sequencing  [--sizes 100,150] [--setups] ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+# Moduli pesanti che non devono essere importati all'avvio degli script
+HEAVY_MODULES = ('pdfplumber', 'pdfminer', 'PIL', 'pypdfium2', 'openpyxl', 'asyncio')
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. AVVIO DEGLI SCRIPT
+# ═══════════════════════════════════════════════════════════════════
+
+def startup_commands() -> list:
+    """(etichetta, comando, soggetto a budget)"""
+    py = sys.executable
+    return [
+        ("python -c pass (riferimento)", [py, "-c", "pass"], False),
+        ("benchmark_cnc.py --help", [py, str(HERE / "benchmark_cnc.py"), "--help"], True),
+        ("multi_benchmark_cnc.py --help", [py, str(HERE / "multi_benchmark_cnc.py"), "--help"], True),
+        ("multi_benchmark_cnc.py (argomenti mancanti)", [py, str(HERE / "multi_benchmark_cnc.py")], True),
+    ]
+
+
+def time_command(cmd: list, runs: int) -> list:
+    """Tempi di esecuzione (secondi) di `runs` lanci del comando, dopo un lancio di riscaldamento."""
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def heavy_imports(module: str) -> list:
+    """Moduli pesanti già caricati subito dopo `import <module>`."""
+    code = (f"import sys; sys.path.insert(0, {str(HERE)!r}); import {module}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def bench_startup(runs: int, budget_ms: float) -> bool:
+    W = 88
+    print("\n" + "═" * W)
+    print(f"{'BENCHMARK — AVVIO DEGLI SCRIPT':^{W}}")
+    print(f"mediana su {runs} lanci, budget {budget_ms:.0f} ms".center(W))
+    print("═" * W)
+
+    ok = True
+    print(f"\n  {'COMANDO':<46} {'Mediana':>9}  {'Min':>9}  {'Esito':>8}")
+    print(f"  {'─' * 46} {'─' * 9}  {'─' * 9}  {'─' * 8}")
+    for label, cmd, budgeted in startup_commands():
+        times = time_command(cmd, runs)
+        med, best = statistics.median(times) * 1000, min(times) * 1000
+        if budgeted:
+            passed = med <= budget_ms
+            ok &= passed
+            verdict = "OK" if passed else "SUPERATO"
+        else:
+            verdict = "—"
+        print(f"  {label:<46} {med:>6.1f} ms  {best:>6.1f} ms  {verdict:>8}")
+
+    print(f"\n  {'IMPORT DIFFERITI':<46} {'Moduli pesanti caricati':>30}")
+    print(f"  {'─' * 46} {'─' * 30}")
+    for module in ("benchmark_cnc", "multi_benchmark_cnc"):
+        loaded = heavy_imports(module)
+        ok &= not loaded
+        print(f"  {'import ' + module:<46} {', '.join(loaded) or 'nessuno (OK)':>30}")
+
+    print("═" * W + "\n")
+    return ok
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. SCALABILITÀ DELLO SPLITTER SETUP/OPERAZIONI
+# ═══════════════════════════════════════════════════════════════════
+
+OP_TEMPLATE = """Operation {i}/{n} T{t} D{t} L{t}
+Description: Roughing{i}
+Strategy: Adaptive
+WCS: #0
+Tolerance: 0.1mm
+Stock to Leave: 0.2mm/0.1mm
+Maximum Stepdown: 2mm
+Maximum Spindle Speed: 8000rpm
+Maximum Feedrate: 1500mm/min
+Cutting Distance: {cut}mm
+Rapid Distance: {rapid}mm
+Estimated Cycle Time: 1m:{sec:02d}s (1.2%)
+Type: flat end mill
+Diameter: 10mm
+Length: 72mm
+Flutes: 4
+Description: Fresa a candela integrale in metallo duro, tagliente lungo
+Product: VQ4SVBR{t:05d}
+Notes:
+This roughing operation may lead to collisions with the shaft or holder, due to a known limitation.
+"""
+
+
+def synthetic_sheet(n_ops: int, n_setups: int = 2) -> str:
+    """Testo estratto sintetico di uno sheet con n_ops operazioni (struttura Fusion 360)."""
+    parts = []
+    per_setup = n_ops // n_setups
+    for s in range(n_setups):
+        parts.append(f"Setup Sheet for Program {1001 + s}\nDocument Path: SYNTH v1\n"
+                     f"Number Of Operations: {per_setup}\nNumber Of Tools: 12\n"
+                     f"Estimated Cycle Time: 1h:10m:00s\n")
+        for i in range(1, per_setup + 1):
+            parts.append(OP_TEMPLATE.format(i=i, n=per_setup, t=i % 12 + 1, cut=100 + i * 1.5,
+                                            rapid=20 + i * 0.5, sec=i % 60))
+    return "".join(parts)
+
+
+def split_reference(text: str) -> list:
+    """Splitter originale a regex con lookahead, usato come riferimento."""
+    out = []
+    blocks = re.split(r'(?=Setup Sheet for Program \d+)', text)
+    for b in [b for b in blocks if b.strip() and 'Setup Sheet for Program' in b]:
+        out.append(re.findall(r'(Operation\s+(\d+)/(\d+)\s+(T\d+)\s+D\d+\s+L\d+.*?)(?=Operation\s+\d+/\d+|$)',
+                              b, re.DOTALL))
+    return out
+
+
+def split_current(text: str) -> list:
+    from multi_benchmark_cnc import split_setup_blocks, split_operations
+    return [split_operations(b) for b in split_setup_blocks(text)]
+
+
+def best_time(fn, arg, runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_scaling(sizes: list, runs: int, tolerance: float) -> bool:
+    W = 88
+    print("\n" + "═" * W)
+    print(f"{'BENCHMARK — SCALABILITÀ SPLITTER SETUP/OPERAZIONI':^{W}}")
+    print(f"sheet sintetici, miglior tempo su {runs} ripetizioni".center(W))
+    print("═" * W)
+
+    print(f"\n  {'Operazioni':>10}  {'Testo':>9}  {'Regex (rif.)':>13}  {'Splitter':>11}  {'µs/op':>7}  {'Speedup':>8}  {'Esito':>6}")
+    print(f"  {'─' * 10}  {'─' * 9}  {'─' * 13}  {'─' * 11}  {'─' * 7}  {'─' * 8}  {'─' * 6}")
+    ok = True
+    per_op = []
+    for n in sizes:
+        text = synthetic_sheet(n)
+        same = split_reference(text) == split_current(text)
+        ok &= same
+        t_ref = best_time(split_reference, text, runs)
+        t_new = best_time(split_current, text, runs)
+        per_op.append(t_new / n)
+        print(f"  {n:>10}  {len(text) / 1e6:>6.1f} MB  {t_ref * 1000:>10.1f} ms  {t_new * 1000:>8.1f} ms  "
+              f"{t_new / n * 1e6:>7.2f}  {t_ref / t_new:>7.1f}x  {'OK' if same else 'DIVERSO':>6}")
+
+    # Linearità: il costo per operazione non deve crescere con la dimensione
+    growth = per_op[-1] / per_op[0]
+    linear = growth <= tolerance
+    ok &= linear
+    print(f"\n  Crescita costo/operazione {sizes[0]} → {sizes[-1]}: {growth:.2f}x "
+          f"(tolleranza {tolerance:.1f}x) — {'lineare' if linear else 'NON lineare'}")
+    print("═" * W + "\n")
+    return ok
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. EQUIVALENZA CON GLI OUTPUT DI RIFERIMENTO (GOLDEN)
+# ═══════════════════════════════════════════════════════════════════
+
+# Versione del formato dei file golden: va incrementata se cambia la struttura
+# dei JSON (non i valori), così i file vecchi vengono riconosciuti e rifiutati
+GOLDEN_VERSION = 1
+GOLDEN_DIR = HERE / "golden"
+GOLDEN_TOOL_LIFE_S = 20 * 60
+
+
+def golden_pdfs() -> list:
+    """I PDF forniti (CASO_*/<cartella>/*.pdf), in ordine stabile."""
+    return sorted(HERE.glob("CASO_*/*/*.pdf"))
+
+
+def load_callable(spec: str):
+    """'modulo:funzione' → funzione, per sostituire parser, metriche o scoring."""
+    import importlib
+    module, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"Formato atteso modulo:funzione, trovato '{spec}'")
+    return getattr(importlib.import_module(module), name)
+
+
+def plain(obj):
+    """Forma JSON di un risultato (set → lista ordinata, tuple → lista), per confronti e snapshot."""
+    return json.loads(json.dumps(obj, ensure_ascii=False,
+                                 default=lambda v: sorted(v) if isinstance(v, (set, frozenset)) else str(v)))
+
+
+def _golden_parse(job):
+    """Parsing di un PDF con l'engine indicato; eseguibile anche in un processo worker."""
+    engine, pdf, page_cache = job
+    parse = load_callable(engine)
+    t0 = time.perf_counter()
+    if page_cache:
+        from multi_benchmark_cnc import PageTextCache
+        parsed = parse(str(pdf), page_cache=PageTextCache(page_cache))
+    else:
+        parsed = parse(str(pdf))
+    return parsed, time.perf_counter() - t0
+
+
+def golden_record(pdf: Path, parsed: dict, compute_metrics) -> dict:
+    """Snapshot di uno sheet: operazioni parsate e metriche (tutte, anche quelle pigre)."""
+    m = compute_metrics(parsed, GOLDEN_TOOL_LIFE_S)
+    if m is not None and hasattr(m, 'resolve'):
+        m = m.resolve()
+    return {
+        'version': GOLDEN_VERSION,
+        'pdf': pdf.relative_to(HERE).as_posix(),
+        'sha256': hashlib.sha256(pdf.read_bytes()).hexdigest(),
+        # Solo contenuto: path, pagine saltate e riutilizzate dipendono da engine e cache
+        'parsed': plain({'name': parsed['name'], 'setups': parsed['setups']}),
+        'metrics': plain(m),
+    }
+
+
+def golden_ranking(folder: str, pdfs: list, metrics_list: list, compute_all_scores) -> dict:
+    """Snapshot della classifica di una cartella: driver, categorie, punteggi e posizioni."""
+    from multi_benchmark_cnc import dedupe_group_names
+    dedupe_group_names(metrics_list)
+    drivers, cat_scores, totals = compute_all_scores(metrics_list)
+    order = sorted(range(len(totals)), key=lambda i: totals[i], reverse=True)
+    groups = [m['group'] for m in metrics_list]
+    # Chiavi per nome (gruppo, driver) invece che per indice: il diff resta leggibile
+    return plain({
+        'version': GOLDEN_VERSION,
+        'folder': folder,
+        'pdfs': [p.name for p in pdfs],
+        'ranking': [{'position': pos, 'group': groups[i], 'total': totals[i]}
+                    for pos, i in enumerate(order, 1)],
+        'categories': dict(zip(groups, cat_scores)),
+        'drivers': {f"{cat}: {name}": {'raw': dict(zip(groups, raws)), 'scores': dict(zip(groups, scores))}
+                    for cat, name, raws, scores, _ in drivers},
+    })
+
+
+def golden_path(golden_dir: Path, rel: str, ranking: bool = False) -> Path:
+    rel = Path(rel)
+    return golden_dir / (rel / "_ranking.json" if ranking else rel.with_suffix(".json"))
+
+
+def compare_values(expected, actual, path: str, rtol: float, atol: float, out: list):
+    """Differenze tra due strutture JSON; i numeri sono confrontati con tolleranza."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        def sub(k):
+            return f"{path}.{k}" if k.isidentifier() else f"{path}[{k!r}]"
+        for k in expected:
+            if k not in actual:
+                out.append(f"{sub(k)}: mancante")
+            else:
+                compare_values(expected[k], actual[k], sub(k), rtol, atol, out)
+        out.extend(f"{sub(k)}: in più" for k in actual if k not in expected)
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            out.append(f"{path}: {len(expected)} elementi attesi, {len(actual)} ottenuti")
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            compare_values(e, a, f"{path}[{i}]", rtol, atol, out)
+    elif (isinstance(expected, (int, float)) and isinstance(actual, (int, float))
+          and not isinstance(expected, bool) and not isinstance(actual, bool)):
+        if not math.isclose(expected, actual, rel_tol=rtol, abs_tol=atol):
+            out.append(f"{path}: atteso {expected!r}, ottenuto {actual!r} (Δ {actual - expected:+.6g})")
+    elif expected != actual:
+        out.append(f"{path}: atteso {expected!r}, ottenuto {actual!r}")
+
+
+def plural_diffs(n: int) -> str:
+    return f"{n} differenza" if n == 1 else f"{n} differenze"
+
+
+def bench_golden(golden_dir: Path, update: bool, engine: str, metrics_spec: str, scores_spec: str,
+                 rtol: float, atol: float, max_diffs: int, jobs: int, page_cache: str) -> bool:
+    compute_metrics = load_callable(metrics_spec)
+    compute_all_scores = load_callable(scores_spec)
+    pdfs = golden_pdfs()
+
+    W = 88
+    print("\n" + "═" * W)
+    print(f"{'BENCHMARK — EQUIVALENZA CON GLI OUTPUT GOLDEN':^{W}}")
+    print(f"{'aggiornamento snapshot' if update else f'rtol {rtol:g}, atol {atol:g}'} — "
+          f"parser {engine}".center(W))
+    print("═" * W)
+
+    jobs_list = [(engine, pdf, page_cache) for pdf in pdfs]
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(_golden_parse, jobs_list))
+    else:
+        results = map(_golden_parse, jobs_list)
+
+    ok = True
+    total_s = 0.0
+    folders = {}
+    print(f"\n  {'PDF':<55} {'Op.':>5}  {'Parsing':>9}  {'Esito':>12}")
+    print(f"  {'─' * 55} {'─' * 5}  {'─' * 9}  {'─' * 12}")
+    for pdf, (parsed, seconds) in zip(pdfs, results):
+        total_s += seconds
+        record = golden_record(pdf, parsed, compute_metrics)
+        target = golden_path(golden_dir, record['pdf'])
+        n_ops = sum(len(s['operations']) for s in parsed['setups'])
+        folders.setdefault(pdf.parent.relative_to(HERE).as_posix(), []).append((pdf, parsed))
+        diffs = []
+        if update:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(json.dumps(record, ensure_ascii=False, indent=1), encoding="utf-8")
+            verdict = "scritto"
+        elif not target.exists():
+            diffs, verdict = ["golden mancante: generarlo con --update"], "MANCANTE"
+        else:
+            golden = json.loads(target.read_text(encoding="utf-8"))
+            if golden.get('version') != GOLDEN_VERSION:
+                diffs = [f"formato golden v{golden.get('version')}, atteso v{GOLDEN_VERSION}: rigenerare con --update"]
+            elif golden['sha256'] != record['sha256']:
+                diffs = ["PDF modificato dopo lo snapshot: rigenerare con --update"]
+            else:
+                compare_values(golden['parsed'], record['parsed'], "parsed", rtol, atol, diffs)
+                compare_values(golden['metrics'], record['metrics'], "metrics", rtol, atol, diffs)
+            verdict = plural_diffs(len(diffs)) if diffs else "OK"
+        ok &= not diffs
+        print(f"  {record['pdf'][-55:]:<55} {n_ops:>5}  {seconds:>7.2f} s  {verdict:>12}")
+        for line in diffs[:max_diffs]:
+            print(f"      {line}")
+        if len(diffs) > max_diffs:
+            print(f"      ... altre {plural_diffs(len(diffs) - max_diffs)}")
+
+    print(f"\n  {'CLASSIFICA PER CARTELLA':<55} {'Sheet':>5}  {'':>9}  {'Esito':>12}")
+    print(f"  {'─' * 55} {'─' * 5}  {'─' * 9}  {'─' * 12}")
+    for folder, items in folders.items():
+        metrics_list = [m for m in (compute_metrics(p, GOLDEN_TOOL_LIFE_S) for _, p in items) if m is not None]
+        record = golden_ranking(folder, [pdf for pdf, _ in items], metrics_list, compute_all_scores)
+        target = golden_path(golden_dir, folder, ranking=True)
+        diffs = []
+        if update:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(json.dumps(record, ensure_ascii=False, indent=1), encoding="utf-8")
+            verdict = "scritto"
+        elif not target.exists():
+            diffs, verdict = ["golden mancante: generarlo con --update"], "MANCANTE"
+        else:
+            compare_values(json.loads(target.read_text(encoding="utf-8")), record, "ranking", rtol, atol, diffs)
+            verdict = plural_diffs(len(diffs)) if diffs else "OK"
+        ok &= not diffs
+        print(f"  {folder:<55} {len(metrics_list):>5}  {'':>9}  {verdict:>12}")
+        for line in diffs[:max_diffs]:
+            print(f"      {line}")
+        if len(diffs) > max_diffs:
+            print(f"      ... altre {plural_diffs(len(diffs) - max_diffs)}")
+
+    print(f"\n  Parsing: {len(pdfs)} PDF in {total_s:.1f} s (somma dei tempi per file)"
+          + (f" — snapshot in {golden_dir}" if update else f" — {'equivalente' if ok else 'NON equivalente'}"))
+    print("═" * W + "\n")
+    return ok
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. ALLINEAMENTO DELLE OPERAZIONI (benchmark_cnc.py --diff)
+# ═══════════════════════════════════════════════════════════════════
+
+ALIGN_STRATEGIES = ('Facing', 'Adaptive', 'Pocket', 'Contour 2D', 'Contour', 'Flat', 'Scallop', 'Drilling')
+
+
+def synthetic_ops(n_ops: int, seed: int) -> list:
+    """Setup sintetico: strategie e utensili casuali (24 T, un Product per T), riproducibile."""
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(n_ops):
+        t = rng.randrange(1, 25)
+        ops.append({'strategy': rng.choice(ALIGN_STRATEGIES), 'tool_t': f"T{t}", 'product': f"P{t:03d}"})
+    return ops
+
+
+def alignment_cost(aligned: list) -> int:
+    from benchmark_cnc import GAP_COST, PARTIAL_COST, MISMATCH_COST
+    cost = 0
+    for oa, ob in aligned:
+        if oa is None or ob is None:
+            cost += GAP_COST
+        elif (oa['strategy'], oa['tool_t'], oa['product']) != (ob['strategy'], ob['tool_t'], ob['product']):
+            same = oa['strategy'] == ob['strategy'] or oa['product'] == ob['product']
+            cost += PARTIAL_COST if same else MISMATCH_COST
+    return cost
+
+
+def bench_align(sizes: list, runs: int, budget_s: float) -> bool:
+    """
+    Due setup senza parti comuni (il caso peggiore: niente prefisso o suffisso
+    da accoppiare direttamente) allineati con align_operations(). Il costo
+    dell'allineamento deve essere quello ottimo di Needleman-Wunsch, e il tempo
+    del setup più grande deve stare nel budget.
+    """
+    from benchmark_cnc import align_operations, _op_keys, _nw_last_row
+    W = 88
+    print("\n" + "═" * W)
+    print(f"{'BENCHMARK — ALLINEAMENTO DELLE OPERAZIONI (--diff)':^{W}}")
+    print(f"setup sintetici senza parti comuni, miglior tempo su {runs} ripetizioni, budget {budget_s:g} s".center(W))
+    print("═" * W)
+
+    print(f"\n  {'Operazioni':>10}  {'Coppie':>7}  {'Costo':>7}  {'Ottimo':>7}  {'Tempo':>9}  {'ns/cella':>9}  {'Esito':>6}")
+    print(f"  {'─' * 10}  {'─' * 7}  {'─' * 7}  {'─' * 7}  {'─' * 9}  {'─' * 9}  {'─' * 6}")
+    ok = True
+    for n in sizes:
+        ops_a, ops_b = synthetic_ops(n, 1), synthetic_ops(n, 2)
+        aligned = align_operations(ops_a, ops_b)
+        cost = alignment_cost(aligned)
+        optimum = _nw_last_row(_op_keys(ops_a), _op_keys(ops_b))[-1]
+        t = best_time(lambda pair: align_operations(*pair), (ops_a, ops_b), runs)
+        good = cost == optimum and (n != sizes[-1] or t <= budget_s)
+        ok &= good
+        print(f"  {n:>10}  {len(aligned):>7}  {cost:>7}  {optimum:>7}  {t:>7.2f} s  {t / (n * n) * 1e9:>9.0f}  "
+              f"{'OK' if good else 'NO':>6}")
+
+    print(f"\n  Tempo O(n·m), memoria O(n + m): {'entro il budget' if ok else 'FUORI BUDGET o non ottimo'}")
+    print("═" * W + "\n")
+    return ok
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 5. SEQUENZA CON MINIMO CAMBI UTENSILE (--tc-optimum)
+# ═══════════════════════════════════════════════════════════════════
+
+def synthetic_setup(n_ops: int, seed: int, phased: bool) -> list:
+    """
+    Setup sintetico per sequencing_cnc: strategie casuali (anche senza fase) su 24 T;
+    con phased le operazioni sono ordinate per fase come negli sheet reali.
+    """
+    from sequencing_cnc import PHASES
+    rng = random.Random(seed)
+    strategies = sorted(PHASES) + ['Unknown']
+    ops = [{'strategy': rng.choice(strategies), 'tool_t': f"T{rng.randrange(1, 25)}"} for _ in range(n_ops)]
+    if phased:
+        rank = {'sfacciatura': 0, 'sgrossatura': 1, 'finitura': 2, 'foratura': 3, None: 2}
+        ops.sort(key=lambda o: rank[PHASES.get(o['strategy'])])
+    return ops
+
+
+def bench_sequencing(sizes: list, setups: int, budget_s: float) -> bool:
+    """
+    min_tool_changes() su setup sintetici casuali e ordinati per fase. Ogni ordine
+    restituito deve rispettare le precedenze e avere i cambi dichiarati, i setup
+    ordinati per fase devono essere risolti esattamente e nessun setup deve
+    superare il budget.
+    """
+    from sequencing_cnc import min_tool_changes, precedence_masks, count_tool_changes
+    W = 88
+    print("\n" + "═" * W)
+    print(f"{'BENCHMARK — SEQUENZA CON MINIMO CAMBI UTENSILE (--tc-optimum)':^{W}}")
+    print(f"{setups} setup sintetici per riga, 24 utensili, budget {budget_s:g} s per setup".center(W))
+    print("═" * W)
+
+    print(f"\n  {'Setup':<10} {'Operazioni':>10}  {'Esatti':>7}  {'Cambi':>7}  {'Medio':>8}  {'Peggiore':>8}  {'Esito':>6}")
+    print(f"  {'─' * 10} {'─' * 10}  {'─' * 7}  {'─' * 7}  {'─' * 8}  {'─' * 8}  {'─' * 6}")
+    ok = True
+    for phased in (False, True):
+        for n in sizes:
+            exact = changes = 0
+            times = []
+            valid = True
+            for seed in range(setups):
+                ops = synthetic_setup(n, seed, phased)
+                t0 = time.perf_counter()
+                best, order, is_exact = min_tool_changes(ops)
+                times.append(time.perf_counter() - t0)
+                pred, done = precedence_masks(ops), 0
+                for j in order:
+                    valid &= not pred[j] & ~done
+                    done |= 1 << j
+                valid &= sorted(order) == list(range(n)) and best == count_tool_changes([ops[j] for j in order])
+                exact += is_exact
+                changes += best
+            good = valid and max(times) <= budget_s and (exact == setups or not phased)
+            ok &= good
+            print(f"  {'in fase' if phased else 'casuale':<10} {n:>10}  {f'{exact}/{setups}':>7}  "
+                  f"{changes / setups:>7.1f}  {statistics.mean(times):>6.2f} s  {max(times):>6.2f} s  "
+                  f"{'OK' if good else 'NO':>6}")
+
+    print(f"\n  Ordini validi, setup in fase esatti, tempi: {'entro il budget' if ok else 'FUORI BUDGET o non validi'}")
+    print("═" * W + "\n")
+    return ok
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 6. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Benchmark delle prestazioni",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempio:
+  python bench_cnc.py startup
+  python bench_cnc.py startup --runs 20 --budget-ms 80
+  python bench_cnc.py scaling
+  python bench_cnc.py scaling --sizes 1000,10000,50000
+  python bench_cnc.py golden
+  python bench_cnc.py golden --update
+  python bench_cnc.py golden --engine mio_parser:parse_pdf --jobs 4
+  python bench_cnc.py align
+  python bench_cnc.py align --sizes 1000,4000 --budget-s 10
+  python bench_cnc.py sequencing
+  python bench_cnc.py sequencing --sizes 100,200 --setups 5
+        """)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_start = sub.add_parser('startup', help='Tempo di avvio degli script (--help, errori di argomenti)')
+    p_start.add_argument('--runs', type=int, default=10, help='Lanci per comando (default: 10)')
+    p_start.add_argument('--budget-ms', type=float, default=100,
+                         help='Budget sulla mediana in millisecondi (default: 100)')
+
+    p_scale = sub.add_parser('scaling', help='Scalabilità dello splitter su sheet sintetici fino a 10k operazioni')
+    p_scale.add_argument('--sizes', default='1000,2000,5000,10000',
+                         help='Numero di operazioni, separati da virgola (default: 1000,2000,5000,10000)')
+    p_scale.add_argument('--runs', type=int, default=3, help='Ripetizioni per misura (default: 3)')
+    p_scale.add_argument('--tolerance', type=float, default=1.5,
+                         help='Crescita massima del costo per operazione (default: 1.5x)')
+
+    p_gold = sub.add_parser('golden', help='Confronto di parser, metriche e classifiche con gli snapshot golden')
+    p_gold.add_argument('--update', action='store_true',
+                        help='Rigenera gli snapshot con gli output attuali invece di confrontarli')
+    p_gold.add_argument('--dir', default=str(GOLDEN_DIR), help='Cartella dei file golden (default: golden/)')
+    p_gold.add_argument('--engine', default='multi_benchmark_cnc:parse_pdf',
+                        help='Parser da validare, modulo:funzione (default: multi_benchmark_cnc:parse_pdf)')
+    p_gold.add_argument('--metrics', default='multi_benchmark_cnc:compute_metrics',
+                        help='Calcolo metriche, modulo:funzione (default: multi_benchmark_cnc:compute_metrics)')
+    p_gold.add_argument('--scores', default='multi_benchmark_cnc:compute_all_scores',
+                        help='Scoring, modulo:funzione (default: multi_benchmark_cnc:compute_all_scores)')
+    p_gold.add_argument('--rtol', type=float, default=1e-9, help='Tolleranza relativa sui numeri (default: 1e-9)')
+    p_gold.add_argument('--atol', type=float, default=1e-9, help='Tolleranza assoluta sui numeri (default: 1e-9)')
+    p_gold.add_argument('--max-diffs', type=int, default=10, help='Differenze mostrate per file (default: 10)')
+    p_gold.add_argument('--jobs', type=int, default=1, help='Processi per il parsing (default: 1)')
+    p_gold.add_argument('--page-cache', default=None,
+                        help='Cache SQLite delle pagine: salta l\'estrazione, quindi non valida l\'engine di estrazione')
+
+    p_align = sub.add_parser('align', help='Allineamento delle operazioni di benchmark_cnc.py --diff')
+    p_align.add_argument('--sizes', default='500,1000,2000',
+                         help='Operazioni per setup, separati da virgola (default: 500,1000,2000)')
+    p_align.add_argument('--runs', type=int, default=3, help='Ripetizioni per misura (default: 3)')
+    p_align.add_argument('--budget-s', type=float, default=3,
+                         help='Budget in secondi per il setup più grande (default: 3)')
+
+    p_seq = sub.add_parser('sequencing', help='Sequenza con minimo cambi utensile di --tc-optimum')
+    p_seq.add_argument('--sizes', default='100,150',
+                       help='Operazioni per setup, separati da virgola (default: 100,150)')
+    p_seq.add_argument('--setups', type=int, default=10, help='Setup sintetici per riga (default: 10)')
+    p_seq.add_argument('--budget-s', type=float, default=10,
+                       help='Budget in secondi per singolo setup (default: 10)')
+
+    args = parser.parse_args()
+
+    if args.command == 'startup':
+        ok = bench_startup(args.runs, args.budget_ms)
+    elif args.command == 'scaling':
+        sizes = sorted(int(x) for x in args.sizes.split(','))
+        ok = bench_scaling(sizes, args.runs, args.tolerance)
+    elif args.command == 'golden':
+        try:
+            ok = bench_golden(Path(args.dir), args.update, args.engine, args.metrics, args.scores,
+                              args.rtol, args.atol, args.max_diffs, args.jobs, args.page_cache)
+        except (ImportError, AttributeError, ValueError) as e:
+            sys.exit(f"Errore: {e}")
+    elif args.command == 'align':
+        sizes = sorted(int(x) for x in args.sizes.split(','))
+        ok = bench_align(sizes, args.runs, args.budget_s)
+    elif args.command == 'sequencing':
+        sizes = sorted(int(x) for x in args.sizes.split(','))
+        ok = bench_sequencing(sizes, args.setups, args.budget_s)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
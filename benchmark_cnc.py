@@ -11,25 +11,38 @@
 ║  Opzioni:                                                            ║
 ║    --xlsx  <file.xlsx>   Esporta risultati in Excel                  ║
 ║    --tool-life <minuti>  Soglia vita utile utensile (default: 20)    ║
+║    --baseline <file>     Punteggi assoluti su baseline storica       ║
+║    --diff                Allinea le operazioni e ripartisce il       ║
+║                          distacco di punteggio tra di esse           ║
+║    --tc-optimum          Driver efficienza sequenza utensili         ║
+║                          (cambi minimi / cambi effettivi)            ║
+║    --machine <profilo>   Tempi ricalcolati per un profilo macchina   ║
 ╚══════════════════════════════════════════════════════════════════════╝
 """
 
 import argparse
+import bisect
 import re
 import sys
 from collections import defaultdict
 from pathlib import Path
 
-try:
-    import pdfplumber
-except ImportError:
-    sys.exit("Errore: installa pdfplumber con  pip install pdfplumber")
-
-
 # ═══════════════════════════════════════════════════════════════════
 # 1. PDF PARSER
 # ═══════════════════════════════════════════════════════════════════
 
+def _pdfplumber():
+    """
+    Import differito di pdfplumber: trascina con sé pdfminer, PIL e altro, quindi
+    viene caricato solo al primo parsing (non per --help o errori di argomenti).
+    """
+    try:
+        import pdfplumber
+    except ImportError:
+        sys.exit("Errore: installa pdfplumber con  pip install pdfplumber")
+    return pdfplumber
+
+
 def parse_cycle_time(text: str) -> int:
     """Converte stringhe come '4m:39s', '26s', '1h:02m:30s' in secondi."""
     text = text.strip().split("(")[0].strip()
@@ -94,13 +107,92 @@ def extract_product_code(op_text: str) -> str:
     return "N/A"
 
 
-def parse_pdf(pdf_path: str) -> dict:
+SETUP_MARKER = re.compile(r'Setup Sheet for Program \d+')
+OP_HEADER = re.compile(r'Operation\s+(\d+)/(\d+)\s+(T\d+)\s+D\d+\s+L\d+')
+OP_MARKER = re.compile(r'Operation\s+\d+/\d+')
+
+
+def split_setup_blocks(text: str) -> list:
+    """
+    Divide il testo in blocchi, uno per setup, tagliando agli offset dei marker
+    'Setup Sheet for Program N' trovati in un'unica scansione.
+    Equivalente a re.split(r'(?=Setup Sheet for Program \\d+)', text) + filtro.
+    """
+    starts = [m.start() for m in SETUP_MARKER.finditer(text)]
+    bounds = [0] + starts + [len(text)]
+    blocks = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+    return [b for b in blocks if b.strip() and 'Setup Sheet for Program' in b]
+
+
+def split_operations(block: str) -> list:
+    """
+    Operazioni di un setup come tuple (op_text, op_num, op_total, tool_t).
+    Ogni operazione va dalla sua intestazione 'Operation X/Y TXX DXX LXX' al marker
+    'Operation X/Y' successivo (o a fine blocco): gli offset dei marker sono raccolti
+    in una sola scansione, quindi il costo è lineare nella lunghezza del testo.
+    Equivalente al vecchio re.findall con '.*?(?=Operation\\s+\\d+/\\d+|$)' in DOTALL.
+    """
+    markers = [m.start() for m in OP_MARKER.finditer(block)]
+    # '$' senza MULTILINE corrisponde anche prima di un '\n' finale
+    eos = len(block) - 1 if block.endswith("\n") else len(block)
+    ops = []
+    for h in OP_HEADER.finditer(block):
+        k = bisect.bisect_left(markers, h.end())
+        end = markers[k] if k < len(markers) else len(block)
+        end = min(end, max(eos, h.end()))
+        ops.append((block[h.start():end],) + h.groups())
+    return ops
+
+
+# Etichette lette dal parser: una pagina che non ne contiene nessuna, né un
+# marker di operazione 'Operation X/Y' (foto utensili, viste grezzo/staffaggio,
+# pagine finali), non porta dati utili. La sola parola 'Operation' non basta:
+# compare anche in titoli e didascalie delle pagine senza dati.
+PAGE_MARKERS = ('Setup Sheet for Program', 'Document Path',
+                'Number Of', 'Estimated Cycle Time', 'Strategy:', 'Description:',
+                'Product:', 'Cutting Distance', 'Rapid Distance', 'Maximum Feedrate')
+
+
+def scan_pages(pdf_path: str):
+    """
+    Pre-scan veloce delle pagine con pypdfium2 (dipendenza di pdfplumber).
+    Restituisce una lista di bool (True = pagina con marker) o None se il
+    pre-scan non è disponibile: in quel caso vanno estratte tutte le pagine.
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    try:
+        doc = pdfium.PdfDocument(pdf_path)
+    except Exception:
+        return None
+    flags = []
+    try:
+        for i in range(len(doc)):
+            page = doc[i]
+            textpage = page.get_textpage()
+            sample = textpage.get_text_range()
+            flags.append(any(k in sample for k in PAGE_MARKERS) or OP_MARKER.search(sample) is not None)
+            textpage.close()
+            page.close()
+    except Exception:
+        return None
+    finally:
+        doc.close()
+    return flags
+
+
+def parse_pdf(pdf_path: str, prescan: bool = True) -> dict:
     """
     Parsa un PDF di operation sheet e restituisce i dati strutturati.
+    Con prescan=True le pagine senza marker del parser non vengono estratte.
 
     Returns:
         {
             'name': str,               # Nome del documento
+            'pages_total': int,        # Pagine del PDF
+            'pages_skipped': int,      # Pagine saltate dal pre-scan
             'setups': [                 # Lista di setup (tipicamente 2)
                 {
                     'program': str,
@@ -125,11 +217,18 @@ def parse_pdf(pdf_path: str) -> dict:
             ]
         }
     """
-    result = {'name': '', 'setups': []}
+    result = {'name': '', 'setups': [], 'pages_total': 0, 'pages_skipped': 0}
 
-    with pdfplumber.open(pdf_path) as pdf:
+    flags = scan_pages(pdf_path) if prescan else None
+    with _pdfplumber().open(pdf_path) as pdf:
+        result['pages_total'] = len(pdf.pages)
+        if flags is not None and len(flags) != len(pdf.pages):
+            flags = None
         full_text = ""
-        for page in pdf.pages:
+        for i, page in enumerate(pdf.pages):
+            if flags is not None and not flags[i]:
+                result['pages_skipped'] += 1
+                continue
             t = page.extract_text()
             if t:
                 full_text += t + "\n"
@@ -142,8 +241,7 @@ def parse_pdf(pdf_path: str) -> dict:
         result['name'] = Path(pdf_path).stem
 
     # Dividi per Setup Sheet
-    setup_blocks = re.split(r'(?=Setup Sheet for Program \d+)', full_text)
-    setup_blocks = [b for b in setup_blocks if b.strip() and 'Setup Sheet for Program' in b]
+    setup_blocks = split_setup_blocks(full_text)
 
     for block in setup_blocks:
         setup = {'program': '', 'cycle_time_s': 0, 'n_operations': 0, 'n_tools': 0, 'operations': []}
@@ -167,8 +265,7 @@ def parse_pdf(pdf_path: str) -> dict:
             setup['cycle_time_s'] = parse_cycle_time(ct_match.group(1))
 
         # Estrai operazioni individuali
-        op_pattern = r'(Operation\s+(\d+)/(\d+)\s+(T\d+)\s+D\d+\s+L\d+.*?)(?=Operation\s+\d+/\d+|$)'
-        ops = re.findall(op_pattern, block, re.DOTALL)
+        ops = split_operations(block)
 
         for op_text, op_num, op_total, tool_t in ops:
             cutting = extract_field(op_text, 'Cutting Distance', as_float=True) or 0.0
@@ -401,6 +498,14 @@ def compute_scores(ma: dict, mb: dict):
         ma['tc_total'], mb['tc_total'], s4a, s4b,
         str(ma['tc_total']), str(mb['tc_total']))
 
+    # Solo con --tc-optimum e ottimo esatto per entrambi gli sheet (vedi multi_benchmark_cnc)
+    if all('tc_optimal' in m and m['tc_optimal_exact'] for m in (ma, mb)):
+        sa, sb = (round(m['tc_optimal'] / m['tc_total'] * 100, 1) if m['tc_total'] else 100
+                  for m in (ma, mb))
+        add('Utilizzo Utensili', 'Efficienza sequenza utensili',
+            sa, sb, sa, sb,
+            f"{ma['tc_total']} (ott. {ma['tc_optimal']})", f"{mb['tc_total']} (ott. {mb['tc_optimal']})")
+
     # 3. VITA UTILE
     tls_a, tls_b = tool_life_score(ma), tool_life_score(mb)
     add('Vita Utile', 'Score vita utile (non lineare)',
@@ -452,7 +557,11 @@ def compute_scores(ma: dict, mb: dict):
         ma['productivity'], mb['productivity'], s13a, s13b,
         f"{ma['productivity']:.0f}", f"{mb['productivity']:.0f}")
 
-    # Calcolo punteggi categoria
+    return (drivers,) + category_scores(drivers)
+
+
+def category_scores(drivers: list):
+    """Punteggi per categoria (media dei driver) e totali pesati dei due gruppi."""
     cat_scores_a, cat_scores_b = {}, {}
     for cat in CATEGORY_WEIGHTS:
         cd = [d for d in drivers if d[0] == cat]
@@ -463,7 +572,189 @@ def compute_scores(ma: dict, mb: dict):
     total_a = round(sum(cat_scores_a[c] * w for c, w in CATEGORY_WEIGHTS.items()), 1)
     total_b = round(sum(cat_scores_b[c] * w for c, w in CATEGORY_WEIGHTS.items()), 1)
 
-    return drivers, cat_scores_a, cat_scores_b, total_a, total_b
+    return cat_scores_a, cat_scores_b, total_a, total_b
+
+
+def apply_baseline(drivers: list, baseline: dict):
+    """
+    Sostituisce i punteggi relativi con quelli assoluti rispetto a una baseline
+    storica (baseline_cnc.py): ciascun gruppo viene valutato indipendentemente.
+
+    Returns:
+        drivers, cat_scores_a, cat_scores_b, total_a, total_b come compute_scores()
+    """
+    from baseline_cnc import baseline_score
+
+    drivers = [(cat, name, va, vb,
+                baseline_score(baseline, name, va, sa), baseline_score(baseline, name, vb, sb), da, db)
+               for cat, name, va, vb, sa, sb, da, db in drivers]
+    return (drivers,) + category_scores(drivers)
+
+
+# Diff a livello di operazione (--diff). Costi dell'allineamento: un'operazione
+# modificata (stessa strategia o stesso Product) costa meno di una cancellazione
+# + inserimento, due operazioni diverse in tutto costano di più e restano separate.
+GAP_COST, PARTIAL_COST, MISMATCH_COST = 2, 2, 5
+
+# Sotto questa dimensione (celle n×m) l'allineamento usa la tabella completa
+FULL_DP_CELLS = 4096
+
+DIFF_FIELDS = ('strategy', 'tool_t', 'product', 'cutting_dist', 'rapid_dist', 'max_feedrate', 'cycle_time_s')
+
+
+def _op_keys(ops: list) -> list:
+    """(chiave completa, strategia, Product) di ogni operazione, per l'allineamento."""
+    return [((o['strategy'], o['tool_t'], o['product']), o['strategy'], o['product']) for o in ops]
+
+
+def _nw_last_row(a: list, b: list) -> list:
+    """Ultima riga della tabella di Needleman-Wunsch di a contro i prefissi di b (spazio lineare)."""
+    prev = [j * GAP_COST for j in range(len(b) + 1)]
+    for i, (ka, sa, pa) in enumerate(a, 1):
+        subs = [0 if ka == kb else (PARTIAL_COST if sa == sb or pa == pb else MISMATCH_COST)
+                for kb, sb, pb in b]
+        left = i * GAP_COST
+        cur = [left]
+        for diag, up, sub in zip(prev, prev[1:], subs):
+            diag += sub
+            up += GAP_COST
+            left += GAP_COST
+            left = diag if diag < left else left
+            left = up if up < left else left
+            cur.append(left)
+        prev = cur
+    return prev
+
+
+def _nw_full(a: list, b: list, ia: int, ib: int) -> list:
+    """Allineamento con tabella completa (sottoproblemi piccoli): [(indice_a | None, indice_b | None)]."""
+    n, m = len(a), len(b)
+    D = [[j * GAP_COST for j in range(m + 1)]] + [[i * GAP_COST] + [0] * m for i in range(1, n + 1)]
+    for i in range(1, n + 1):
+        ka, sa, pa = a[i - 1]
+        for j in range(1, m + 1):
+            kb, sb, pb = b[j - 1]
+            sub = 0 if ka == kb else (PARTIAL_COST if sa == sb or pa == pb else MISMATCH_COST)
+            D[i][j] = min(D[i - 1][j - 1] + sub, D[i - 1][j] + GAP_COST, D[i][j - 1] + GAP_COST)
+    out, i, j = [], n, m
+    while i or j:
+        if i and j:
+            ka, sa, pa = a[i - 1]
+            kb, sb, pb = b[j - 1]
+            sub = 0 if ka == kb else (PARTIAL_COST if sa == sb or pa == pb else MISMATCH_COST)
+            if D[i][j] == D[i - 1][j - 1] + sub:
+                out.append((ia + i - 1, ib + j - 1))
+                i, j = i - 1, j - 1
+                continue
+        if i and D[i][j] == D[i - 1][j] + GAP_COST:
+            out.append((ia + i - 1, None))
+            i -= 1
+        else:
+            out.append((None, ib + j - 1))
+            j -= 1
+    return out[::-1]
+
+
+def _hirschberg(a: list, b: list, ia: int = 0, ib: int = 0) -> list:
+    """
+    Allineamento ottimo in spazio lineare (Hirschberg): divide a a metà e trova
+    in b il punto di taglio con le righe di costo in avanti e all'indietro.
+    """
+    n, m = len(a), len(b)
+    if n == 0:
+        return [(None, ib + j) for j in range(m)]
+    if m == 0:
+        return [(ia + i, None) for i in range(n)]
+    if n * m <= FULL_DP_CELLS or n == 1:
+        return _nw_full(a, b, ia, ib)
+    mid = n // 2
+    left = _nw_last_row(a[:mid], b)
+    right = _nw_last_row(a[mid:][::-1], b[::-1])
+    cut = min(range(m + 1), key=lambda j: left[j] + right[m - j])
+    return (_hirschberg(a[:mid], b[:cut], ia, ib)
+            + _hirschberg(a[mid:], b[cut:], ia + mid, ib + cut))
+
+
+def align_operations(ops_a: list, ops_b: list) -> list:
+    """
+    Allinea le operazioni di due setup: [(op_a | None, op_b | None)].
+    Prefisso e suffisso comuni vengono accoppiati direttamente, il resto con
+    Hirschberg (tempo O(n·m), memoria O(n + m)).
+    """
+    ka, kb = _op_keys(ops_a), _op_keys(ops_b)
+    n, m = len(ka), len(kb)
+    pre = 0
+    while pre < min(n, m) and ka[pre][0] == kb[pre][0]:
+        pre += 1
+    suf = 0
+    while suf < min(n, m) - pre and ka[n - 1 - suf][0] == kb[m - 1 - suf][0]:
+        suf += 1
+    pairs = [(i, i) for i in range(pre)]
+    pairs += _hirschberg(ka[pre:n - suf], kb[pre:m - suf], pre, pre)
+    pairs += [(n - suf + k, m - suf + k) for k in range(suf)]
+    return [(ops_a[i] if i is not None else None, ops_b[j] if j is not None else None) for i, j in pairs]
+
+
+def diff_tag(oa, ob) -> str:
+    """'=' identica, '~' modificata, '-' solo in A, '+' solo in B."""
+    if ob is None:
+        return '-'
+    if oa is None:
+        return '+'
+    return '=' if all(oa[f] == ob[f] for f in DIFF_FIELDS) else '~'
+
+
+def attribute_score_gap(parsed_a: dict, parsed_b: dict, aligned: list, score_fn) -> tuple:
+    """
+    Ripartisce il distacco di punteggio tra A e B sulle operazioni allineate.
+
+    A viene trasformato in B un passo alla volta (un'operazione allineata per
+    passo, nell'ordine di setup e operazione); il contributo di un'operazione è
+    la variazione del distacco quando la sua versione in A viene sostituita da
+    quella in B. I tempi dell'header di ogni setup seguono i delta delle
+    operazioni; la differenza residua (cambi utensile, overhead) è un passo a sé.
+    I contributi sommano esattamente al distacco: positivo = vantaggio di A.
+
+    score_fn(parsed) → (total_stato, total_b)
+
+    Returns:
+        contributi [[float per coppia] per setup], contributo residuo dell'header, distacco iniziale
+    """
+    n_setups = len(aligned)
+    head_a = [s['cycle_time_s'] for s in parsed_a['setups']] + [0] * (n_setups - len(parsed_a['setups']))
+    head_b = [s['cycle_time_s'] for s in parsed_b['setups']] + [0] * (n_setups - len(parsed_b['setups']))
+    done = [0] * n_setups
+    head = list(head_a)
+
+    def state():
+        setups = []
+        for s, pairs in enumerate(aligned):
+            ops = [ob for _, ob in pairs[:done[s]] if ob] + [oa for oa, _ in pairs[done[s]:] if oa]
+            setups.append({'cycle_time_s': head[s], 'operations': ops})
+        return {'name': parsed_a['name'], 'setups': setups}
+
+    def gap(parsed):
+        if not any(s['operations'] for s in parsed['setups']):
+            return None
+        ta, tb = score_fn(parsed)
+        return ta - tb
+
+    g0 = last = gap(state())
+    contrib = [[0.0] * len(pairs) for pairs in aligned]
+    for s, pairs in enumerate(aligned):
+        for k, (oa, ob) in enumerate(pairs):
+            done[s] = k + 1
+            if diff_tag(oa, ob) == '=':
+                continue
+            head[s] += (ob['cycle_time_s'] if ob else 0) - (oa['cycle_time_s'] if oa else 0)
+            g = gap(state())
+            if g is None:       # stato senza operazioni: il passo confluisce nel successivo
+                continue
+            contrib[s][k] = last - g
+            last = g
+    head[:] = head_b
+    residual = last - gap(state())
+    return contrib, residual, g0
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -544,6 +835,70 @@ def print_report(ma, mb, drivers, csa, csb, ta, tb):
     print("═" * W + "\n")
 
 
+def _signed_time(d: float) -> str:
+    return ("+" if d > 0 else "−" if d < 0 else " ") + fmt_time(abs(d))
+
+
+def print_diff(ma, mb, parsed_a, parsed_b, aligned, contrib, residual, gap, top: int = 10):
+    """Stampa il diff delle operazioni allineate con il contributo di ciascuna al distacco."""
+    na, nb = ma['group'], mb['group']
+    W = 110
+
+    print("\n" + "═" * W)
+    print(f"{'DIFF DELLE OPERAZIONI — ALLINEAMENTO PER SETUP':^{W}}")
+    print(f"{na}  vs  {nb}   (Δ = {nb} − {na})".center(W))
+    print("═" * W)
+    print(f"\n  Distacco: {gap:+.1f} punti (positivo = vantaggio {na}); contributo di ogni operazione in punti")
+
+    for s, pairs in enumerate(aligned):
+        tags = [diff_tag(oa, ob) for oa, ob in pairs]
+        prog_a = (parsed_a['setups'][s]['program'] if s < len(parsed_a['setups']) else '') or '—'
+        prog_b = (parsed_b['setups'][s]['program'] if s < len(parsed_b['setups']) else '') or '—'
+        print(f"\n  ▸ Setup {s + 1} (program {prog_a} / {prog_b}): {tags.count('=')} identiche, "
+              f"{tags.count('~')} modificate, {tags.count('-')} solo {na}, {tags.count('+')} solo {nb}")
+        print(f"\n       {na:>6} {nb:>6}  {'Strategia':<16} {'T':<15} {'ΔTempo':>10} {'ΔTaglio':>10} "
+              f"{'ΔRapido':>10} {'ΔFeed':>8} {'Contributo':>11}")
+        print(f"       {'─' * 6} {'─' * 6}  {'─' * 16} {'─' * 15} {'─' * 10} {'─' * 10} {'─' * 10} {'─' * 8} {'─' * 11}")
+        same = 0
+        for k, ((oa, ob), tag) in enumerate(zip(pairs, tags)):
+            if tag == '=':
+                same += 1
+                continue
+            if same:
+                print(f"       {'':>13}  · {same} {'operazione identica' if same == 1 else 'operazioni identiche'}")
+                same = 0
+            o1, o2 = oa or ob, ob or oa
+
+            def delta(f):
+                return (ob[f] if ob else 0) - (oa[f] if oa else 0)
+
+            strategy = o1['strategy'] if o1['strategy'] == o2['strategy'] else f"{o1['strategy']}→{o2['strategy']}"
+            tool = o1['tool_t'] if o1['tool_t'] == o2['tool_t'] else f"{o1['tool_t']}→{o2['tool_t']}"
+            feed = f"{delta('max_feedrate'):+8.0f}" if oa and ob else f"{'—':>8}"
+            print(f"    {tag}  {oa['op_num'] if oa else '':>6} {ob['op_num'] if ob else '':>6}  "
+                  f"{strategy[:16]:<16} {tool[:15]:<15} {_signed_time(delta('cycle_time_s')):>10} "
+                  f"{delta('cutting_dist'):>+10.0f} {delta('rapid_dist'):>+10.0f} {feed} {round(contrib[s][k], 2) + 0.0:>+11.2f}")
+        if same:
+            print(f"       {'':>13}  · {same} {'operazione identica' if same == 1 else 'operazioni identiche'}")
+
+    ranked = sorted(((c, s, k) for s, row in enumerate(contrib) for k, c in enumerate(row) if c),
+                    key=lambda x: -abs(x[0]))[:top]
+    print(f"\n{'─' * W}")
+    print(f"  OPERAZIONI CHE PESANO DI PIÙ SUL DISTACCO (prime {top})")
+    print(f"\n  {'Setup':>5} {na:>6} {nb:>6}  {'Descrizione':<40} {'Contributo':>11}  {'Vantaggio':<10}")
+    print(f"  {'─' * 5} {'─' * 6} {'─' * 6}  {'─' * 40} {'─' * 11}  {'─' * 10}")
+    for c, s, k in ranked:
+        oa, ob = aligned[s][k]
+        desc = (oa or ob)['description'] if not (oa and ob) or oa['description'] == ob['description'] \
+            else f"{oa['description']} → {ob['description']}"
+        print(f"  {s + 1:>5} {oa['op_num'] if oa else '':>6} {ob['op_num'] if ob else '':>6}  "
+              f"{desc[:40]:<40} {c:>+11.2f}  {na if c > 0 else nb:<10}")
+    print(f"\n  {'Operazioni':<62} {sum(map(sum, contrib)):>+11.2f}")
+    print(f"  {'Header dei setup (cambi utensile, overhead)':<62} {residual:>+11.2f}")
+    print(f"  {'Distacco complessivo':<62} {gap:>+11.2f}")
+    print("═" * W + "\n")
+
+
 # ═══════════════════════════════════════════════════════════════════
 # 5. ESPORTAZIONE EXCEL (opzionale)
 # ═══════════════════════════════════════════════════════════════════
@@ -729,35 +1084,97 @@ Esempio:
   python benchmark_cnc.py  NC02_SHEET.pdf  TP02_SHEET.pdf
   python benchmark_cnc.py  NC02_SHEET.pdf  TP02_SHEET.pdf --xlsx report.xlsx
   python benchmark_cnc.py  NC02_SHEET.pdf  TP02_SHEET.pdf --tool-life 15
+  python benchmark_cnc.py  NC02_SHEET.pdf  TP02_SHEET.pdf --baseline baseline.json
+  python benchmark_cnc.py  NC02_SHEET.pdf  TP02_SHEET.pdf --diff
+  python benchmark_cnc.py  NC02_SHEET.pdf  TP02_SHEET.pdf --tc-optimum
+  python benchmark_cnc.py  NC02_SHEET.pdf  TP02_SHEET.pdf --machine hsm
         """)
     parser.add_argument('pdf_a', help='PDF operation sheet del gruppo A')
     parser.add_argument('pdf_b', help='PDF operation sheet del gruppo B')
     parser.add_argument('--xlsx', help='Esporta risultati in file Excel', default=None)
     parser.add_argument('--tool-life', type=int, default=20,
                         help='Soglia vita utile utensile in minuti (default: 20)')
+    parser.add_argument('--baseline', default=None,
+                        help='Punteggi assoluti rispetto a una baseline storica (file JSON di baseline_cnc.py)')
+    parser.add_argument('--diff', action='store_true',
+                        help='Allinea le operazioni dei due sheet per setup e attribuisce il distacco alle singole operazioni')
+    parser.add_argument('--tc-optimum', action='store_true',
+                        help='Aggiunge il driver "Efficienza sequenza utensili": cambi minimi (sequencing_cnc.py) / cambi effettivi')
+    parser.add_argument('--machine', default=None,
+                        help='Ricalcola i tempi ciclo con un profilo macchina (nome o file JSON, vedi kinematics_cnc.py); '
+                             'non si combina con --baseline')
 
     args = parser.parse_args()
     tool_life_s = args.tool_life * 60
+    if args.machine and args.baseline:
+        sys.exit("Errore: --machine non si combina con --baseline: la baseline è costruita "
+                 "sui tempi degli sheet e i tempi ricalcolati risulterebbero tutti fuori scala")
 
     # Parsing
     print(f"\n  Parsing {args.pdf_a} ...")
     parsed_a = parse_pdf(args.pdf_a)
-    print(f"  → {parsed_a['name']}: {sum(len(s['operations']) for s in parsed_a['setups'])} operazioni in {len(parsed_a['setups'])} setup")
+    skipped = f" ({parsed_a['pages_skipped']}/{parsed_a['pages_total']} pagine saltate)" if parsed_a['pages_skipped'] else ""
+    print(f"  → {parsed_a['name']}: {sum(len(s['operations']) for s in parsed_a['setups'])} operazioni in {len(parsed_a['setups'])} setup{skipped}")
 
     print(f"  Parsing {args.pdf_b} ...")
     parsed_b = parse_pdf(args.pdf_b)
-    print(f"  → {parsed_b['name']}: {sum(len(s['operations']) for s in parsed_b['setups'])} operazioni in {len(parsed_b['setups'])} setup")
+    skipped = f" ({parsed_b['pages_skipped']}/{parsed_b['pages_total']} pagine saltate)" if parsed_b['pages_skipped'] else ""
+    print(f"  → {parsed_b['name']}: {sum(len(s['operations']) for s in parsed_b['setups'])} operazioni in {len(parsed_b['setups'])} setup{skipped}")
+
+    # Sheet senza operazioni: come in multi_benchmark_cnc.py non arrivano a --machine e --tc-optimum
+    for parsed in (parsed_a, parsed_b):
+        if not any(s['operations'] for s in parsed['setups']):
+            sys.exit(f"Errore: nessuna operazione trovata in '{parsed['name']}'")
+
+    # Tempi ricalcolati per il profilo macchina (valgono anche per --diff)
+    if args.machine:
+        from kinematics_cnc import load_profile, OperationTable
+        try:
+            machine = load_profile(args.machine)
+        except ValueError as e:
+            sys.exit(f"Errore: {e}")
+        parsed_a, parsed_b = OperationTable([parsed_a, parsed_b]).retime(machine)
+        print(f"  Tempi ciclo ricalcolati con il profilo macchina '{machine['name']}'")
 
     # Metriche
     ma = compute_metrics(parsed_a, tool_life_s)
     mb = compute_metrics(parsed_b, tool_life_s)
+    if args.tc_optimum:
+        from sequencing_cnc import tc_optimum
+        for m, parsed in ((ma, parsed_a), (mb, parsed_b)):
+            m['tc_optimal'], m['tc_optimal_exact'] = tc_optimum(parsed)
+            if not m['tc_optimal_exact']:
+                print(f"  ⚠ Sequenza ottima non garantita per {parsed['name']} (ricerca interrotta): driver 'Efficienza sequenza utensili' omesso")
 
     # Scoring
     drivers, csa, csb, ta, tb = compute_scores(ma, mb)
+    if args.baseline:
+        from baseline_cnc import load_baseline
+        baseline = load_baseline(args.baseline)
+        drivers, csa, csb, ta, tb = apply_baseline(drivers, baseline)
+        print(f"\n  Punteggi assoluti rispetto alla baseline {args.baseline} ({baseline['n_sheets']} sheet storici)")
 
     # Output
     print_report(ma, mb, drivers, csa, csb, ta, tb)
 
+    # Diff delle operazioni
+    if args.diff:
+        n_setups = max(len(parsed_a['setups']), len(parsed_b['setups']))
+        setup_ops = lambda p, s: p['setups'][s]['operations'] if s < len(p['setups']) else []
+        aligned = [align_operations(setup_ops(parsed_a, s), setup_ops(parsed_b, s)) for s in range(n_setups)]
+
+        def score_fn(parsed):
+            m = compute_metrics(parsed, tool_life_s)
+            if args.tc_optimum:
+                m['tc_optimal'], m['tc_optimal_exact'] = tc_optimum(parsed)
+            result = compute_scores(m, mb)
+            if args.baseline:
+                result = apply_baseline(result[0], baseline)
+            return result[3], result[4]
+
+        contrib, residual, gap = attribute_score_gap(parsed_a, parsed_b, aligned, score_fn)
+        print_diff(ma, mb, parsed_a, parsed_b, aligned, contrib, residual, gap)
+
     # Excel export
     if args.xlsx:
         export_xlsx(ma, mb, drivers, csa, csb, ta, tb, args.xlsx)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — INDICE INVERTITO DELLE OPERAZIONI      ║
+║                                                                      ║
+║  Indice persistente (SQLite) da strategia, utensile T, Product,      ║
+║  gruppo e caso alle operazioni parsate, con tempi e distanze:        ║
+║  aggregazioni su migliaia di sheet senza riaprire i PDF.             ║
+║                                                                      ║
+║  Uso:  python index_cnc.py  build --index idx.sqlite <pdf/cartelle>  ║
+║        python index_cnc.py  build --index idx.sqlite --from-db r.db  ║
+║        python index_cnc.py  query --index idx.sqlite [filtri] --by X ║
+║        python index_cnc.py  terms --index idx.sqlite --field F       ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import hashlib
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id         INTEGER PRIMARY KEY,
+    sha256     TEXT NOT NULL,
+    case_name  TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    name       TEXT,
+    path       TEXT,
+    UNIQUE (sha256, case_name)
+);
+CREATE TABLE IF NOT EXISTS ops (
+    id           INTEGER PRIMARY KEY,
+    file_id      INTEGER NOT NULL REFERENCES files(id),
+    setup_idx    INTEGER NOT NULL,
+    op_num       INTEGER,
+    description  TEXT,
+    strategy     TEXT,
+    tool_t       TEXT,
+    product      TEXT,
+    cycle_time_s INTEGER,
+    cutting_dist REAL,
+    rapid_dist   REAL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id    INTEGER PRIMARY KEY,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    UNIQUE (field, value)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL REFERENCES terms(id),
+    op_id   INTEGER NOT NULL REFERENCES ops(id),
+    PRIMARY KEY (term_id, op_id)
+) WITHOUT ROWID;
+"""
+
+# Campi indicizzati → colonna da cui leggere il valore (o = ops, f = files)
+FIELDS = {
+    'strategy': 'o.strategy',
+    'tool': 'o.tool_t',
+    'product': 'o.product',
+    'group': 'f.group_name',
+    'case': 'f.case_name',
+}
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. COSTRUZIONE DELL'INDICE
+# ═══════════════════════════════════════════════════════════════════
+
+def connect(index_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _term_id(conn, cache: dict, field: str, value: str) -> int:
+    key = (field, value)
+    if key not in cache:
+        conn.execute("INSERT OR IGNORE INTO terms (field, value) VALUES (?, ?)", key)
+        cache[key] = conn.execute("SELECT id FROM terms WHERE field = ? AND value = ?", key).fetchone()[0]
+    return cache[key]
+
+
+def index_parsed(conn, parsed: dict, case_name: str, group: str, sha256: str, terms: dict) -> bool:
+    """
+    Aggiunge all'indice le operazioni di un PDF parsato (output di parse_pdf()).
+    Un PDF già indicizzato per lo stesso caso (stesso SHA-256) viene saltato.
+    """
+    if conn.execute("SELECT 1 FROM files WHERE sha256 = ? AND case_name = ?", (sha256, case_name)).fetchone():
+        return False
+    file_id = conn.execute(
+        "INSERT INTO files (sha256, case_name, group_name, name, path) VALUES (?, ?, ?, ?, ?)",
+        (sha256, case_name, group, parsed['name'], str(parsed.get('path', '')))).lastrowid
+    file_terms = [_term_id(conn, terms, 'group', group), _term_id(conn, terms, 'case', case_name)]
+    postings = []
+    for si, setup in enumerate(parsed['setups']):
+        for o in setup['operations']:
+            op_id = conn.execute(
+                "INSERT INTO ops (file_id, setup_idx, op_num, description, strategy, tool_t, product, "
+                "cycle_time_s, cutting_dist, rapid_dist) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_id, si, o['op_num'], o['description'], o['strategy'], o['tool_t'], o['product'],
+                 o['cycle_time_s'], o['cutting_dist'], o['rapid_dist'])).lastrowid
+            op_terms = file_terms + [_term_id(conn, terms, 'strategy', o['strategy']),
+                                     _term_id(conn, terms, 'tool', o['tool_t']),
+                                     _term_id(conn, terms, 'product', o['product'])]
+            postings.extend((t, op_id) for t in op_terms)
+    conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)", postings)
+    return True
+
+
+def build_from_pdfs(index_path: str, pdfs: list, case_name: str, page_cache_path: str = None):
+    """Parsa i PDF e li aggiunge all'indice. Restituisce (indicizzati, già presenti)."""
+    from multi_benchmark_cnc import PageTextCache, parse_pdf, extract_short_name, pdf_data
+
+    page_cache = PageTextCache(page_cache_path) if page_cache_path else None
+    conn = connect(index_path)
+    terms, added, present = {}, 0, 0
+    try:
+        for pdf in pdfs:
+            data = pdf_data(pdf)
+            if data is None:
+                data = Path(pdf).read_bytes()
+            sha = hashlib.sha256(data).hexdigest()
+            if conn.execute("SELECT 1 FROM files WHERE sha256 = ? AND case_name = ?", (sha, case_name)).fetchone():
+                present += 1
+                continue
+            print(f"  Parsing {pdf.name} ...")
+            parsed = parse_pdf(str(pdf), data=data, page_cache=page_cache)
+            group = extract_short_name(parsed['name'], Path(str(pdf)).stem)
+            with conn:
+                index_parsed(conn, parsed, case_name, group, sha, terms)
+            added += 1
+    finally:
+        conn.close()
+    return added, present
+
+
+def build_from_warehouse(index_path: str, db_path: str):
+    """Importa nell'indice i PDF dell'archivio warehouse_cnc.py, senza riparsare."""
+    from warehouse_cnc import connect as connect_db, load_parsed
+
+    src = connect_db(db_path)
+    conn = connect(index_path)
+    terms, added, present = {}, 0, 0
+    try:
+        rows = src.execute(
+            "SELECT g.file_id, r.case_name, g.group_name FROM group_results g "
+            "JOIN runs r ON r.id = g.run_id GROUP BY g.file_id, r.case_name ORDER BY MAX(r.id)").fetchall()
+        with conn:
+            for file_id, case_name, group in rows:
+                parsed = load_parsed(src, file_id)
+                if index_parsed(conn, parsed, case_name, group, parsed['sha256'], terms):
+                    added += 1
+                else:
+                    present += 1
+    finally:
+        src.close()
+        conn.close()
+    return added, present
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. INTERROGAZIONI
+# ═══════════════════════════════════════════════════════════════════
+
+def _like(pattern: str) -> str:
+    """Pattern con caratteri jolly * e ? → pattern LIKE (senza distinzione maiuscole/minuscole)."""
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+def match_ops(conn, filters: dict):
+    """
+    Operazioni che soddisfano tutti i filtri {campo: [pattern, ...]}: per ogni campo
+    si uniscono le posting list dei termini corrispondenti, tra campi si intersecano.
+    Restituisce (condizione SQL sugli id operazione, parametri).
+    """
+    parts, params = [], []
+    for field, patterns in filters.items():
+        term_ids = set()
+        for pattern in patterns:
+            term_ids.update(r[0] for r in conn.execute(
+                "SELECT id FROM terms WHERE field = ? AND value LIKE ? ESCAPE '\\'", (field, _like(pattern))))
+        if not term_ids:
+            return "0", []
+        parts.append(f"SELECT op_id FROM postings WHERE term_id IN ({', '.join('?' * len(term_ids))})")
+        params.extend(sorted(term_ids))
+    if not parts:
+        return "1", []
+    return f"o.id IN ({' INTERSECT '.join(parts)})", params
+
+
+def aggregate(conn, filters: dict, by: str) -> list:
+    """(valore, n° operazioni, n° PDF, tempo, taglio, rapido) per valore del campo `by`."""
+    where, params = match_ops(conn, filters)
+    return conn.execute(
+        f"SELECT {FIELDS[by]}, COUNT(*), COUNT(DISTINCT o.file_id), SUM(o.cycle_time_s), "
+        f"SUM(o.cutting_dist), SUM(o.rapid_dist) FROM ops o JOIN files f ON f.id = o.file_id "
+        f"WHERE {where} GROUP BY 1 ORDER BY 4 DESC", params).fetchall()
+
+
+def list_ops(conn, filters: dict, limit: int) -> list:
+    where, params = match_ops(conn, filters)
+    return conn.execute(
+        f"SELECT f.case_name, f.group_name, o.setup_idx + 1, o.op_num, o.strategy, o.tool_t, o.product, "
+        f"o.cycle_time_s, o.description FROM ops o JOIN files f ON f.id = o.file_id "
+        f"WHERE {where} ORDER BY o.id LIMIT ?", params + [limit]).fetchall()
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def cmd_build(args):
+    if args.from_db:
+        if not Path(args.from_db).exists():
+            sys.exit(f"Errore: database non trovato: {args.from_db}")
+        added, present = build_from_warehouse(args.index, args.from_db)
+    else:
+        from multi_benchmark_cnc import collect_pdfs
+
+        if not args.inputs:
+            sys.exit("Errore: indicare PDF, archivi o cartelle da indicizzare, oppure --from-db")
+        pdfs = collect_pdfs(args.inputs)
+        first = Path(args.inputs[0])
+        case_name = args.case or (first if first.is_dir() else first.parent).resolve().name
+        added, present = build_from_pdfs(args.index, pdfs, case_name, args.page_cache)
+    print(f"\n  ✓ Indice {args.index}: {added} PDF indicizzati, {present} già presenti\n")
+
+
+def cmd_query(args):
+    from multi_benchmark_cnc import fmt_time
+
+    filters = {field: getattr(args, field) for field in FIELDS if getattr(args, field)}
+    conn = connect(args.index)
+    t0 = time.perf_counter()
+    try:
+        if args.ops:
+            rows = list_ops(conn, filters, args.limit)
+            elapsed = time.perf_counter() - t0
+            print(f"\n  {'Caso':<20} {'Gruppo':<12} {'Setup':>5} {'Op':>4}  {'Strategia':<14} {'T':<6} "
+                  f"{'Product':<26} {'Tempo':>10}  Descrizione")
+            print(f"  {'─' * 20} {'─' * 12} {'─' * 5} {'─' * 4}  {'─' * 14} {'─' * 6} {'─' * 26} {'─' * 10}  {'─' * 20}")
+            for case, group, setup, op, strategy, tool, product, ct, desc in rows:
+                print(f"  {case[:20]:<20} {group[:12]:<12} {setup:>5} {op:>4}  {strategy[:14]:<14} {tool:<6} "
+                      f"{product[:26]:<26} {fmt_time(ct):>10}  {desc}")
+        else:
+            rows = aggregate(conn, filters, args.by)
+            elapsed = time.perf_counter() - t0
+            print(f"\n  {args.by.upper():<32} {'Op.':>6} {'PDF':>5} {'Tempo':>12} {'Taglio [mm]':>13} {'Rapido [mm]':>13}")
+            print(f"  {'─' * 32} {'─' * 6} {'─' * 5} {'─' * 12} {'─' * 13} {'─' * 13}")
+            for value, n_ops, n_files, ct, cut, rapid in rows:
+                print(f"  {value[:32]:<32} {n_ops:>6} {n_files:>5} {fmt_time(ct):>12} {cut:>13.0f} {rapid:>13.0f}")
+            if rows:
+                print(f"  {'─' * 32} {'─' * 6} {'─' * 5} {'─' * 12} {'─' * 13} {'─' * 13}")
+                print(f"  {'TOTALE':<32} {sum(r[1] for r in rows):>6} {'':>5} "
+                      f"{fmt_time(sum(r[3] for r in rows)):>12} {sum(r[4] for r in rows):>13.0f} "
+                      f"{sum(r[5] for r in rows):>13.0f}")
+    finally:
+        conn.close()
+    print(f"\n  {len(rows)} righe in {elapsed * 1000:.1f} ms\n")
+
+
+def cmd_terms(args):
+    conn = connect(args.index)
+    try:
+        rows = conn.execute(
+            "SELECT t.value, COUNT(p.op_id) FROM terms t LEFT JOIN postings p ON p.term_id = t.id "
+            "WHERE t.field = ? GROUP BY t.id ORDER BY 2 DESC, 1", (args.field,)).fetchall()
+    finally:
+        conn.close()
+    print(f"\n  {args.field.upper():<40} {'Op.':>6}")
+    print(f"  {'─' * 40} {'─' * 6}")
+    for value, n in rows:
+        print(f"  {value[:40]:<40} {n:>6}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Indice invertito delle operazioni",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python index_cnc.py build --index idx.sqlite CASO_B/B_OPERATION_SHEET --case CASO_B
+  python index_cnc.py build --index idx.sqlite --from-db results.sqlite
+  python index_cnc.py query --index idx.sqlite --case CASO_B --by product
+  python index_cnc.py query --index idx.sqlite --strategy Adaptive --product "345-*" --by group
+  python index_cnc.py query --index idx.sqlite --group NC02 --tool T5 --ops
+  python index_cnc.py terms --index idx.sqlite --field strategy
+        """)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help='Aggiunge PDF (o un archivio --db) all\'indice')
+    p_query = sub.add_parser('query', help='Aggregazioni o elenco delle operazioni che soddisfano i filtri')
+    p_terms = sub.add_parser('terms', help='Valori indicizzati di un campo, con n° di operazioni')
+    for p in (p_build, p_query, p_terms):
+        p.add_argument('--index', required=True, help='File SQLite dell\'indice')
+    p_build.add_argument('inputs', nargs='*', help='File PDF, archivi zip/tar e/o cartelle')
+    p_build.add_argument('--case', help='Nome del caso (default: cartella del primo input)')
+    p_build.add_argument('--from-db', help='Importa dall\'archivio scritto da multi_benchmark_cnc.py --db')
+    p_build.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+    for field in FIELDS:
+        p_query.add_argument(f'--{field}', action='append',
+                             help=f'Filtro su {field}, caratteri jolly * e ? (ripetibile: OR)')
+    p_query.add_argument('--by', choices=list(FIELDS), default='group', help='Campo di aggregazione (default: group)')
+    p_query.add_argument('--ops', action='store_true', help='Elenca le operazioni invece di aggregarle')
+    p_query.add_argument('--limit', type=int, default=200, help='Operazioni massime elencate con --ops (default: 200)')
+    p_terms.add_argument('--field', choices=list(FIELDS), required=True, help='Campo indicizzato')
+
+    args = parser.parse_args()
+    if args.command != 'build' and not Path(args.index).exists():
+        sys.exit(f"Errore: indice non trovato: {args.index}")
+    {'build': cmd_build, 'query': cmd_query, 'terms': cmd_terms}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
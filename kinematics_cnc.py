@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — TEMPI CICLO PER PROFILO MACCHINA       ║
+║                                                                      ║
+║  Ricalcola il tempo di ogni operazione da distanza di taglio,        ║
+║  distanza in rapido e feedrate con un modello cinematico (rapido,    ║
+║  accelerazione, cambio utensile) del profilo macchina scelto: sheet  ║
+║  stimati da Fusion su macchine diverse diventano confrontabili.      ║
+║                                                                      ║
+║  Uso:  python kinematics_cnc.py  <pdf/cartelle/archivi>  [opzioni]   ║
+║                                                                      ║
+║  Opzioni:                                                            ║
+║    --machine P      Profilo (nome o file JSON), ripetibile           ║
+║    --tool-life N    Soglia vita utile in minuti (default: 20)        ║
+║    --page-cache F   Cache SQLite del testo delle pagine              ║
+║                                                                      ║
+║  Usato anche da benchmark_cnc.py e multi_benchmark_cnc.py con        ║
+║  --machine (punteggi calcolati sui tempi ricalcolati).               ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from array import array
+from pathlib import Path
+
+# Profili macchina predefiniti. Velocità in mm/min, accelerazione in mm/s²,
+# tempi in secondi. I segmenti sono la lunghezza media dei tratti in cui il CAM
+# spezza i movimenti: ogni tratto riparte da fermo (accelerazione e frenata).
+PROFILES = {
+    'standard': {
+        'rapid_mm_min': 30000, 'max_feed_mm_min': 10000, 'accel_mm_s2': 1000,
+        'tool_change_s': 6.0, 'cut_segment_mm': 2.0, 'rapid_segment_mm': 50.0,
+    },
+    'hsm': {
+        'rapid_mm_min': 48000, 'max_feed_mm_min': 20000, 'accel_mm_s2': 5000,
+        'tool_change_s': 2.5, 'cut_segment_mm': 2.0, 'rapid_segment_mm': 50.0,
+    },
+    'legacy': {
+        'rapid_mm_min': 12000, 'max_feed_mm_min': 6000, 'accel_mm_s2': 400,
+        'tool_change_s': 12.0, 'cut_segment_mm': 2.0, 'rapid_segment_mm': 50.0,
+    },
+}
+DEFAULT_PROFILE = 'standard'
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. PROFILI MACCHINA
+# ═══════════════════════════════════════════════════════════════════
+
+def load_profile(spec: str) -> dict:
+    """
+    Profilo da nome predefinito (PROFILES) o da file JSON. I campi mancanti nel
+    file valgono come nel profilo 'standard'; il nome è quello del file se non
+    indicato nel campo 'name'.
+
+    Raises:
+        ValueError: profilo sconosciuto, JSON non valido o valori non positivi
+    """
+    if spec in PROFILES:
+        return {'name': spec, **PROFILES[spec]}
+    path = Path(spec)
+    if not path.is_file():
+        raise ValueError(f"profilo macchina sconosciuto: {spec} (predefiniti: {', '.join(PROFILES)})")
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"profilo macchina {spec} non leggibile: {e}")
+    profile = {'name': data.get('name', path.stem), **PROFILES[DEFAULT_PROFILE]}
+    for key in PROFILES[DEFAULT_PROFILE]:
+        if key in data:
+            profile[key] = data[key]
+    for key, value in profile.items():
+        if key == 'name':
+            continue
+        if not isinstance(value, (int, float)) or value < 0 or (value == 0 and key != 'tool_change_s'):
+            raise ValueError(f"profilo macchina {spec}: valore non valido per {key}: {value!r}")
+    return profile
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. MODELLO CINEMATICO
+# ═══════════════════════════════════════════════════════════════════
+
+class OperationTable:
+    """
+    Colonne delle operazioni di tutti gli sheet, costruite una sola volta:
+    distanza di taglio, distanza in rapido, feedrate e cambi utensile per setup.
+    estimate() ricalcola i tempi di tutte le operazioni con un profilo in un
+    unico passaggio sulle colonne, senza ripercorrere i dict parsati.
+    """
+
+    def __init__(self, parsed_list: list):
+        self.parsed_list = parsed_list
+        self.cut = array('d')
+        self.rapid = array('d')
+        self.feed = array('d')
+        self.setup_bounds = []     # (inizio, fine, cambi utensile) per setup, in ordine
+        for parsed in parsed_list:
+            for setup in parsed['setups']:
+                ops = setup['operations']
+                start = len(self.cut)
+                for o in ops:
+                    self.cut.append(o['cutting_dist'] or 0.0)
+                    self.rapid.append(o['rapid_dist'] or 0.0)
+                    self.feed.append(o['max_feedrate'] or 0.0)
+                changes = sum(1 for a, b in zip(ops, ops[1:]) if a['tool_t'] != b['tool_t'])
+                self.setup_bounds.append((start, len(self.cut), changes))
+
+    def estimate(self, profile: dict) -> list:
+        """
+        Tempo [s] di ogni operazione. Ogni movimento è diviso in segmenti di
+        lunghezza media fissa, percorsi con profilo di velocità trapezoidale
+        (triangolare se il segmento è troppo corto per raggiungere la velocità).
+        Il feedrate dello sheet è limitato dal massimo della macchina; se manca
+        si usa il massimo.
+        """
+        acc = profile['accel_mm_s2']
+        v_max = profile['max_feed_mm_min'] / 60
+        v_rapid = profile['rapid_mm_min'] / 60
+        seg_cut, seg_rapid = profile['cut_segment_mm'], profile['rapid_segment_mm']
+        sqrt, ceil = math.sqrt, math.ceil
+
+        def move(d, v, seg):
+            if d <= 0:
+                return 0.0
+            n = ceil(d / seg)
+            step = d / n
+            return n * (step / v + v / acc if step * acc >= v * v else 2 * sqrt(step / acc))
+
+        return [move(c, min(f / 60, v_max) if f > 0 else v_max, seg_cut) + move(r, v_rapid, seg_rapid)
+                for c, r, f in zip(self.cut, self.rapid, self.feed)]
+
+    def retime(self, profile: dict) -> list:
+        """
+        Copie degli sheet con i tempi ricalcolati: tempo di ogni operazione e
+        tempo di ogni setup (somma delle operazioni + cambi utensile × tempo di
+        cambio). I dict originali non vengono modificati.
+        """
+        times = self.estimate(profile)
+        tc = profile['tool_change_s']
+        bounds = iter(self.setup_bounds)
+        out = []
+        for parsed in self.parsed_list:
+            setups = []
+            for setup in parsed['setups']:
+                start, end, changes = next(bounds)
+                ops = [{**o, 'cycle_time_s': round(t)} for o, t in zip(setup['operations'], times[start:end])]
+                setups.append({**setup, 'operations': ops,
+                               'cycle_time_s': round(sum(times[start:end]) + changes * tc)})
+            out.append({**parsed, 'setups': setups})
+        return out
+
+
+def retime_parsed(parsed: dict, profile: dict) -> dict:
+    """Copia di un singolo sheet con i tempi ricalcolati (vedi OperationTable.retime)."""
+    return OperationTable([parsed]).retime(profile)[0]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. OUTPUT CONSOLE
+# ═══════════════════════════════════════════════════════════════════
+
+def ranks(totals: list) -> list:
+    """Posizione in classifica (1 = migliore) di ogni gruppo."""
+    order = sorted(range(len(totals)), key=lambda i: -totals[i])
+    pos = [0] * len(totals)
+    for r, i in enumerate(order, 1):
+        pos[i] = r
+    return pos
+
+
+def print_profiles(groups: list, columns: list):
+    """
+    columns: [(etichetta, tempi ciclo per gruppo, punteggi per gruppo, ms)], la
+    prima colonna è quella con i tempi dello sheet.
+    """
+    from multi_benchmark_cnc import fmt_time
+
+    W = 20 + 26 * len(columns)
+    print("\n" + "═" * W)
+    print(f"{'TEMPI CICLO PER PROFILO MACCHINA':^{W}}")
+    print("═" * W)
+    print(f"\n  {'GRUPPO':<18}" + "".join(f"  {label[:24]:>24}" for label, *_ in columns))
+    print(f"  {'':<18}" + "".join(f"  {'tempo':>10} {'score':>6} {'pos.':>4}  " for _ in columns))
+    print(f"  {'─' * 18}" + "".join(f"  {'─' * 24}" for _ in columns))
+    base_pos = ranks(columns[0][2])
+    order = sorted(range(len(groups)), key=lambda i: base_pos[i])
+    col_pos = [ranks(c[2]) for c in columns]
+    for i in order:
+        cells = []
+        for (_, times, totals, _), pos in zip(columns, col_pos):
+            shift = base_pos[i] - pos[i]
+            mark = f"▲{shift}" if shift > 0 else (f"▼{-shift}" if shift < 0 else "")
+            cells.append(f"  {fmt_time(times[i]):>10} {totals[i]:>6.1f} {pos[i]:>3}{mark:<3}")
+        print(f"  {groups[i]:<18}" + "".join(cells))
+    print(f"\n  {'ricalcolo + classifica':<18}" + "".join(
+        f"  {'' if ms is None else f'{ms:.1f} ms':>24}" for *_, ms in columns))
+    print("═" * W + "\n")
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Tempi ciclo ricalcolati per profilo macchina",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Profili predefiniti: {', '.join(PROFILES)}. Un profilo JSON può ridefinire
+{', '.join(PROFILES[DEFAULT_PROFILE])}.
+
+Esempi:
+  python kinematics_cnc.py CASO_A/A_OPERATION_SHEET/
+  python kinematics_cnc.py CASO_B/B_GRUPPI_SELEZIONATI/ --machine hsm --machine legacy
+  python kinematics_cnc.py ./consegne/ --machine dmg_dmu50.json
+  python multi_benchmark_cnc.py ./pdf_folder/ --machine hsm
+        """)
+    parser.add_argument('inputs', nargs='+', help='File PDF, archivi zip/tar e/o cartelle')
+    parser.add_argument('--machine', action='append', default=None,
+                        help='Profilo macchina: nome predefinito o file JSON (ripetibile, default: tutti i predefiniti)')
+    parser.add_argument('--tool-life', type=int, default=20,
+                        help='Soglia vita utile utensile in minuti (default: 20)')
+    parser.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+
+    args = parser.parse_args()
+    try:
+        profiles = [load_profile(p) for p in (args.machine or PROFILES)]
+    except ValueError as e:
+        sys.exit(f"Errore: {e}")
+    from multi_benchmark_cnc import (collect_pdfs, parse_pdf, pdf_data, compute_metrics, compute_all_scores,
+                                     dedupe_group_names, PageTextCache)
+
+    pdfs = collect_pdfs(args.inputs)
+    if len(pdfs) < 2:
+        sys.exit(f"Errore: servono almeno 2 file PDF. Trovati: {len(pdfs)}")
+    tool_life_s = args.tool_life * 60
+    page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+    parsed_list = []
+    for pdf in pdfs:
+        print(f"  Parsing {pdf.name} ...")
+        parsed = parse_pdf(str(pdf), data=pdf_data(pdf), page_cache=page_cache)
+        if compute_metrics(parsed, tool_life_s) is not None:
+            parsed_list.append(parsed)
+
+    def ranking(sheets):
+        metrics_list = [compute_metrics(p, tool_life_s) for p in sheets]
+        dedupe_group_names(metrics_list)
+        _, _, totals = compute_all_scores(metrics_list)
+        return metrics_list, totals
+
+    metrics_list, totals = ranking(parsed_list)
+    columns = [("sheet (Fusion)", [m['total_time'] for m in metrics_list], totals, None)]
+    table = OperationTable(parsed_list)
+    for profile in profiles:
+        t0 = time.perf_counter()
+        m_list, p_totals = ranking(table.retime(profile))
+        ms = (time.perf_counter() - t0) * 1000
+        columns.append((profile['name'], [m['total_time'] for m in m_list], p_totals, ms))
+    print_profiles([m['group'] for m in metrics_list], columns)
+
+
+if __name__ == '__main__':
+    main()
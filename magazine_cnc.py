@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — MAGAZZINO UTENSILI CONDIVISO           ║
+║                                                                      ║
+║  Sceglie i Product da caricare in un magazzino utensili di K posti   ║
+║  condiviso tra i gruppi, massimizzando il peso (punteggio) dei cicli ║
+║  eseguibili senza cambiare magazzino: set cover pesato con vincolo   ║
+║  di capacità, esatto per pochi gruppi e greedy per molti.            ║
+║                                                                      ║
+║  Uso:  python magazine_cnc.py  <pdf/cartelle/archivi>  [opzioni]     ║
+║                                                                      ║
+║  Opzioni:                                                            ║
+║    --pockets K      Posti del magazzino (default: 24)                ║
+║    --library P      JSON *_LIBRERIE_UTENSILI (file o cartelle)       ║
+║    --weight W       Peso dei gruppi: score | uniform (def.: score)   ║
+║    --method M       auto | exact | greedy (default: auto)            ║
+║    --tool-life N    Soglia vita utile in minuti (default: 20)        ║
+║    --jobs N         Processi worker per il parsing                   ║
+║    --page-cache F   Cache SQLite del testo delle pagine              ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+DEFAULT_POCKETS = 24
+
+# Oltre questo numero di gruppi la modalità auto usa il solver greedy
+EXACT_MAX_GROUPS = 20
+
+# Le librerie Fusion indicano gli utensili a inserti come "<corpo> con inserto <inserto>",
+# mentre lo sheet riporta solo il corpo
+INSERT_SEP = ' con inserto '
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. LIBRERIE UTENSILI (JSON FUSION 360)
+# ═══════════════════════════════════════════════════════════════════
+
+def library_key(product_id: str) -> str:
+    """Codice Product come compare nello sheet (senza l'inserto)."""
+    return product_id.split(INSERT_SEP)[0].strip()
+
+
+def load_libraries(paths: list) -> dict:
+    """
+    Legge le librerie utensili (file JSON o cartelle che li contengono).
+
+    Returns:
+        {Product: {'type', 'diameter', 'description', 'library'}} — a parità di
+        Product vale la prima libreria letta.
+    """
+    files = []
+    for p in map(Path, paths):
+        files.extend(sorted(p.glob('*.json')) if p.is_dir() else [p])
+    tools = {}
+    for f in files:
+        try:
+            data = json.loads(f.read_text(encoding='utf-8')).get('data', [])
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"  ⚠ Libreria ignorata: {f.name} — {e}")
+            continue
+        for t in data:
+            if not t.get('product-id'):
+                continue
+            tools.setdefault(library_key(t['product-id']), {
+                'type': t.get('type', ''),
+                'diameter': t.get('geometry', {}).get('DC'),
+                'description': t.get('description', ''),
+                'library': f.stem,
+            })
+    return tools
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. ISTANZA DEL PROBLEMA
+# ═══════════════════════════════════════════════════════════════════
+
+def build_groups(metrics_list: list, totals: list, weight: str = 'score') -> list:
+    """
+    Un elemento per gruppo: Product richiesti (senza 'N/A'), tempo per Product da
+    compute_metrics() e peso — il punteggio finale del gruppo, o 1 con 'uniform'.
+    """
+    return [{
+        'group': m['group'],
+        'products': frozenset(p for p in m['tool_time'] if p != 'N/A'),
+        'tool_time': {p: t for p, t in m['tool_time'].items() if p != 'N/A'},
+        'score': total,
+        'weight': total if weight == 'score' else 1.0,
+    } for m, total in zip(metrics_list, totals)]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. SOLVER (SET COVER PESATO CON CAPACITÀ)
+# ═══════════════════════════════════════════════════════════════════
+
+def greedy_magazine(groups: list, k: int) -> set:
+    """
+    Greedy a rapporto peso / nuovi posti: a ogni passo aggiunge il gruppo che
+    porta più peso per Product ancora da caricare, tra quelli che ci stanno.
+    I gruppi già coperti dal magazzino corrente entrano gratis.
+
+    Returns:
+        indici dei gruppi coperti
+    """
+    loaded, chosen = set(), set()
+    while True:
+        best, best_ratio = None, -1.0
+        for i, g in enumerate(groups):
+            if i in chosen:
+                continue
+            new = len(g['products'] - loaded)
+            if len(loaded) + new > k:
+                continue
+            ratio = float('inf') if new == 0 else g['weight'] / new
+            if ratio > best_ratio:
+                best, best_ratio = i, ratio
+        if best is None:
+            return chosen
+        chosen.add(best)
+        loaded |= groups[best]['products']
+
+
+def exact_magazine(groups: list, k: int) -> set:
+    """
+    Ottimo esatto per branch and bound sui gruppi (ordinati per peso): ogni
+    gruppo è incluso o escluso, si pota quando l'unione supera k Product o
+    quando il peso residuo non può più battere la migliore soluzione. Un gruppo
+    già coperto dall'unione corrente viene incluso senza ramificare.
+
+    Returns:
+        indici dei gruppi coperti
+    """
+    order = sorted((i for i, g in enumerate(groups) if len(g['products']) <= k),
+                   key=lambda i: -groups[i]['weight'])
+    suffix = [0.0] * (len(order) + 1)
+    for pos in range(len(order) - 1, -1, -1):
+        suffix[pos] = suffix[pos + 1] + groups[order[pos]]['weight']
+    best = [-1.0, set()]
+
+    def visit(pos, loaded, weight, chosen):
+        if weight > best[0]:
+            best[0], best[1] = weight, set(chosen)
+        if pos == len(order) or weight + suffix[pos] <= best[0]:
+            return
+        i = order[pos]
+        union = loaded | groups[i]['products']
+        if len(union) <= k:
+            chosen.append(i)
+            visit(pos + 1, union, weight + groups[i]['weight'], chosen)
+            chosen.pop()
+            if len(union) == len(loaded):
+                return
+        visit(pos + 1, loaded, weight, chosen)
+
+    visit(0, frozenset(), 0.0, [])
+    return best[1]
+
+
+def fill_pockets(groups: list, chosen: set, k: int) -> list:
+    """
+    Magazzino finale: i Product dei gruppi coperti, poi i posti liberi riempiti
+    con i Product a maggior tempo di lavoro tra i gruppi non coperti (copertura
+    parziale dei loro cicli). Ordinato per tempo totale decrescente.
+    """
+    time_of = defaultdict(int)
+    for g in groups:
+        for p, t in g['tool_time'].items():
+            time_of[p] += t
+    loaded = set()
+    for i in chosen:
+        loaded |= groups[i]['products']
+    spare = defaultdict(int)
+    for i, g in enumerate(groups):
+        if i not in chosen:
+            for p in g['products'] - loaded:
+                spare[p] += g['tool_time'][p]
+    for p in sorted(spare, key=lambda p: (-spare[p], p))[:max(0, k - len(loaded))]:
+        loaded.add(p)
+    return sorted(loaded, key=lambda p: (-time_of[p], p))
+
+
+def solve_magazine(groups: list, k: int, method: str = 'auto') -> dict:
+    """
+    Risolve il magazzino di k posti con il metodo indicato ('auto' = esatto fino
+    a EXACT_MAX_GROUPS gruppi, greedy oltre).
+
+    Returns:
+        {'method', 'chosen': indici coperti, 'magazine': Product caricati,
+         'weight': peso coperto, 'elapsed'}
+    """
+    if method == 'auto':
+        method = 'exact' if len(groups) <= EXACT_MAX_GROUPS else 'greedy'
+    t0 = time.perf_counter()
+    chosen = exact_magazine(groups, k) if method == 'exact' else greedy_magazine(groups, k)
+    magazine = fill_pockets(groups, chosen, k)
+    loaded = set(magazine)
+    # Il riempimento può completare altri gruppi: anche loro restano eseguibili
+    chosen = {i for i, g in enumerate(groups) if g['products'] <= loaded}
+    return {
+        'method': method, 'chosen': chosen, 'magazine': magazine,
+        'weight': sum(groups[i]['weight'] for i in chosen),
+        'elapsed': time.perf_counter() - t0,
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. OUTPUT CONSOLE
+# ═══════════════════════════════════════════════════════════════════
+
+def print_magazine(groups: list, result: dict, k: int, library: dict):
+    from multi_benchmark_cnc import fmt_time
+
+    W = 100
+    loaded = set(result['magazine'])
+    union = set().union(*(g['products'] for g in groups)) if groups else set()
+    total_w = sum(g['weight'] for g in groups)
+    print("\n" + "═" * W)
+    print(f"{'MAGAZZINO UTENSILI CONDIVISO — ' + str(k) + ' POSTI':^{W}}")
+    print(f"metodo {result['method']} ({result['elapsed'] * 1000:.0f} ms) · "
+          f"{len(union)} Product distinti in {len(groups)} gruppi".center(W))
+    print("═" * W)
+
+    print(f"\n  {'GRUPPO':<16} {'Score':>6} {'Product':>8} {'Mancanti':>9} {'Tempo coperto':>14}  Eseguibile")
+    print(f"  {'─' * 16} {'─' * 6} {'─' * 8} {'─' * 9} {'─' * 14}  {'─' * 10}")
+    for i in sorted(range(len(groups)), key=lambda i: -groups[i]['score']):
+        g = groups[i]
+        missing = sorted(g['products'] - loaded)
+        total = sum(g['tool_time'].values())
+        covered = sum(t for p, t in g['tool_time'].items() if p in loaded)
+        pct = covered / total * 100 if total else 100.0
+        print(f"  {g['group']:<16} {g['score']:>6.1f} {len(g['products']):>8} {len(missing):>9} "
+              f"{pct:>13.1f}%  {'✓' if i in result['chosen'] else '✗'}")
+        if missing:
+            shown = ", ".join(missing[:4]) + (f" (+{len(missing) - 4})" if len(missing) > 4 else "")
+            print(f"  {'':<16} mancano: {shown}")
+
+    print(f"\n  {'#':>3} {'Product':<34} {'Tipo':<20} {'Ø':>6} {'Gruppi':>7} {'Tempo':>10}")
+    print(f"  {'─' * 3} {'─' * 34} {'─' * 20} {'─' * 6} {'─' * 7} {'─' * 10}")
+    for pos, p in enumerate(result['magazine'], 1):
+        info = library.get(p)
+        kind = info['type'] if info else ('—' if library else '')
+        dia = f"{info['diameter']:g}" if info and info['diameter'] is not None else ''
+        users = sum(1 for g in groups if p in g['products'])
+        t = sum(g['tool_time'].get(p, 0) for g in groups)
+        print(f"  {pos:>3} {p[:34]:<34} {kind[:20]:<20} {dia:>6} {users:>7} {fmt_time(t):>10}")
+
+    print(f"\n  Gruppi eseguibili: {len(result['chosen'])}/{len(groups)} — "
+          f"peso coperto {result['weight']:.1f} su {total_w:.1f} "
+          f"({result['weight'] / total_w * 100 if total_w else 100:.1f}%)")
+    if library:
+        unknown = sorted(p for p in result['magazine'] if p not in library)
+        if unknown:
+            print(f"  ⚠ {len(unknown)} Product non presenti nelle librerie: {', '.join(unknown[:5])}")
+    print("═" * W + "\n")
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 5. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Magazzino utensili condiviso (set cover pesato)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python magazine_cnc.py CASO_A/A_OPERATION_SHEET/ --pockets 30
+  python magazine_cnc.py CASO_B/B_GRUPPI_SELEZIONATI/ --library CASO_B/B_LIBRERIE_UTENSILI/
+  python magazine_cnc.py ./consegne/ --pockets 40 --weight uniform --method greedy --jobs 4
+        """)
+    parser.add_argument('inputs', nargs='+', help='File PDF, archivi zip/tar e/o cartelle')
+    parser.add_argument('--pockets', type=int, default=DEFAULT_POCKETS,
+                        help=f'Posti del magazzino utensili (default: {DEFAULT_POCKETS})')
+    parser.add_argument('--library', nargs='+', default=[],
+                        help='Librerie utensili JSON (file o cartelle *_LIBRERIE_UTENSILI) per tipo e diametro')
+    parser.add_argument('--weight', choices=('score', 'uniform'), default='score',
+                        help='Peso di un gruppo: punteggio finale o 1 per tutti (default: score)')
+    parser.add_argument('--method', choices=('auto', 'exact', 'greedy'), default='auto',
+                        help=f'Solver: auto = esatto fino a {EXACT_MAX_GROUPS} gruppi (default: auto)')
+    parser.add_argument('--tool-life', type=int, default=20,
+                        help='Soglia vita utile utensile in minuti, per i punteggi (default: 20)')
+    parser.add_argument('--jobs', type=int, default=1, help='Processi worker per il parsing (default: 1)')
+    parser.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+
+    args = parser.parse_args()
+    if args.pockets < 1:
+        sys.exit("Errore: --pockets deve essere almeno 1")
+    from multi_benchmark_cnc import (collect_pdfs, parse_pdf, pdf_data, compute_metrics, compute_all_scores,
+                                     dedupe_group_names, ingest_pdfs, PageTextCache)
+
+    pdfs = collect_pdfs(args.inputs)
+    if not pdfs:
+        sys.exit("Errore: nessun file PDF trovato")
+    tool_life_s = args.tool_life * 60
+    slots = [None] * len(pdfs)
+
+    def on_parsed(i, pdf_path, parsed):
+        print(f"  Parsing {pdf_path.name} ... {sum(len(s['operations']) for s in parsed['setups'])} operazioni")
+        slots[i] = compute_metrics(parsed, tool_life_s)
+
+    if args.jobs > 1:
+        ingest_pdfs(pdfs, on_parsed, workers=args.jobs, prefetch=2 * args.jobs, page_cache_path=args.page_cache)
+    else:
+        page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+        for i, pdf in enumerate(pdfs):
+            on_parsed(i, pdf, parse_pdf(str(pdf), data=pdf_data(pdf), page_cache=page_cache))
+    metrics_list = [m for m in slots if m is not None]
+    if not metrics_list:
+        sys.exit("Errore: nessun gruppo valido")
+    dedupe_group_names(metrics_list)
+
+    _, _, totals = compute_all_scores(metrics_list)
+    groups = build_groups(metrics_list, totals, args.weight)
+    library = load_libraries(args.library) if args.library else {}
+    result = solve_magazine(groups, args.pockets, args.method)
+    print_magazine(groups, result, args.pockets, library)
+
+
+if __name__ == '__main__':
+    main()
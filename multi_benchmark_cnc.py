@@ -8,31 +8,55 @@
 ║                                                                      ║
 ║  Uso:  python multi_benchmark_cnc.py  <cartella_pdf>                 ║
 ║        python multi_benchmark_cnc.py  a.pdf b.pdf c.pdf              ║
+║        python multi_benchmark_cnc.py  consegne.zip altre.tar.gz      ║
 ║                                                                      ║
 ║  Opzioni:                                                            ║
 ║    --xlsx  <file.xlsx>   Esporta risultati in Excel                  ║
+║    --html  <file.html>   Report HTML statico, consultabile offline   ║
 ║    --tool-life <minuti>  Soglia vita utile utensile (default: 20)    ║
+║    --jobs <N>            Processi worker per il parsing (default: 1) ║
+║    --prefetch <N>        PDF letti in anticipo, asincrono (def.: 0)  ║
+║    --page-cache <file>   Cache persistente del testo delle pagine    ║
+║    --timeout <s>         Tempo massimo di parsing per file           ║
+║    --max-rss <MB>        Memoria massima del worker per file         ║
+║    --low-memory          Libera le pagine subito, picco RSS per file ║
+║    --preview             Classifica provvisoria dagli header setup   ║
+║    --baseline <file>     Punteggi assoluti su baseline storica       ║
+║    --update-baseline     Aggiunge il run alla baseline               ║
+║    --tc-optimum          Driver efficienza sequenza utensili         ║
+║    --machine <profilo>   Tempi ricalcolati per un profilo macchina   ║
+║    --plugin <file.py>    Metriche aggiuntive registrate con @metric  ║
+║    --jsonl <file|->      Record JSON Lines man mano che sono pronti  ║
+║    --db <file.sqlite>    Archivia il run in un database SQLite       ║
+║    --case <nome>         Nome del caso per l'archivio --db           ║
+║    --library <percorso>  Librerie utensili da archiviare con --db    ║
 ╚══════════════════════════════════════════════════════════════════════╝
 """
 
 import argparse
+import bisect
+import io
 import re
 import sys
 import os
+import time
 from collections import defaultdict
 from pathlib import Path
 from itertools import combinations
 
-try:
-    import pdfplumber
-except ImportError:
-    sys.exit("Errore: installa pdfplumber con  pip install pdfplumber")
-
-
 # ═══════════════════════════════════════════════════════════════════
 # 1. PDF PARSER  (identico a benchmark_cnc.py)
 # ═══════════════════════════════════════════════════════════════════
 
+def _pdfplumber():
+    """Import differito: pdfplumber (pdfminer, PIL, ...) si carica solo quando serve parsare."""
+    try:
+        import pdfplumber
+    except ImportError:
+        sys.exit("Errore: installa pdfplumber con  pip install pdfplumber")
+    return pdfplumber
+
+
 def parse_cycle_time(text: str) -> int:
     text = text.strip().split("(")[0].strip()
     h = m = s = 0
@@ -94,20 +118,277 @@ def extract_short_name(full_name: str, filename: str = "") -> str:
     return clean[0] if clean else full_name
 
 
-def parse_pdf(pdf_path: str) -> dict:
-    result = {'name': '', 'setups': [], 'path': pdf_path}
-    with pdfplumber.open(pdf_path) as pdf:
+SETUP_MARKER = re.compile(r'Setup Sheet for Program \d+')
+OP_HEADER = re.compile(r'Operation\s+(\d+)/(\d+)\s+(T\d+)\s+D\d+\s+L\d+')
+OP_MARKER = re.compile(r'Operation\s+\d+/\d+')
+
+
+def split_setup_blocks(text: str) -> list:
+    """
+    Divide il testo in blocchi, uno per setup, tagliando agli offset dei marker
+    'Setup Sheet for Program N' trovati in un'unica scansione.
+    Equivalente a re.split(r'(?=Setup Sheet for Program \\d+)', text) + filtro.
+    """
+    starts = [m.start() for m in SETUP_MARKER.finditer(text)]
+    bounds = [0] + starts + [len(text)]
+    blocks = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+    return [b for b in blocks if b.strip() and 'Setup Sheet for Program' in b]
+
+
+def split_operations(block: str) -> list:
+    """
+    Operazioni di un setup come tuple (op_text, op_num, op_total, tool_t).
+    Ogni operazione va dalla sua intestazione 'Operation X/Y TXX DXX LXX' al marker
+    'Operation X/Y' successivo (o a fine blocco): gli offset dei marker sono raccolti
+    in una sola scansione, quindi il costo è lineare nella lunghezza del testo.
+    Equivalente al vecchio re.findall con '.*?(?=Operation\\s+\\d+/\\d+|$)' in DOTALL.
+    """
+    markers = [m.start() for m in OP_MARKER.finditer(block)]
+    # '$' senza MULTILINE corrisponde anche prima di un '\n' finale
+    eos = len(block) - 1 if block.endswith("\n") else len(block)
+    ops = []
+    for h in OP_HEADER.finditer(block):
+        k = bisect.bisect_left(markers, h.end())
+        end = markers[k] if k < len(markers) else len(block)
+        end = min(end, max(eos, h.end()))
+        ops.append((block[h.start():end],) + h.groups())
+    return ops
+
+
+# Etichette lette dal parser: una pagina che non ne contiene nessuna, né un
+# marker di operazione 'Operation X/Y' (foto utensili, viste grezzo/staffaggio,
+# pagine finali), non porta dati utili. La sola parola 'Operation' non basta:
+# compare anche in titoli e didascalie delle pagine senza dati.
+PAGE_MARKERS = ('Setup Sheet for Program', 'Document Path',
+                'Number Of', 'Estimated Cycle Time', 'Strategy:', 'Description:',
+                'Product:', 'Cutting Distance', 'Rapid Distance', 'Maximum Feedrate')
+
+
+def scan_pages(source):
+    """
+    Pre-scan veloce delle pagine con pypdfium2 (dipendenza di pdfplumber).
+    `source` è un percorso o il contenuto del PDF già letto (bytes).
+    Restituisce una lista di bool (True = pagina con marker) o None se il
+    pre-scan non è disponibile: in quel caso vanno estratte tutte le pagine.
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    try:
+        doc = pdfium.PdfDocument(source)
+    except Exception:
+        return None
+    flags = []
+    try:
+        for i in range(len(doc)):
+            page = doc[i]
+            textpage = page.get_textpage()
+            sample = textpage.get_text_range()
+            flags.append(any(k in sample for k in PAGE_MARKERS) or OP_MARKER.search(sample) is not None)
+            textpage.close()
+            page.close()
+    except Exception:
+        return None
+    finally:
+        doc.close()
+    return flags
+
+
+
+def read_setup_headers(source, pdf_path: str = None):
+    """
+    Lettura veloce dei soli header dei setup con pypdfium2, per l'anteprima (--preview).
+    Per ogni setup legge le pagine dall'intestazione fino alla prima operazione
+    (totali del setup ed elenco utensili); `source` è un percorso o i byte del PDF,
+    `pdf_path` il nome di origine. Restituisce un dict come parse_pdf()
+    con setup senza operazioni, o None se pypdfium2 non è disponibile.
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    try:
+        doc = pdfium.PdfDocument(source)
+    except Exception:
+        return None
+    headers = []
+    try:
+        collecting = False
+        for i in range(len(doc)):
+            page = doc[i]
+            textpage = page.get_textpage()
+            t = textpage.get_text_range().replace('\r\n', '\n')
+            textpage.close()
+            page.close()
+            # Come split_setup_blocks(): il testo prima del primo marker numerico
+            # è un setup se contiene l'intestazione (programma non numerico)
+            sm = SETUP_MARKER.search(t)
+            if sm or (not headers and 'Setup Sheet for Program' in t):
+                headers.append("")
+                collecting = True
+                t = t[sm.start():] if sm else t
+            if collecting:
+                op = OP_MARKER.search(t)
+                headers[-1] += (t[:op.start()] if op else t) + "\n"
+                collecting = op is None
+    except Exception:
+        return None
+    finally:
+        doc.close()
+
+    result = {'name': '', 'setups': [], 'path': pdf_path or (source if isinstance(source, str) else '')}
+    doc_match = re.search(r'Document Path:\s*(.+)', "\n".join(headers))
+    result['name'] = doc_match.group(1).strip() if doc_match else Path(result['path']).stem
+    for block in headers:
+        setup = {'program': '', 'cycle_time_s': 0, 'n_operations': 0, 'n_tools': 0,
+                 'cutting_dist': 0.0, 'rapid_dist': 0.0, 'products': [], 'operations': []}
+        prog_match = re.search(r'Setup Sheet for Program (\d+)', block)
+        if prog_match: setup['program'] = prog_match.group(1)
+        nops_match = re.search(r'Number Of Operations:\s*(\d+)', block)
+        if nops_match: setup['n_operations'] = int(nops_match.group(1))
+        ntools_match = re.search(r'Number Of Tools:\s*(\d+)', block)
+        if ntools_match: setup['n_tools'] = int(ntools_match.group(1))
+        ct_match = re.search(r'Estimated Cycle Time:\s*([\dhms:]+)', block)
+        if ct_match: setup['cycle_time_s'] = parse_cycle_time(ct_match.group(1))
+        # I primi Cutting/Rapid Distance sono i totali del setup (sezione "Total")
+        setup['cutting_dist'] = extract_field(block, 'Cutting Distance', as_float=True) or 0.0
+        setup['rapid_dist'] = extract_field(block, 'Rapid Distance', as_float=True) or 0.0
+        setup['products'] = [extract_product_code(m.group(0)) for m in re.finditer(r'Product:.*', block)]
+        result['setups'].append(setup)
+    return result
+
+# Chiavi dei font che non influenzano il testo estratto (programmi dei glifi embedded)
+_FONT_PROGRAM_KEYS = {'FontFile', 'FontFile2', 'FontFile3'}
+
+
+def _digest_pdf_object(obj, h, depth: int = 0):
+    """Aggiunge all'hash un oggetto PDF risolvendo i riferimenti (dizionari, array, stream)."""
+    from pdfminer.pdftypes import PDFStream, resolve1
+    obj = resolve1(obj)
+    if depth > 8:
+        return
+    if isinstance(obj, PDFStream):
+        _digest_pdf_object(obj.attrs, h, depth + 1)
+        h.update(obj.get_data())
+    elif isinstance(obj, dict):
+        for k in sorted(obj):
+            if k in _FONT_PROGRAM_KEYS:
+                continue
+            h.update(str(k).encode())
+            _digest_pdf_object(obj[k], h, depth + 1)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            _digest_pdf_object(v, h, depth + 1)
+    else:
+        h.update(repr(obj).encode())
+
+
+def page_fingerprint(page) -> str:
+    """
+    Impronta di una pagina pdfplumber: content stream + font usati + geometria.
+    Non richiede l'analisi del layout, quindi costa molto meno di extract_text().
+    """
+    import hashlib
+    from pdfminer.pdftypes import resolve1
+    page_obj = page.page_obj
+    h = hashlib.sha256()
+    h.update(repr((page.bbox, page.rotation)).encode())
+    for stream in page_obj.contents:
+        h.update(resolve1(stream).get_data())
+    resources = resolve1(page_obj.resources) or {}
+    _digest_pdf_object(resources.get('Font'), h)
+    return h.hexdigest()
+
+
+class PageTextCache:
+    """
+    Cache del testo estratto per impronta di pagina (page_fingerprint), condivisa tra
+    i file di un run: le pagine invariate tra revisioni successive di uno sheet non
+    vengono ri-estratte. Con `path` la cache è persistita in un file SQLite e vale
+    anche tra run diversi (e tra processi worker).
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._mem = {}
+        self._db = None
+        if path:
+            import sqlite3
+            self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+            self._db.execute("CREATE TABLE IF NOT EXISTS page_text (fingerprint TEXT PRIMARY KEY, text TEXT NOT NULL)")
+
+    def get(self, key: str):
+        text = self._mem.get(key)
+        if text is None and self._db is not None:
+            row = self._db.execute("SELECT text FROM page_text WHERE fingerprint = ?", (key,)).fetchone()
+            if row:
+                text = self._mem[key] = row[0]
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        self._mem[key] = text
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO page_text VALUES (?, ?)", (key, text))
+
+
+def parse_pdf(pdf_path: str, prescan: bool = True, data: bytes = None, page_cache: PageTextCache = None,
+              low_memory: bool = False) -> dict:
+    """
+    Parsa un operation sheet. Se `data` è fornito il PDF viene letto da memoria
+    (es. byte prefetchati) e `pdf_path` serve solo come nome/percorso di origine.
+    Con `page_cache` il testo delle pagine già viste (stessa impronta) viene riutilizzato.
+    Con `low_memory` gli oggetti di ogni pagina (caratteri, immagini, curve) vengono
+    liberati subito dopo l'estrazione del testo e il picco di RSS del parsing è
+    riportato in result['peak_rss_mb'].
+    """
+    result = {'name': '', 'setups': [], 'path': pdf_path,
+              'pages_total': 0, 'pages_skipped': 0, 'pages_reused': 0}
+    if data is not None:
+        import hashlib
+        result['sha256'] = hashlib.sha256(data).hexdigest()
+    if low_memory:
+        _reset_peak_rss()
+    source = pdf_path if data is None else data
+    flags = scan_pages(source) if prescan else None
+    with _pdfplumber().open(pdf_path if data is None else io.BytesIO(data)) as pdf:
+        result['pages_total'] = len(pdf.pages)
+        if flags is not None and len(flags) != len(pdf.pages):
+            flags = None
         full_text = ""
-        for page in pdf.pages:
-            t = page.extract_text()
+        for i, page in enumerate(pdf.pages):
+            if flags is not None and not flags[i]:
+                result['pages_skipped'] += 1
+                continue
+            if page_cache is not None:
+                key = page_fingerprint(page)
+                t = page_cache.get(key)
+                if t is None:
+                    t = page.extract_text() or ""
+                    page_cache.put(key, t)
+                else:
+                    result['pages_reused'] += 1
+            else:
+                t = page.extract_text()
+            # pdfplumber tiene in cache il layout di ogni pagina fino alla chiusura
+            # del documento: la RSS crescerebbe con il numero di pagine
+            if low_memory:
+                page.close()
             if t:
                 full_text += t + "\n"
+    if low_memory:
+        result['peak_rss_mb'] = _peak_rss_mb()
 
     doc_match = re.search(r'Document Path:\s*(.+)', full_text)
     result['name'] = doc_match.group(1).strip() if doc_match else Path(pdf_path).stem
 
-    setup_blocks = re.split(r'(?=Setup Sheet for Program \d+)', full_text)
-    setup_blocks = [b for b in setup_blocks if b.strip() and 'Setup Sheet for Program' in b]
+    setup_blocks = split_setup_blocks(full_text)
 
     for block in setup_blocks:
         setup = {'program': '', 'cycle_time_s': 0, 'n_operations': 0, 'n_tools': 0, 'operations': []}
@@ -120,8 +401,7 @@ def parse_pdf(pdf_path: str) -> dict:
         ct_match = re.search(r'Estimated Cycle Time:\s*([\dhms:]+)', block)
         if ct_match: setup['cycle_time_s'] = parse_cycle_time(ct_match.group(1))
 
-        op_pattern = r'(Operation\s+(\d+)/(\d+)\s+(T\d+)\s+D\d+\s+L\d+.*?)(?=Operation\s+\d+/\d+|$)'
-        ops = re.findall(op_pattern, block, re.DOTALL)
+        ops = split_operations(block)
         for op_text, op_num, op_total, tool_t in ops:
             cutting = extract_field(op_text, 'Cutting Distance', as_float=True) or 0.0
             rapid = extract_field(op_text, 'Rapid Distance', as_float=True) or 0.0
@@ -147,6 +427,111 @@ def parse_pdf(pdf_path: str) -> dict:
 # 2. CALCOLO METRICHE
 # ═══════════════════════════════════════════════════════════════════
 
+# Le metriche sono nodi di un grafo di dipendenze: ognuna è registrata con
+# @metric(nome, requires=(...)) e calcolata solo al primo accesso, poi
+# memorizzata nel dict restituito da compute_metrics(). Un run che chiede
+# soltanto i driver del ranking non valuta mai strategie, tool_trefs o
+# avg_util. I plugin (--plugin) registrano nuove metriche con lo stesso
+# decoratore, senza toccare questo file.
+METRICS = {}
+
+
+def metric(name: str, requires: tuple = (), replace: bool = False):
+    """
+    Decoratore: registra fn(m) come calcolo della metrica `name`, che legge le
+    dipendenze dichiarate in `requires` come m['dep']. Un nome già registrato
+    solleva ValueError, salvo replace=True (ridefinizione voluta da un plugin).
+    """
+    def register(fn):
+        if name in METRICS and not replace:
+            raise ValueError(f"Metrica '{name}' già registrata")
+        METRICS[name] = (fn, tuple(requires))
+        return fn
+    return register
+
+
+def metric_plan(names) -> list:
+    """
+    Ordine topologico delle metriche raggiungibili da `names` (dipendenze
+    prima). Solleva KeyError per una metrica o dipendenza non registrata e
+    ValueError per un ciclo.
+    """
+    order, state = [], {}
+
+    def visit(name):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'open':
+            raise ValueError(f"Ciclo nelle dipendenze della metrica '{name}'")
+        if name not in METRICS:
+            raise KeyError(name)
+        state[name] = 'open'
+        for dep in METRICS[name][1]:
+            visit(dep)
+        state[name] = 'done'
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+class Metrics(dict):
+    """
+    Metriche di uno sheet calcolate su richiesta: un accesso m['nome'] a una
+    chiave assente valuta il nodo registrato (e, a cascata, le sue
+    dipendenze) e ne memorizza il valore. Le chiavi già presenti — group,
+    full_name, tool_life_s e quelle aggiunte dai chiamanti (tc_optimal,
+    sheet_id) — si comportano come in un dict qualunque.
+
+    Anche m.get('nome') e 'nome' in m vedono le metriche registrate ancora da
+    calcolare. Iterazione, len(), keys()/items()/values() e dict(m) vedono
+    invece solo le chiavi già calcolate: per averle tutte si usa resolve().
+    """
+
+    def __init__(self, parsed: dict, ops: list, tool_life_s: int):
+        super().__init__()
+        self.parsed = parsed
+        self.ops = ops
+        self.tool_life_s = tool_life_s
+
+    def __missing__(self, name):
+        if name not in METRICS:
+            raise KeyError(name)
+        for dep in metric_plan([name]):
+            if not dict.__contains__(self, dep):
+                dict.__setitem__(self, dep, METRICS[dep][0](self))
+        return dict.__getitem__(self, name)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in METRICS
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __reduce__(self):
+        # Tra processi viaggia il dict materializzato: lo sheet parsato non serve
+        return (dict, (self.resolve(),))
+
+    def resolve(self) -> dict:
+        """Tutte le metriche registrate (plugin inclusi) come dict semplice."""
+        for name in METRICS:
+            self[name]
+        return dict(self)
+
+
+def metrics_json(m: dict) -> str:
+    """Metriche di uno sheet in JSON (archivio --db, coda di queue_cnc.py): tutte, plugin compresi."""
+    import json
+    if isinstance(m, Metrics):
+        m = m.resolve()
+    return json.dumps({k: sorted(v) if isinstance(v, set) else v for k, v in m.items()},
+                      ensure_ascii=False)
+
+
 def compute_metrics(parsed: dict, tool_life_s: int = 1200) -> dict:
     all_ops = []
     for setup in parsed['setups']:
@@ -155,62 +540,200 @@ def compute_metrics(parsed: dict, tool_life_s: int = 1200) -> dict:
         print(f"  ⚠ Attenzione: nessuna operazione trovata in '{parsed['name']}', gruppo ignorato.")
         return None
 
-    total_time = sum(s['cycle_time_s'] for s in parsed['setups'])
+    m = Metrics(parsed, all_ops, tool_life_s)
+    m['group'] = extract_short_name(parsed['name'], Path(parsed.get('path', '')).stem)
+    m['full_name'] = parsed['name']
+    m['tool_life_s'] = tool_life_s
+    return m
+
+
+@metric('total_time')
+def _total_time(m):
+    total_time = sum(s['cycle_time_s'] for s in m.parsed['setups'])
     if total_time == 0:
-        total_time = sum(o['cycle_time_s'] for o in all_ops)
-    total_cut = sum(o['cutting_dist'] for o in all_ops)
-    total_rapid = sum(o['rapid_dist'] for o in all_ops)
-    n_ops = len(all_ops)
-    setup_times = [s['cycle_time_s'] for s in parsed['setups']]
-    products = set(o['product'] for o in all_ops if o['product'] != 'N/A')
+        total_time = sum(o['cycle_time_s'] for o in m.ops)
+    return total_time
+
+
+@metric('setup_times')
+def _setup_times(m):
+    return [s['cycle_time_s'] for s in m.parsed['setups']]
 
+
+@metric('total_cut')
+def _total_cut(m):
+    return sum(o['cutting_dist'] for o in m.ops)
+
+
+@metric('total_rapid')
+def _total_rapid(m):
+    return sum(o['rapid_dist'] for o in m.ops)
+
+
+@metric('n_ops')
+def _n_ops(m):
+    return len(m.ops)
+
+
+@metric('n_ops_per_setup')
+def _n_ops_per_setup(m):
+    return [len(s['operations']) for s in m.parsed['setups']]
+
+
+@metric('n_products')
+def _n_products(m):
+    return len(set(o['product'] for o in m.ops if o['product'] != 'N/A'))
+
+
+@metric('tc_total')
+def _tc_total(m):
     tool_changes = 0
-    for setup in parsed['setups']:
+    for setup in m.parsed['setups']:
         ops = setup['operations']
         for i in range(1, len(ops)):
             if ops[i]['tool_t'] != ops[i - 1]['tool_t']:
                 tool_changes += 1
+    return tool_changes
+
+
+@metric('strategies')
+def _strategies(m):
+    return set(o['strategy'] for o in m.ops)
+
+
+@metric('n_strategies', requires=('strategies',))
+def _n_strategies(m):
+    return len(m['strategies'])
 
-    strategies = set(o['strategy'] for o in all_ops)
+
+@metric('strat_time')
+def _strat_time(m):
     strat_time = defaultdict(int)
-    strat_count = defaultdict(int)
-    tool_time = defaultdict(int)
-    tool_trefs = defaultdict(set)
-    for o in all_ops:
+    for o in m.ops:
         strat_time[o['strategy']] += o['cycle_time_s']
+    return dict(strat_time)
+
+
+@metric('strat_count')
+def _strat_count(m):
+    strat_count = defaultdict(int)
+    for o in m.ops:
         strat_count[o['strategy']] += 1
+    return dict(strat_count)
+
+
+@metric('tool_time')
+def _tool_time(m):
+    tool_time = defaultdict(int)
+    for o in m.ops:
         tool_time[o['product']] += o['cycle_time_s']
+    return dict(tool_time)
+
+
+@metric('tool_trefs')
+def _tool_trefs(m):
+    tool_trefs = defaultdict(set)
+    for o in m.ops:
         tool_trefs[o['product']].add(o['tool_t'])
+    return {k: sorted(v) for k, v in tool_trefs.items()}
+
+
+@metric('weighted_feed', requires=('total_cut',))
+def _weighted_feed(m):
+    total_cut = m['total_cut']
+    return sum(o['max_feedrate'] * o['cutting_dist'] for o in m.ops) / total_cut if total_cut else 0
+
+
+@metric('max_tool_time', requires=('tool_time',))
+def _max_tool_time(m):
+    return max(m['tool_time'].values()) if m['tool_time'] else 0
+
+
+@metric('max_tool_prod', requires=('tool_time',))
+def _max_tool_prod(m):
+    tool_time = m['tool_time']
+    return max(tool_time, key=tool_time.get) if tool_time else "N/A"
+
+
+def _tools_over(fraction: float):
+    def count(m):
+        return sum(1 for t in m['tool_time'].values() if t / m.tool_life_s > fraction)
+    return count
+
+
+metric('tools_over_50', requires=('tool_time',))(_tools_over(0.5))
+metric('tools_over_75', requires=('tool_time',))(_tools_over(0.75))
+metric('tools_over_100', requires=('tool_time',))(_tools_over(1.0))
+
+
+@metric('avg_util', requires=('tool_time',))
+def _avg_util(m):
+    tool_time = m['tool_time']
+    return sum(t / m.tool_life_s for t in tool_time.values()) / len(tool_time) if tool_time else 0
+
+
+@metric('cut_ratio', requires=('total_cut', 'total_rapid'))
+def _cut_ratio(m):
+    total_cut, total_rapid = m['total_cut'], m['total_rapid']
+    return total_cut / (total_cut + total_rapid) if (total_cut + total_rapid) else 0
+
+
+@metric('ops_per_tool', requires=('n_ops', 'n_products'))
+def _ops_per_tool(m):
+    return m['n_ops'] / m['n_products'] if m['n_products'] else 0
+
+
+@metric('productivity', requires=('total_cut', 'total_time'))
+def _productivity(m):
+    return m['total_cut'] / (m['total_time'] / 60) if m['total_time'] else 0
+
 
-    weighted_feed = sum(o['max_feedrate'] * o['cutting_dist'] for o in all_ops) / total_cut if total_cut else 0
-    max_tool_time = max(tool_time.values()) if tool_time else 0
-    max_tool_prod = max(tool_time, key=tool_time.get) if tool_time else "N/A"
-    n_products = len(products)
-    limit = tool_life_s
+@metric('max_tool_pct_cycle', requires=('max_tool_time', 'total_time'))
+def _max_tool_pct_cycle(m):
+    return m['max_tool_time'] / m['total_time'] if m['total_time'] else 0
 
-    short_name = extract_short_name(parsed['name'], Path(parsed.get('path', '')).stem)
+
+def load_plugins(specs: list):
+    """
+    Importa i plugin di metriche: un percorso a un file .py o il nome di un
+    modulo importabile. Il plugin registra le proprie metriche con
+    @metric(...) importato da multi_benchmark_cnc.
+    """
+    import importlib
+    import importlib.util
+    # Eseguito come script il modulo è '__main__': i plugin che importano
+    # multi_benchmark_cnc devono ritrovare questo registro, non una copia
+    sys.modules.setdefault('multi_benchmark_cnc', sys.modules[__name__])
+    for spec in specs:
+        if spec.endswith('.py'):
+            path = Path(spec)
+            if not path.is_file():
+                raise FileNotFoundError(f"Plugin non trovato: {spec}")
+            loader = importlib.util.spec_from_file_location(f"cnc_plugin_{path.stem}", path)
+            module = importlib.util.module_from_spec(loader)
+            loader.loader.exec_module(module)
+        else:
+            importlib.import_module(spec)
+
+
+def compute_preview_metrics(headers: dict) -> dict:
+    """Metriche provvisorie ricavate dai soli header dei setup (read_setup_headers)."""
+    setups = headers['setups']
+    n_ops = sum(s['n_operations'] for s in setups)
+    if not n_ops:
+        return None
+    total_time = sum(s['cycle_time_s'] for s in setups)
+    total_cut = sum(s['cutting_dist'] for s in setups)
+    total_rapid = sum(s['rapid_dist'] for s in setups)
+    n_products = len(set(p for s in setups for p in s['products'] if p != 'N/A'))
     return {
-        'group': short_name, 'full_name': parsed['name'],
-        'total_time': total_time, 'setup_times': setup_times,
-        'total_cut': total_cut, 'total_rapid': total_rapid,
-        'n_ops': n_ops,
-        'n_ops_per_setup': [len(s['operations']) for s in parsed['setups']],
-        'n_products': n_products, 'tc_total': tool_changes,
-        'n_strategies': len(strategies), 'strategies': strategies,
-        'strat_time': dict(strat_time), 'strat_count': dict(strat_count),
-        'tool_time': dict(tool_time),
-        'tool_trefs': {k: sorted(v) for k, v in tool_trefs.items()},
-        'weighted_feed': weighted_feed,
-        'max_tool_time': max_tool_time, 'max_tool_prod': max_tool_prod,
-        'tools_over_50': sum(1 for t in tool_time.values() if t / limit > 0.5),
-        'tools_over_75': sum(1 for t in tool_time.values() if t / limit > 0.75),
-        'tools_over_100': sum(1 for t in tool_time.values() if t / limit > 1.0),
-        'avg_util': sum(t / limit for t in tool_time.values()) / len(tool_time) if tool_time else 0,
+        'group': extract_short_name(headers['name'], Path(headers.get('path', '')).stem),
+        'full_name': headers['name'],
+        'total_time': total_time, 'total_cut': total_cut, 'total_rapid': total_rapid,
+        'n_ops': n_ops, 'n_products': n_products,
         'cut_ratio': total_cut / (total_cut + total_rapid) if (total_cut + total_rapid) else 0,
         'ops_per_tool': n_ops / n_products if n_products else 0,
         'productivity': total_cut / (total_time / 60) if total_time else 0,
-        'max_tool_pct_cycle': max_tool_time / total_time if total_time else 0,
-        'tool_life_s': tool_life_s,
     }
 
 
@@ -294,6 +817,15 @@ def compute_all_scores(metrics_list: list):
     add('Utilizzo Utensili', 'N° cambi utensile', vals, scores,
         [str(v) for v in vals])
 
+    # Solo con --tc-optimum: cambi minimi raggiungibili riordinando le operazioni.
+    # Se la ricerca si è interrotta su uno sheet il suo "ottimo" è solo una stima
+    # per eccesso e il punteggio risulterebbe gonfiato: il driver viene omesso
+    if all('tc_optimal' in m and m['tc_optimal_exact'] for m in metrics_list):
+        scores = [round(m['tc_optimal'] / m['tc_total'] * 100, 1) if m['tc_total'] else 100
+                  for m in metrics_list]
+        add('Utilizzo Utensili', 'Efficienza sequenza utensili', scores, scores,
+            [f"{m['tc_total']} (ott. {m['tc_optimal']})" for m in metrics_list])
+
     # 3. VITA UTILE
     tls = [tool_life_score(m) for m in metrics_list]
     add('Vita Utile', 'Score vita utile (non lineare)', tls, tls,
@@ -342,7 +874,12 @@ def compute_all_scores(metrics_list: list):
     add('Aggressività di Taglio', 'Produttività [mm taglio / min ciclo]', vals, scores,
         [f"{v:.0f}" for v in vals])
 
-    # Calcolo punteggi categoria
+    cat_scores, totals = category_scores(drivers, N)
+    return drivers, cat_scores, totals
+
+
+def category_scores(drivers: list, N: int):
+    """Punteggi per categoria (media dei driver) e totali pesati per N gruppi."""
     cat_scores = [{} for _ in range(N)]
     for cat in CATEGORY_WEIGHTS:
         cd = [d for d in drivers if d[0] == cat]
@@ -351,10 +888,78 @@ def compute_all_scores(metrics_list: list):
                 cat_scores[i][cat] = round(sum(d[3][i] for d in cd) / len(cd), 1)
 
     totals = [round(sum(cs[c] * w for c, w in CATEGORY_WEIGHTS.items()), 1) for cs in cat_scores]
+    return cat_scores, totals
+
+
+def apply_baseline(drivers: list, baseline: dict):
+    """
+    Sostituisce i punteggi relativi con quelli assoluti rispetto a una baseline
+    storica (baseline_cnc.py): ogni gruppo viene valutato indipendentemente dagli altri.
+    Restituisce drivers, cat_scores, totals come compute_all_scores().
+    """
+    from baseline_cnc import baseline_score
 
+    N = len(drivers[0][2])
+    drivers = [(cat, name, raws, [baseline_score(baseline, name, raws[i], scores[i]) for i in range(N)], displays)
+               for cat, name, raws, scores, displays in drivers]
+    cat_scores, totals = category_scores(drivers, N)
     return drivers, cat_scores, totals
 
 
+def compute_preview_scores(metrics_list: list):
+    """
+    Classifica provvisoria sui driver disponibili dagli header (--preview).
+    Mancano vita utile, cambi utensile e feedrate ponderato: i pesi delle
+    categorie presenti vengono rinormalizzati a 100%.
+
+    Returns:
+        drivers, cat_scores, totals come compute_all_scores(), più i pesi usati
+    """
+    N = len(metrics_list)
+    drivers = []
+
+    def add(cat, name, raws, scores, displays):
+        drivers.append((cat, name, raws, scores, displays))
+
+    vals = [m['total_time'] for m in metrics_list]
+    add('Efficienza Temporale', 'Tempo ciclo complessivo', vals,
+        relative_score_multi(vals, True), [fmt_time(v) for v in vals])
+    vals = [m['total_time'] / m['n_ops'] for m in metrics_list]
+    add('Efficienza Temporale', 'Tempo medio per operazione', vals,
+        relative_score_multi(vals, True), [fmt_time(v) for v in vals])
+    vals = [m['n_products'] for m in metrics_list]
+    add('Utilizzo Utensili', 'N° utensili univoci', vals,
+        relative_score_multi(vals, True), [str(v) for v in vals])
+    vals = [m['cut_ratio'] for m in metrics_list]
+    add('Efficienza di Percorso', 'Rapporto taglio / (taglio + rapido)', vals,
+        relative_score_multi(vals, False), [f"{v * 100:.1f}%" for v in vals])
+    vals = [m['total_cut'] + m['total_rapid'] for m in metrics_list]
+    add('Efficienza di Percorso', 'Distanza complessiva', vals,
+        relative_score_multi(vals, True), [f"{v:.0f} mm" for v in vals])
+    vals = [m['n_ops'] for m in metrics_list]
+    add('Complessità del Ciclo', 'N° operazioni totali', vals,
+        relative_score_multi(vals, True), [str(v) for v in vals])
+    vals = [m['ops_per_tool'] for m in metrics_list]
+    add('Complessità del Ciclo', 'Rapporto operazioni / utensile', vals,
+        relative_score_multi(vals, True), [f"{v:.1f}" for v in vals])
+    vals = [m['productivity'] for m in metrics_list]
+    add('Aggressività di Taglio', 'Produttività [mm taglio / min ciclo]', vals,
+        relative_score_multi(vals, False), [f"{v:.0f}" for v in vals])
+
+    present = {d[0] for d in drivers}
+    norm = sum(w for c, w in CATEGORY_WEIGHTS.items() if c in present)
+    weights = {c: w / norm for c, w in CATEGORY_WEIGHTS.items() if c in present}
+
+    cat_scores = [{} for _ in range(N)]
+    for cat in weights:
+        cd = [d for d in drivers if d[0] == cat]
+        for i in range(N):
+            cat_scores[i][cat] = round(sum(d[3][i] for d in cd) / len(cd), 1)
+
+    totals = [round(sum(cs[c] * w for c, w in weights.items()), 1) for cs in cat_scores]
+    return drivers, cat_scores, totals, weights
+
+
 # ═══════════════════════════════════════════════════════════════════
 # 4. FORMATTAZIONE OUTPUT
 # ═══════════════════════════════════════════════════════════════════
@@ -366,6 +971,21 @@ def fmt_time(s: float) -> str:
     return f"{h}h {m:02d}m {sec:02d}s" if h > 0 else f"{m}m {sec:02d}s"
 
 
+def parse_notes(parsed: dict, page_cache: bool = False) -> str:
+    """
+    Dettagli della riga di parsing di un file: pagine saltate dal pre-scan solo se
+    ce ne sono, pagine riutilizzate solo con --page-cache, picco RSS con --low-memory.
+    """
+    notes = []
+    if parsed['pages_skipped']:
+        notes.append(f"{parsed['pages_skipped']}/{parsed['pages_total']} pagine saltate")
+    if page_cache:
+        notes.append(f"{parsed['pages_reused']} riutilizzate")
+    if parsed.get('peak_rss_mb'):
+        notes.append(f"picco RSS {parsed['peak_rss_mb']:.0f} MB")
+    return f" ({', '.join(notes)})" if notes else ""
+
+
 def print_multi_report(metrics_list, drivers, cat_scores, totals):
     N = len(metrics_list)
     names = [m['group'] for m in metrics_list]
@@ -473,6 +1093,107 @@ def print_multi_report(metrics_list, drivers, cat_scores, totals):
     print("═" * W + "\n")
 
 
+def print_preview_report(metrics_list, cat_scores, totals, weights, elapsed: float):
+    N = len(metrics_list)
+    names = [m['group'] for m in metrics_list]
+    ranking = sorted(range(N), key=lambda i: totals[i], reverse=True)
+    short = {'Efficienza Temporale': 'Tempo', 'Utilizzo Utensili': 'Utensili',
+             'Efficienza di Percorso': 'Percorso', 'Complessità del Ciclo': 'Complessità',
+             'Aggressività di Taglio': 'Taglio'}
+    col_w = 12
+    W = 38 + col_w * len(weights)
+
+    print("\n" + "─" * W)
+    print(f"{'ANTEPRIMA PROVVISORIA — SOLO HEADER DEI SETUP':^{W}}")
+    print(f"{N} gruppi, pronta in {elapsed:.1f} s — in attesa del parsing completo".center(W))
+    print("─" * W)
+    print(f"  {'POS':<4} {'GRUPPO':<24} {'Score':>6}", end="")
+    for cat in weights:
+        print(f"  {short.get(cat, cat):>{col_w - 2}}", end="")
+    print()
+    for pos, idx in enumerate(ranking, 1):
+        print(f"  {str(pos) + '°':<4} {names[idx]:<24} {totals[idx]:>6.1f}", end="")
+        for cat in weights:
+            print(f"  {cat_scores[idx][cat]:>{col_w - 2}.1f}", end="")
+        print()
+    print("  Pesi rinormalizzati: " + " | ".join(f"{short.get(c, c)} {w * 100:.0f}%" for c, w in weights.items()))
+    print("  Esclusi fino al parsing completo: vita utile, cambi utensile, feedrate ponderato")
+    print("─" * W)
+
+
+def print_preview_shift(preview_names: list, metrics_list, totals):
+    """Confronta l'ordine dell'anteprima con la classifica completa."""
+    final = [metrics_list[i]['group'] for i in sorted(range(len(totals)), key=lambda i: totals[i], reverse=True)]
+    moves = [(g, preview_names.index(g) + 1, pos) for pos, g in enumerate(final, 1)
+             if g in preview_names and preview_names.index(g) + 1 != pos]
+    if not moves:
+        print("  Anteprima confermata: la classifica completa ha lo stesso ordine.\n")
+        return
+    print("  Scostamenti rispetto all'anteprima: "
+          + ", ".join(f"{g} {a}° → {b}°" for g, a, b in moves) + "\n")
+
+
+def print_plugin_metrics(metrics_list, names: list):
+    """Valori per gruppo delle metriche registrate dai plugin (--plugin)."""
+    print("  Metriche dei plugin:")
+    width = max(len(n) for n in names)
+    for name in names:
+        values = []
+        for m in metrics_list:
+            v = m[name]
+            values.append(f"{m['group']} {v:.4g}" if isinstance(v, (int, float)) else f"{m['group']} {v}")
+        print(f"    {name:<{width}}  " + " | ".join(values))
+    print()
+
+
+class JsonlWriter:
+    """
+    Output JSON Lines (--jsonl): un record per riga, scritto e svuotato subito,
+    così i processi a valle leggono i risultati man mano che sono pronti.
+    Ogni record ha un campo 'type': file, skipped, driver, ranking, end.
+    I record 'file' precedono dedupe_group_names() e riportano il gruppo letto
+    dallo sheet; la chiave per collegarli ai record 'ranking' è 'path'.
+    """
+
+    def __init__(self, stream):
+        import json
+        self._dumps = json.dumps
+        self.stream = stream
+        self.records = 0
+
+    def write(self, record_type: str, **fields):
+        record = {'type': record_type, **fields}
+        self.stream.write(self._dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+        self.stream.flush()
+        self.records += 1
+
+    def file(self, i: int, pdf_path, parsed: dict, m):
+        """Record di uno sheet appena parsato: statistiche di parsing e metriche."""
+        self.write('file', index=i, path=str(pdf_path), name=parsed['name'],
+                   n_setups=len(parsed['setups']),
+                   n_ops=sum(len(s['operations']) for s in parsed['setups']),
+                   pages_total=parsed['pages_total'], pages_skipped=parsed['pages_skipped'],
+                   pages_reused=parsed['pages_reused'], peak_rss_mb=parsed.get('peak_rss_mb'),
+                   metrics=m.resolve() if m is not None else None)
+
+    def scores(self, metrics_list, paths: list, drivers, cat_scores, totals):
+        """Record finali: uno per driver e uno per posizione della classifica."""
+        groups = [m['group'] for m in metrics_list]
+        for cat, name, raws, scores, displays in drivers:
+            self.write('driver', category=cat, name=name, values=dict(zip(groups, raws)),
+                       scores=dict(zip(groups, scores)), display=dict(zip(groups, displays)))
+        order = sorted(range(len(totals)), key=lambda i: totals[i], reverse=True)
+        for pos, i in enumerate(order, 1):
+            self.write('ranking', position=pos, group=groups[i], path=str(paths[i]),
+                       total=totals[i], categories=cat_scores[i])
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
 # ═══════════════════════════════════════════════════════════════════
 # 5. ESPORTAZIONE EXCEL
 # ═══════════════════════════════════════════════════════════════════
@@ -726,29 +1447,360 @@ def export_multi_xlsx(metrics_list, drivers, cat_scores, totals, xlsx_path: str)
 # 6. MAIN
 # ═══════════════════════════════════════════════════════════════════
 
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+ARCHIVE_SEP = '!/'
+
+
+class ArchiveMember:
+    """PDF contenuto in un archivio zip/tar, letto in memoria senza file temporanei."""
+
+    def __init__(self, archive: Path, member: str, data: bytes):
+        self.archive = archive
+        self.member = member
+        self.name = member.rsplit('/', 1)[-1]
+        self.data = data
+        import hashlib
+        self.sha256 = hashlib.sha256(data).hexdigest()
+
+    def read_bytes(self) -> bytes:
+        return self.data
+
+    def __str__(self):
+        return f"{self.archive}{ARCHIVE_SEP}{self.member}"
+
+
+def is_archive(p: Path) -> bool:
+    return p.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_archive_pdfs(archive: Path):
+    """(nome membro, byte) dei PDF di un archivio zip/tar, letti in streaming e ordinati per nome."""
+    members = []
+    if archive.name.lower().endswith('.zip'):
+        import zipfile
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith('.pdf'):
+                    members.append((info.filename, zf.read(info)))
+    else:
+        import tarfile
+        with tarfile.open(archive, 'r:*') as tf:
+            for info in tf:
+                if info.isfile() and info.name.lower().endswith('.pdf'):
+                    members.append((info.name, tf.extractfile(info).read()))
+    # Metadati macOS (__MACOSX/, ._file.pdf): non sono PDF
+    return sorted((m, d) for m, d in members if d.startswith(b'%PDF'))
+
+
+def read_archive_member(spec: str) -> bytes:
+    """Byte di un PDF indicato come 'archivio!/membro' (es. percorsi salvati da queue_cnc.py)."""
+    archive, member = spec.split(ARCHIVE_SEP, 1)
+    for name, data in iter_archive_pdfs(Path(archive)):
+        if name == member:
+            return data
+    raise FileNotFoundError(spec)
+
+
+def pdf_data(pdf) -> bytes:
+    """Contenuto già in memoria per i membri di archivio, None per i file su disco."""
+    return pdf.read_bytes() if isinstance(pdf, ArchiveMember) else None
+
+
 def collect_pdfs(inputs: list) -> list:
-    """Raccoglie tutti i PDF da una lista di file e/o cartelle."""
+    """
+    Raccoglie tutti i PDF da una lista di file, cartelle e archivi zip/tar.
+    I PDF degli archivi restano in memoria (ArchiveMember); quelli con lo stesso
+    contenuto (SHA-256) in archivi diversi vengono considerati una sola volta.
+    """
     pdfs = []
     for inp in inputs:
         p = Path(inp)
         if p.is_dir():
             found = sorted(p.glob("*.pdf")) + sorted(p.glob("*.PDF"))
+            found += sorted(f for f in p.iterdir() if f.is_file() and is_archive(f))
             pdfs.extend(found)
-        elif p.is_file() and p.suffix.lower() == '.pdf':
+        elif p.is_file() and (p.suffix.lower() == '.pdf' or is_archive(p)):
             pdfs.append(p)
         else:
-            print(f"  ⚠ Ignorato: {inp} (non è un file PDF né una cartella)")
+            print(f"  ⚠ Ignorato: {inp} (non è un file PDF, un archivio né una cartella)")
     # Rimuovi duplicati mantenendo ordine
     seen = set()
+    seen_sha = {}
     unique = []
     for p in pdfs:
         rp = p.resolve()
-        if rp not in seen:
-            seen.add(rp)
+        if rp in seen:
+            continue
+        seen.add(rp)
+        if not is_archive(p):
             unique.append(p)
+            continue
+        try:
+            members = iter_archive_pdfs(p)
+        except Exception as e:
+            print(f"  ⚠ Archivio non leggibile: {p.name} ({e})")
+            continue
+        for name, data in members:
+            member = ArchiveMember(p, name, data)
+            if member.sha256 in seen_sha:
+                print(f"  ⚠ Duplicato ignorato: {member} (stesso contenuto di {seen_sha[member.sha256]})")
+                continue
+            seen_sha[member.sha256] = member
+            unique.append(member)
     return unique
 
 
+def dedupe_group_names(metrics_list: list):
+    """Aggiunge un suffisso progressivo (_1, _2, ...) ai nomi gruppo duplicati."""
+    counts = defaultdict(int)
+    for m in metrics_list:
+        counts[m['group']] += 1
+    seen = defaultdict(int)
+    for m in metrics_list:
+        if counts[m['group']] > 1:
+            seen[m['group']] += 1
+            m['group'] = f"{m['group']}_{seen[m['group']]}"
+
+
+def preview_ranking(pdfs: list):
+    """
+    Anteprima (--preview): legge solo gli header dei setup e stampa una classifica
+    provvisoria prima del parsing completo. Restituisce i nomi gruppo nell'ordine
+    dell'anteprima, o None se non disponibile.
+    """
+    t0 = time.perf_counter()
+    previews = []
+    for pdf_path in pdfs:
+        headers = read_setup_headers(pdf_data(pdf_path) or str(pdf_path), str(pdf_path))
+        m = compute_preview_metrics(headers) if headers else None
+        if m is not None:
+            previews.append(m)
+    if len(previews) < 2:
+        print("  ⚠ Anteprima non disponibile (pypdfium2 non installato o header dei setup non trovati)")
+        return None
+    dedupe_group_names(previews)
+    _, cat_scores, totals, weights = compute_preview_scores(previews)
+    print_preview_report(previews, cat_scores, totals, weights, time.perf_counter() - t0)
+    return [previews[i]['group'] for i in sorted(range(len(totals)), key=lambda i: totals[i], reverse=True)]
+
+
+_worker_page_cache = None
+
+
+def _parse_worker(pdf_path: str, data: bytes, page_cache_path: str = None, low_memory: bool = False) -> dict:
+    """Eseguito nei processi worker: parsing da byte già letti, con cache pagine per processo."""
+    global _worker_page_cache
+    if page_cache_path and (_worker_page_cache is None or _worker_page_cache.path != page_cache_path):
+        _worker_page_cache = PageTextCache(page_cache_path)
+    return parse_pdf(pdf_path, data=data, page_cache=_worker_page_cache if page_cache_path else None,
+                     low_memory=low_memory)
+
+
+async def _ingest(pdfs: list, on_parsed, workers: int, prefetch: int, page_cache_path: str = None,
+                  low_memory: bool = False):
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    # Coda limitata: al massimo `prefetch` PDF letti e in attesa di parsing.
+    # Quando è piena i lettori si fermano (backpressure) e la memoria resta limitata.
+    queue = asyncio.Queue(maxsize=prefetch)
+    reading = asyncio.Semaphore(prefetch)
+
+    with ThreadPoolExecutor(max_workers=prefetch) as io_pool, \
+            ProcessPoolExecutor(max_workers=workers) as cpu_pool:
+
+        async def fetch(i, pdf_path):
+            async with reading:
+                data = await loop.run_in_executor(io_pool, pdf_path.read_bytes)
+                await queue.put((i, pdf_path, data))
+
+        async def produce():
+            await asyncio.gather(*(fetch(i, p) for i, p in enumerate(pdfs)))
+            for _ in range(workers):
+                await queue.put(None)
+
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                i, pdf_path, data = item
+                parsed = await loop.run_in_executor(cpu_pool, _parse_worker, str(pdf_path), data,
+                                                    page_cache_path, low_memory)
+                on_parsed(i, pdf_path, parsed)
+
+        await asyncio.gather(produce(), *(consume() for _ in range(workers)))
+
+
+def ingest_pdfs(pdfs: list, on_parsed, workers: int = 1, prefetch: int = 4, page_cache_path: str = None,
+                low_memory: bool = False):
+    """
+    Ingestione asincrona: legge i file in parallelo (I/O, es. share di rete) con
+    una coda limitata e passa i byte a un pool di processi per l'estrazione.
+    on_parsed(indice, percorso, parsed) viene chiamata man mano che ogni PDF
+    è pronto, nell'ordine di completamento.
+    """
+    import asyncio
+    asyncio.run(_ingest(pdfs, on_parsed, max(1, workers), max(1, prefetch), page_cache_path, low_memory))
+
+
+def _rss_mb(pid: int):
+    """RSS corrente del processo in MB (Linux, /proc), None se non misurabile."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _reset_peak_rss() -> bool:
+    """Azzera il picco di RSS del processo (VmHWM, Linux ≥ 4.0), per misurarlo per file."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """
+    Picco di RSS del processo in MB dall'ultimo _reset_peak_rss(). Senza /proc
+    ripiega su getrusage(), che però è il picco dall'avvio del processo.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _isolated_worker(conn, page_cache_path: str = None, low_memory: bool = False):
+    """Processo worker riciclabile: riceve (indice, percorso, byte), risponde (indice, parsed, errore)."""
+    page_cache = PageTextCache(page_cache_path) if page_cache_path else None
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        i, pdf_path, data = task
+        try:
+            conn.send((i, parse_pdf(pdf_path, data=data, page_cache=page_cache, low_memory=low_memory), None))
+        except Exception as e:
+            conn.send((i, None, f"{type(e).__name__}: {e}"))
+
+
+class IsolatedParser:
+    """
+    Parsing con limiti per file: ogni PDF viene elaborato in un processo worker
+    separato. Se supera il tempo (`timeout`, secondi) o la memoria (`max_rss_mb`,
+    RSS misurato da /proc) il worker viene terminato e sostituito, e il file
+    viene segnalato come saltato senza bloccare gli altri.
+    """
+
+    POLL_S = 0.1
+
+    def __init__(self, workers: int = 1, timeout: float = None, max_rss_mb: float = None,
+                 page_cache_path: str = None, low_memory: bool = False):
+        import multiprocessing
+        self._mp = multiprocessing
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.page_cache_path = page_cache_path
+        self.low_memory = low_memory
+        self.respawned = 0
+
+    def _spawn(self):
+        parent, child = self._mp.Pipe()
+        proc = self._mp.Process(target=_isolated_worker, args=(child, self.page_cache_path, self.low_memory),
+                                 daemon=True)
+        proc.start()
+        child.close()
+        return {'proc': proc, 'conn': parent, 'task': None, 'started': 0.0}
+
+    def _kill(self, w):
+        w['conn'].close()
+        w['proc'].kill()
+        w['proc'].join()
+
+    def run(self, pdfs: list, on_parsed, on_skipped):
+        """
+        on_parsed(indice, percorso, parsed) per i file completati,
+        on_skipped(indice, percorso, motivo) per quelli oltre i limiti o in errore.
+        """
+        from multiprocessing.connection import wait
+
+        pending = list(enumerate(pdfs))[::-1]
+        pool = [self._spawn() for _ in range(min(self.workers, len(pdfs)))]
+        try:
+            while pending or any(w['task'] for w in pool):
+                for w in pool:
+                    if w['task'] is None and pending:
+                        w['task'] = pending.pop()
+                        w['started'] = time.monotonic()
+                        w['conn'].send((w['task'][0], str(w['task'][1]), pdf_data(w['task'][1])))
+
+                busy = [w for w in pool if w['task']]
+                ready = wait([w['conn'] for w in busy], timeout=self.POLL_S)
+                for k, w in enumerate(pool):
+                    if w['task'] is None:
+                        continue
+                    i, pdf_path = w['task']
+                    reason = None
+                    if w['conn'] in ready:
+                        try:
+                            _, parsed, error = w['conn'].recv()
+                        except (EOFError, OSError):
+                            parsed, error = None, f"worker terminato inatteso (exit {w['proc'].exitcode})"
+                        if parsed is not None:
+                            on_parsed(i, pdf_path, parsed)
+                        else:
+                            on_skipped(i, pdf_path, error)
+                        w['task'] = None
+                        # Worker cresciuto oltre il limite (cache, frammentazione): riciclato
+                        rss = _rss_mb(w['proc'].pid) if self.max_rss_mb else None
+                        if error is None and (rss is None or rss <= self.max_rss_mb):
+                            continue
+                    else:
+                        elapsed = time.monotonic() - w['started']
+                        rss = _rss_mb(w['proc'].pid) if self.max_rss_mb else None
+                        if self.timeout and elapsed > self.timeout:
+                            reason = f"oltre il limite di tempo ({self.timeout:g} s)"
+                        elif rss is not None and rss > self.max_rss_mb:
+                            reason = f"oltre il limite di memoria ({rss:.1f} MB > {self.max_rss_mb:g} MB)"
+                        elif not w['proc'].is_alive():
+                            reason = f"worker terminato inatteso (exit {w['proc'].exitcode})"
+                        else:
+                            continue
+                        on_skipped(i, pdf_path, reason)
+                        w['task'] = None
+                    self._kill(w)
+                    pool[k] = self._spawn()
+                    self.respawned += 1
+        finally:
+            for w in pool:
+                try:
+                    w['conn'].send(None)
+                except (OSError, ValueError):
+                    pass
+                w['proc'].join(timeout=1)
+                if w['proc'].is_alive():
+                    w['proc'].kill()
+                    w['proc'].join()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="CNC Operation Sheet — Multi-Group Vendor Rating Benchmark",
@@ -759,15 +1811,82 @@ Esempi:
   python multi_benchmark_cnc.py  NC01.pdf NC02.pdf NC03.pdf TP01.pdf TP02.pdf TP03.pdf
   python multi_benchmark_cnc.py  ./pdf_folder/ --xlsx classifica.xlsx
   python multi_benchmark_cnc.py  ./pdf_folder/ --xlsx classifica.xlsx --tool-life 15
+  python multi_benchmark_cnc.py  ./pdf_folder/ --html classifica.html
+  python multi_benchmark_cnc.py  consegne_GDL01.zip consegne_GDL02.tar.gz
+  python multi_benchmark_cnc.py  ./pdf_folder/ --preview --jobs 4
+  python multi_benchmark_cnc.py  ./pdf_folder/ --jobs 4 --timeout 120 --max-rss 1500
+  python multi_benchmark_cnc.py  ./pdf_folder/ --low-memory --max-rss 300
+  python multi_benchmark_cnc.py  ./pdf_folder/ --baseline baseline.json --update-baseline
+  python multi_benchmark_cnc.py  ./pdf_folder/ --tc-optimum
+  python multi_benchmark_cnc.py  ./pdf_folder/ --machine hsm
+  python multi_benchmark_cnc.py  ./pdf_folder/ --plugin metriche_extra.py
+  python multi_benchmark_cnc.py  ./pdf_folder/ --jsonl - | consumatore
         """)
     parser.add_argument('inputs', nargs='+',
-                        help='Uno o più file PDF, oppure una cartella contenente i PDF')
+                        help='Uno o più file PDF, archivi zip/tar di PDF, oppure una cartella contenente i PDF')
     parser.add_argument('--xlsx', help='Esporta risultati in file Excel', default=None)
+    parser.add_argument('--html', default=None,
+                        help='Report HTML statico con tabelle virtualizzate, consultabile offline (vedi report_html_cnc.py)')
     parser.add_argument('--tool-life', type=int, default=20,
                         help='Soglia vita utile utensile in minuti (default: 20)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Processi worker per il parsing (default: 1 = sequenziale)')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='PDF letti in anticipo in modo asincrono, es. da share di rete (default: 0)')
+    parser.add_argument('--page-cache', default=None,
+                        help='File SQLite in cui persistere il testo delle pagine già estratte, tra run diversi')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Tempo massimo di parsing per file in secondi: oltre, il file viene saltato')
+    parser.add_argument('--max-rss', type=float, default=None,
+                        help='Memoria massima (RSS, MB) del worker per file: oltre, il file viene saltato')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='Libera gli oggetti di ogni pagina dopo l\'estrazione e riporta il picco di RSS per file')
+    parser.add_argument('--preview', action='store_true',
+                        help='Classifica provvisoria dai soli header dei setup, poi raffinata col parsing completo')
+    parser.add_argument('--baseline', default=None,
+                        help='Punteggi assoluti rispetto a una baseline storica (file JSON di baseline_cnc.py)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Aggiunge gli sheet di questo run alla baseline indicata con --baseline')
+    parser.add_argument('--tc-optimum', action='store_true',
+                        help='Aggiunge il driver "Efficienza sequenza utensili": cambi minimi (sequencing_cnc.py) / cambi effettivi')
+    parser.add_argument('--machine', default=None,
+                        help='Ricalcola i tempi ciclo con un profilo macchina (nome o file JSON, vedi kinematics_cnc.py); '
+                             'non si combina con --baseline')
+    parser.add_argument('--plugin', action='append', default=[],
+                        help='File .py o modulo che registra metriche aggiuntive con @metric (ripetibile)')
+    parser.add_argument('--jsonl', default=None,
+                        help='Scrive record JSON Lines (file, driver, classifica) man mano che sono pronti; "-" = stdout')
+    parser.add_argument('--db', help='Archivia operazioni, metriche e punteggi in un database SQLite', default=None)
+    parser.add_argument('--case', help='Nome del caso per l\'archivio --db (default: cartella del primo input)',
+                        default=None)
+    parser.add_argument('--library', action='append', default=[],
+                        help='Librerie utensili JSON (file o cartelle) da archiviare con --db (ripetibile)')
 
     args = parser.parse_args()
     tool_life_s = args.tool_life * 60
+    jsonl = None
+    if args.jsonl == '-':
+        # Su stdout resta solo il flusso JSON Lines: il report console passa su stderr
+        jsonl = JsonlWriter(sys.stdout)
+        sys.stdout = sys.stderr
+    elif args.jsonl:
+        jsonl = JsonlWriter(open(args.jsonl, 'w', encoding='utf-8'))
+    if args.machine and args.baseline:
+        sys.exit("Errore: --machine non si combina con --baseline: la baseline è costruita "
+                 "sui tempi degli sheet e i tempi ricalcolati risulterebbero tutti fuori scala")
+    machine = None
+    if args.machine:
+        from kinematics_cnc import load_profile, retime_parsed
+        try:
+            machine = load_profile(args.machine)
+        except ValueError as e:
+            sys.exit(f"Errore: {e}")
+    core_metrics = set(METRICS)
+    try:
+        load_plugins(args.plugin)
+    except (ImportError, SyntaxError, FileNotFoundError, ValueError) as e:
+        sys.exit(f"Errore nel plugin: {e}")
+    plugin_metrics = [name for name in METRICS if name not in core_metrics]
 
     # Raccolta PDF
     pdfs = collect_pdfs(args.inputs)
@@ -778,45 +1897,137 @@ Esempi:
     for p in pdfs:
         print(f"    • {p.name}")
 
-    # Parsing
+    # Anteprima dagli header, prima del parsing completo
+    preview_names = preview_ranking(pdfs) if args.preview else None
+
+    # Parsing — le metriche sono calcolate appena ogni PDF è pronto
     print()
-    metrics_list = []
-    for pdf_path in pdfs:
-        print(f"  Parsing {pdf_path.name} ...")
-        parsed = parse_pdf(str(pdf_path))
+    slots = [None] * len(pdfs)
+    if args.tc_optimum:
+        from sequencing_cnc import tc_optimum
+
+    def on_parsed(i, pdf_path, parsed):
         n_ops = sum(len(s['operations']) for s in parsed['setups'])
-        print(f"  → {parsed['name']}: {n_ops} operazioni in {len(parsed['setups'])} setup")
-        m = compute_metrics(parsed, tool_life_s)
-        if m is not None:
-            metrics_list.append(m)
+        print(f"  → {parsed['name']}: {n_ops} operazioni in {len(parsed['setups'])} setup"
+              f"{parse_notes(parsed, args.page_cache)}")
+        # Con --machine si valutano i tempi ricalcolati; l'archivio --db conserva quelli dello sheet
+        m = compute_metrics(retime_parsed(parsed, machine) if machine else parsed, tool_life_s)
+        if args.tc_optimum and m is not None:
+            m['tc_optimal'], m['tc_optimal_exact'] = tc_optimum(parsed)
+            if not m['tc_optimal_exact']:
+                print("    ⚠ Sequenza ottima non garantita (ricerca interrotta): driver 'Efficienza sequenza utensili' omesso")
+        slots[i] = (parsed, m)
+        if jsonl:
+            jsonl.file(i, pdf_path, parsed, m)
+
+    def on_skipped(i, pdf_path, reason):
+        print(f"  ⚠ Saltato: {pdf_path.name} — {reason}")
+        skipped.append((pdf_path, reason))
+        if jsonl:
+            jsonl.write('skipped', index=i, path=str(pdf_path), reason=reason)
+
+    skipped = []
+    if args.timeout or args.max_rss:
+        print(f"  Parsing isolato: {max(1, args.jobs)} worker, limiti per file "
+              f"{f'{args.timeout:g} s' if args.timeout else '—'} / {f'{args.max_rss:g} MB' if args.max_rss else '—'} ...")
+        isolated = IsolatedParser(args.jobs, args.timeout, args.max_rss, args.page_cache, args.low_memory)
+        isolated.run(pdfs, on_parsed, on_skipped)
+        if isolated.respawned:
+            print(f"  Worker riavviati: {isolated.respawned}")
+    elif args.jobs > 1 or args.prefetch > 0:
+        print(f"  Parsing asincrono: {max(1, args.jobs)} worker, prefetch {max(1, args.prefetch)} file ...")
+        ingest_pdfs(pdfs, on_parsed, workers=args.jobs, prefetch=args.prefetch,
+                    page_cache_path=args.page_cache, low_memory=args.low_memory)
+    else:
+        page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+        for i, pdf_path in enumerate(pdfs):
+            print(f"  Parsing {pdf_path.name} ...")
+            on_parsed(i, pdf_path, parse_pdf(str(pdf_path), data=pdf_data(pdf_path), page_cache=page_cache,
+                                             low_memory=args.low_memory))
+
+    done = [slot for slot in slots if slot is not None]
+    extracted = sum(p['pages_total'] - p['pages_skipped'] for p, _ in done)
+    reused = sum(p['pages_reused'] for p, _ in done)
+    if args.page_cache and extracted:
+        print(f"  Cache pagine: {reused}/{extracted} pagine riutilizzate ({reused / extracted * 100:.1f}%)")
+
+    peaks = [p['peak_rss_mb'] for p, _ in done if p.get('peak_rss_mb')]
+    if peaks:
+        print(f"  Picco RSS per file: max {max(peaks):.0f} MB, mediana {sorted(peaks)[len(peaks) // 2]:.0f} MB")
+
+    if skipped:
+        print(f"  File saltati (limiti o errori): {len(skipped)} — esclusi dalla classifica")
+
+    # Ordine di input (non di completamento), per una classifica deterministica
+    valid = [(p, m) for p, m in done if m is not None]
+    parsed_list = [p for p, _ in valid]
+    metrics_list = [m for _, m in valid]
 
     if len(metrics_list) < 2:
         sys.exit(f"Errore: servono almeno 2 gruppi validi. Parsati con successo: {len(metrics_list)}")
 
     # Check nomi duplicati
-    group_names = [m['group'] for m in metrics_list]
-    if len(set(group_names)) != len(group_names):
-        # Aggiungi suffisso progressivo ai duplicati
-        counts = defaultdict(int)
-        for m in metrics_list:
-            counts[m['group']] += 1
-        if any(c > 1 for c in counts.values()):
-            seen = defaultdict(int)
-            for m in metrics_list:
-                if counts[m['group']] > 1:
-                    seen[m['group']] += 1
-                    m['group'] = f"{m['group']}_{seen[m['group']]}"
+    dedupe_group_names(metrics_list)
 
     # Scoring
     drivers, cat_scores, totals = compute_all_scores(metrics_list)
+    if args.baseline:
+        from baseline_cnc import load_baseline, save_baseline, update_baseline, sheet_id
+        baseline = load_baseline(args.baseline) if Path(args.baseline).exists() else None
+        if baseline is None and not args.update_baseline:
+            sys.exit(f"Errore: baseline non trovata: {args.baseline}")
+        if baseline is not None and baseline['n_sheets']:
+            drivers, cat_scores, totals = apply_baseline(drivers, baseline)
+            print(f"\n  Punteggi assoluti rispetto alla baseline {args.baseline} ({baseline['n_sheets']} sheet storici)")
+
+    if jsonl:
+        jsonl.scores(metrics_list, [p['path'] for p in parsed_list], drivers, cat_scores, totals)
 
     # Output
     print_multi_report(metrics_list, drivers, cat_scores, totals)
+    if preview_names:
+        print_preview_shift(preview_names, metrics_list, totals)
+    if plugin_metrics:
+        print_plugin_metrics(metrics_list, plugin_metrics)
 
     # Excel
     if args.xlsx:
         export_multi_xlsx(metrics_list, drivers, cat_scores, totals, args.xlsx)
 
+    # HTML
+    if args.html:
+        from report_html_cnc import export_html
+        size = export_html(metrics_list, drivers, cat_scores, totals, args.html)
+        print(f"\n  ✓ Report HTML ({size / 1024:.0f} KB) salvato in: {args.html}")
+
+    # Aggiornamento incrementale della baseline, dopo lo scoring del run
+    if args.baseline and args.update_baseline:
+        from baseline_cnc import new_baseline
+        if baseline is None:
+            baseline = new_baseline()
+        added = update_baseline(baseline, metrics_list, [sheet_id(p) for p in parsed_list])
+        save_baseline(baseline, args.baseline)
+        print(f"\n  ✓ Baseline {args.baseline}: {added} sheet aggiunti ({baseline['n_sheets']} in totale)")
+
+    # Archivio storico
+    if args.db:
+        from warehouse_cnc import save_run
+        first = Path(args.inputs[0])
+        case_name = args.case or (first if first.is_dir() else first.parent).resolve().name
+        libraries = None
+        if args.library:
+            from magazine_cnc import load_libraries
+            libraries = load_libraries(args.library)
+        run_id = save_run(args.db, case_name, tool_life_s, parsed_list, metrics_list,
+                          drivers, cat_scores, totals, argv=sys.argv[1:],
+                          machine=machine['name'] if machine else None, libraries=libraries)
+        print(f"\n  ✓ Run #{run_id} ({case_name}) archiviato in: {args.db}")
+
+    if jsonl:
+        jsonl.write('end', n_files=len(pdfs), n_ranked=len(metrics_list), n_skipped=len(skipped))
+        if jsonl.stream is not sys.__stdout__:
+            jsonl.stream.close()
+
 
 if __name__ == '__main__':
     main()
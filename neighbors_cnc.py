@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — CICLI STORICI PIÙ SIMILI (K-NN)        ║
+║                                                                      ║
+║  Archivio persistente (SQLite) dei vettori di metriche degli sheet   ║
+║  storici (compute_metrics() + istogramma dei tempi per strategia)    ║
+║  con un KD-tree per caso sulle feature normalizzate: i k cicli più   ║
+║  vicini a un nuovo sheet. La ricerca esatta su 100k sheet va da      ║
+║  pochi ms a ~100 ms secondo la distribuzione delle feature; la       ║
+║  ricerca approssimata --checks resta sotto il millisecondo.          ║
+║                                                                      ║
+║  Uso:  python neighbors_cnc.py  build --store fs.sqlite <pdf/cart.>  ║
+║        python neighbors_cnc.py  build --store fs.sqlite --from-db db ║
+║        python neighbors_cnc.py  query --store fs.sqlite <pdf> [-k 5] ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import hashlib
+import heapq
+import math
+import sqlite3
+import sys
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    id         INTEGER PRIMARY KEY,
+    sha256     TEXT NOT NULL,
+    case_name  TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    name       TEXT,
+    path       TEXT,
+    features   BLOB NOT NULL,
+    UNIQUE (sha256, case_name)
+);
+CREATE TABLE IF NOT EXISTS trees (
+    case_name TEXT PRIMARY KEY,
+    built_at  TEXT NOT NULL,
+    n_sheets  INTEGER NOT NULL,
+    mean      BLOB NOT NULL,
+    scale     BLOB NOT NULL,
+    ids       BLOB NOT NULL,
+    splits    BLOB NOT NULL,
+    points    BLOB NOT NULL
+);
+"""
+
+# Metriche di compute_metrics() nel vettore; le grandezze estensive (tempi,
+# distanze, conteggi) entrano come logaritmo, così contano i rapporti e non le
+# differenze assolute
+METRIC_FEATURES = (
+    ('total_time', True), ('n_ops', True), ('n_products', True), ('tc_total', True),
+    ('cut_ratio', False), ('weighted_feed', False), ('total_cut', True), ('productivity', False),
+)
+
+# Istogramma dei tempi per strategia (quota del tempo ciclo): le strategie meno
+# frequenti confluiscono nell'ultima colonna
+STRATEGY_BINS = ('Facing', 'Adaptive', 'Pocket', 'Contour 2D', 'Contour', 'Flat', 'Scallop', 'Drilling')
+
+FEATURE_NAMES = tuple(n for n, _ in METRIC_FEATURES) + tuple(f"t% {s}" for s in STRATEGY_BINS) + ("t% altre",)
+DIM = len(FEATURE_NAMES)
+
+# Punti per foglia del KD-tree: sotto questa soglia la scansione lineare è più veloce
+LEAF_SIZE = 8
+
+# Punti campionati per scegliere la dimensione di split (quella a varianza massima)
+SPLIT_SAMPLE = 64
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. FEATURE
+# ═══════════════════════════════════════════════════════════════════
+
+def feature_vector(m: dict) -> array:
+    """Vettore grezzo (non normalizzato) di uno sheet dalle metriche di compute_metrics()."""
+    v = array('d', (math.log1p(m[name]) if log else float(m[name]) for name, log in METRIC_FEATURES))
+    total = sum(m['strat_time'].values()) or 1
+    binned = [m['strat_time'].get(s, 0) / total for s in STRATEGY_BINS]
+    v.extend(binned)
+    v.append(max(0.0, 1 - sum(binned)))
+    return v
+
+
+def normalization(vectors: list) -> tuple:
+    """Media e deviazione standard per feature (1 dove la feature è costante)."""
+    n = len(vectors)
+    mean = array('d', (sum(v[d] for v in vectors) / n for d in range(DIM)))
+    scale = array('d', (math.sqrt(sum((v[d] - mean[d]) ** 2 for v in vectors) / n) or 1.0 for d in range(DIM)))
+    return mean, scale
+
+
+def normalize(v, mean, scale) -> list:
+    return [(x - mu) / s for x, mu, s in zip(v, mean, scale)]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. KD-TREE IMPLICITO
+# ═══════════════════════════════════════════════════════════════════
+
+def build_kdtree(points: list) -> tuple:
+    """
+    KD-tree bilanciato in forma implicita: i punti vengono riordinati in modo che
+    ogni intervallo [lo, hi) abbia la mediana in (lo + hi) // 2, a sinistra i
+    minori e a destra i maggiori lungo la dimensione di split salvata in quella
+    posizione. Nessun puntatore: l'albero è tre array contigui, salvabili come BLOB.
+
+    Returns:
+        (order, splits): permutazione degli indici dei punti e dimensione di split
+        per posizione (0 nelle foglie)
+    """
+    n = len(points)
+    order = list(range(n))
+    splits = bytearray(n)
+    stack = [(0, n)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo <= LEAF_SIZE:
+            continue
+        sample = order[lo:hi:max(1, (hi - lo) // SPLIT_SAMPLE)]
+
+        def spread(d):
+            vals = [points[i][d] for i in sample]
+            mu = sum(vals) / len(vals)
+            return sum((x - mu) ** 2 for x in vals)
+
+        d = max(range(DIM), key=spread)
+        order[lo:hi] = sorted(order[lo:hi], key=lambda i: points[i][d])
+        mid = (lo + hi) // 2
+        splits[mid] = d
+        stack.append((lo, mid))
+        stack.append((mid + 1, hi))
+    return order, splits
+
+
+class KDTree:
+    """KD-tree di un caso caricato dallo store: punti normalizzati in ordine d'albero."""
+
+    def __init__(self, ids: array, splits: bytes, points: array, mean: array, scale: array):
+        self.ids, self.splits, self.points = ids, splits, points
+        self.mean, self.scale = mean, scale
+        self.n = len(ids)
+
+    def query(self, v, k: int, exclude: set = frozenset(), checks: int = None) -> list:
+        """
+        I k punti più vicini (distanza euclidea sulle feature normalizzate).
+
+        Esatta (checks=None): discesa in profondità verso il lato del punto, poi
+        l'altro lato solo se la cella (distanza accumulata dimensione per
+        dimensione) è più vicina del k-esimo candidato.
+        Approssimata (checks=N): best-bin-first, le celle in ordine di distanza
+        stimata finché non sono stati confrontati N punti; i vicini restituiti
+        sono quasi sempre gli stessi con un numero di confronti limitato.
+
+        Returns:
+            [(distanza, id sheet)] in ordine crescente
+        """
+        q = normalize(v, self.mean, self.scale)
+        pts, splits, ids = self.points, self.splits, self.ids
+        dist = math.dist
+        heap = []     # max-heap (-distanza, id) dei migliori k
+
+        def consider(pos):
+            sid = ids[pos]
+            if sid in exclude:
+                return
+            d = dist(q, pts[pos * DIM:(pos + 1) * DIM])
+            if len(heap) < k:
+                heapq.heappush(heap, (-d, sid))
+            elif d < -heap[0][0]:
+                heapq.heapreplace(heap, (-d, sid))
+
+        def worst2():
+            return heap[0][0] * heap[0][0] if len(heap) == k else math.inf
+
+        if checks is None:
+            offset = [0.0] * DIM    # distanza dalla cella corrente lungo ogni dimensione
+
+            def visit(lo, hi, bound):
+                if hi - lo <= LEAF_SIZE:
+                    for pos in range(lo, hi):
+                        consider(pos)
+                    return
+                mid = (lo + hi) // 2
+                d = splits[mid]
+                diff = q[d] - pts[mid * DIM + d]
+                consider(mid)
+                near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+                visit(*near, bound)
+                old = offset[d]
+                far_bound = bound - old * old + diff * diff
+                if far_bound < worst2():
+                    offset[d] = diff
+                    visit(*far, far_bound)
+                    offset[d] = old
+
+            visit(0, self.n, 0.0)
+        else:
+            cells = [(0.0, 0, self.n)]
+            checked = 0
+            while cells and checked < checks:
+                bound, lo, hi = heapq.heappop(cells)
+                if bound >= worst2():
+                    break
+                while hi - lo > LEAF_SIZE:
+                    mid = (lo + hi) // 2
+                    d = splits[mid]
+                    diff = q[d] - pts[mid * DIM + d]
+                    consider(mid)
+                    checked += 1
+                    if diff < 0:
+                        far, (lo, hi) = (mid + 1, hi), (lo, mid)
+                    else:
+                        far, (lo, hi) = (lo, mid), (mid + 1, hi)
+                    far_bound = bound + diff * diff
+                    if far_bound < worst2():
+                        heapq.heappush(cells, (far_bound, *far))
+                for pos in range(lo, hi):
+                    consider(pos)
+                checked += hi - lo
+        return sorted((-nd, sid) for nd, sid in heap)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. STORE
+# ═══════════════════════════════════════════════════════════════════
+
+def connect(store_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(store_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def add_sheet(conn, m: dict, case_name: str, sha256: str, path: str = '') -> bool:
+    """Aggiunge il vettore di uno sheet; uno sheet già presente per lo stesso caso viene saltato."""
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO sheets (sha256, case_name, group_name, name, path, features) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (sha256, case_name, m['group'], m['full_name'], str(path), feature_vector(m).tobytes()))
+    return cur.rowcount > 0
+
+
+def rebuild_trees(conn, cases: set):
+    """Ricalcola normalizzazione e KD-tree dei casi indicati (dopo ogni build)."""
+    for case_name in sorted(cases):
+        rows = conn.execute("SELECT id, features FROM sheets WHERE case_name = ? ORDER BY id",
+                            (case_name,)).fetchall()
+        if not rows:
+            continue
+        raw = [array('d', blob) for _, blob in rows]
+        mean, scale = normalization(raw)
+        points = [normalize(v, mean, scale) for v in raw]
+        order, splits = build_kdtree(points)
+        flat = array('d')
+        for i in order:
+            flat.extend(points[i])
+        conn.execute(
+            "INSERT OR REPLACE INTO trees VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (case_name, datetime.now().isoformat(timespec='seconds'), len(rows), mean.tobytes(),
+             scale.tobytes(), array('q', (rows[i][0] for i in order)).tobytes(), bytes(splits), flat.tobytes()))
+
+
+def load_tree(conn, case_name: str) -> KDTree:
+    row = conn.execute("SELECT mean, scale, ids, splits, points FROM trees WHERE case_name = ?",
+                       (case_name,)).fetchone()
+    if row is None:
+        return None
+    mean, scale, ids, splits, points = row
+    return KDTree(array('q', ids), splits, array('d', points), array('d', mean), array('d', scale))
+
+
+def build_from_pdfs(store_path: str, pdfs: list, case_name: str, tool_life_s: int, page_cache_path: str = None):
+    """Parsa i PDF, ne salva i vettori e ricostruisce il KD-tree del caso. Restituisce (aggiunti, già presenti)."""
+    from multi_benchmark_cnc import PageTextCache, parse_pdf, pdf_data, compute_metrics
+
+    page_cache = PageTextCache(page_cache_path) if page_cache_path else None
+    conn = connect(store_path)
+    added = present = 0
+    try:
+        with conn:
+            for pdf in pdfs:
+                data = pdf_data(pdf)
+                if data is None:
+                    data = Path(pdf).read_bytes()
+                sha = hashlib.sha256(data).hexdigest()
+                if conn.execute("SELECT 1 FROM sheets WHERE sha256 = ? AND case_name = ?",
+                                (sha, case_name)).fetchone():
+                    present += 1
+                    continue
+                print(f"  Parsing {pdf.name} ...")
+                m = compute_metrics(parse_pdf(str(pdf), data=data, page_cache=page_cache), tool_life_s)
+                if m is not None and add_sheet(conn, m, case_name, sha, pdf):
+                    added += 1
+            rebuild_trees(conn, {case_name})
+    finally:
+        conn.close()
+    return added, present
+
+
+def build_from_warehouse(store_path: str, db_path: str, tool_life_s: int):
+    """Importa gli sheet dell'archivio warehouse_cnc.py, senza riparsare i PDF."""
+    from warehouse_cnc import connect as connect_db, load_parsed
+    from multi_benchmark_cnc import compute_metrics
+
+    src = connect_db(db_path)
+    conn = connect(store_path)
+    added = present = 0
+    cases = set()
+    try:
+        rows = src.execute(
+            "SELECT g.file_id, r.case_name, g.group_name FROM group_results g "
+            "JOIN runs r ON r.id = g.run_id GROUP BY g.file_id, r.case_name ORDER BY MAX(r.id)").fetchall()
+        with conn:
+            for file_id, case_name, group in rows:
+                parsed = load_parsed(src, file_id)
+                m = compute_metrics(parsed, tool_life_s)
+                if m is None:
+                    continue
+                m['group'] = group
+                if add_sheet(conn, m, case_name, parsed['sha256'], parsed['path']):
+                    added += 1
+                    cases.add(case_name)
+                else:
+                    present += 1
+            rebuild_trees(conn, cases)
+    finally:
+        src.close()
+        conn.close()
+    return added, present
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def cmd_build(args):
+    tool_life_s = args.tool_life * 60
+    t0 = time.perf_counter()
+    if args.from_db:
+        if not Path(args.from_db).exists():
+            sys.exit(f"Errore: database non trovato: {args.from_db}")
+        added, present = build_from_warehouse(args.store, args.from_db, tool_life_s)
+    else:
+        from multi_benchmark_cnc import collect_pdfs
+
+        if not args.inputs:
+            sys.exit("Errore: indicare PDF, archivi o cartelle da archiviare, oppure --from-db")
+        pdfs = collect_pdfs(args.inputs)
+        first = Path(args.inputs[0])
+        case_name = args.case or (first if first.is_dir() else first.parent).resolve().name
+        added, present = build_from_pdfs(args.store, pdfs, case_name, tool_life_s, args.page_cache)
+    print(f"\n  ✓ Store {args.store}: {added} sheet aggiunti, {present} già presenti "
+          f"({time.perf_counter() - t0:.1f} s)\n")
+
+
+def cmd_query(args):
+    from multi_benchmark_cnc import collect_pdfs, parse_pdf, pdf_data, compute_metrics, fmt_time, PageTextCache
+
+    conn = connect(args.store)
+    try:
+        cases = [r[0] for r in conn.execute("SELECT case_name FROM trees ORDER BY case_name")]
+        case_name = args.case or (cases[0] if len(cases) == 1 else None)
+        if case_name is None:
+            sys.exit(f"Errore: indicare --case ({', '.join(cases) or 'store vuoto'})")
+        t0 = time.perf_counter()
+        tree = load_tree(conn, case_name)
+        if tree is None:
+            sys.exit(f"Errore: caso non presente nello store: {case_name} ({', '.join(cases)})")
+        load_ms = (time.perf_counter() - t0) * 1000
+        print(f"\n  Caso {case_name}: {tree.n} sheet storici (KD-tree caricato in {load_ms:.1f} ms)")
+
+        page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+        for pdf in collect_pdfs(args.inputs):
+            data = pdf_data(pdf)
+            if data is None:
+                data = Path(pdf).read_bytes()
+            m = compute_metrics(parse_pdf(str(pdf), data=data, page_cache=page_cache), args.tool_life * 60)
+            if m is None:
+                continue
+            # Lo sheet stesso, se già archiviato, non è un "ciclo passato"
+            sha = hashlib.sha256(data).hexdigest()
+            exclude = {r[0] for r in conn.execute("SELECT id FROM sheets WHERE sha256 = ?", (sha,))}
+            t0 = time.perf_counter()
+            hits = tree.query(feature_vector(m), args.k, exclude, args.checks)
+            query_ms = (time.perf_counter() - t0) * 1000
+
+            rows = {r[0]: r[1:] for r in conn.execute(
+                f"SELECT id, group_name, path, features FROM sheets WHERE id IN ({', '.join('?' * len(hits))})",
+                [sid for _, sid in hits])} if hits else {}
+            print(f"\n  {m['group']} ({pdf.name}) — {fmt_time(m['total_time'])}, {m['n_ops']} op., "
+                  f"{m['n_products']} Product, {m['tc_total']} cambi — query {query_ms:.2f} ms")
+            print(f"  {'#':>3} {'Distanza':>9}  {'Gruppo':<12} {'File':<28} {'Tempo':>10} {'Op.':>5} {'Prod.':>6} "
+                  f"{'Cambi':>6}  Strategia prevalente")
+            print(f"  {'─' * 3} {'─' * 9}  {'─' * 12} {'─' * 28} {'─' * 10} {'─' * 5} {'─' * 6} {'─' * 6}  {'─' * 20}")
+            for rank, (dist, sid) in enumerate(hits, 1):
+                group, path, blob = rows[sid]
+                f = array('d', blob)
+                hist = dict(zip(FEATURE_NAMES[len(METRIC_FEATURES):], f[len(METRIC_FEATURES):]))
+                top = max(hist, key=hist.get)
+                print(f"  {rank:>3} {dist:>9.3f}  {group[:12]:<12} {Path(path or '').name[:28]:<28} {fmt_time(round(math.expm1(f[0]))):>10} "
+                      f"{round(math.expm1(f[1])):>5} {round(math.expm1(f[2])):>6} {round(math.expm1(f[3])):>6}  "
+                      f"{top[3:]} {hist[top] * 100:.0f}%")
+    finally:
+        conn.close()
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Cicli storici più simili (k-NN su KD-tree)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python neighbors_cnc.py build --store fs.sqlite CASO_B/B_GRUPPI_SELEZIONATI --case CASO_B
+  python neighbors_cnc.py build --store fs.sqlite --from-db results.sqlite
+  python neighbors_cnc.py query --store fs.sqlite nuovo_sheet.pdf --case CASO_B
+  python neighbors_cnc.py query --store fs.sqlite ./arrivi/ --case CASO_A -k 10
+  python neighbors_cnc.py query --store fs.sqlite nuovo_sheet.pdf --case CASO_B --checks 256
+        """)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help='Aggiunge PDF (o un archivio --db) allo store e ricostruisce il KD-tree')
+    p_query = sub.add_parser('query', help='Sheet storici più simili a nuovi PDF, nello stesso caso')
+    for p in (p_build, p_query):
+        p.add_argument('--store', required=True, help='File SQLite dello store delle feature')
+        p.add_argument('--tool-life', type=int, default=20,
+                       help='Soglia vita utile utensile in minuti (default: 20)')
+        p.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+    p_build.add_argument('inputs', nargs='*', help='File PDF, archivi zip/tar e/o cartelle')
+    p_build.add_argument('--case', help='Nome del caso (default: cartella del primo input)')
+    p_build.add_argument('--from-db', help='Importa dall\'archivio scritto da multi_benchmark_cnc.py --db')
+    p_query.add_argument('inputs', nargs='+', help='Nuovi PDF, archivi o cartelle da confrontare')
+    p_query.add_argument('--case', help='Caso in cui cercare (obbligatorio se lo store ne contiene più di uno)')
+    p_query.add_argument('-k', type=int, default=5, help='Numero di sheet simili (default: 5)')
+    p_query.add_argument('--checks', type=int, default=None,
+                         help='Ricerca approssimata: confronta al massimo N sheet (default: ricerca esatta)')
+
+    args = parser.parse_args()
+    if args.command == 'query' and args.k < 1:
+        parser.error("-k deve essere un intero positivo")
+    if args.command == 'query' and args.checks is not None and args.checks < 1:
+        parser.error("--checks deve essere un intero positivo")
+    if args.command == 'query' and not Path(args.store).exists():
+        sys.exit(f"Errore: store non trovato: {args.store}")
+    {'build': cmd_build, 'query': cmd_query}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — CODA DI LAVORO DISTRIBUITA             ║
+║                                                                      ║
+║  Coda SQLite su disco condiviso: un coordinatore inserisce i PDF,    ║
+║  un numero qualsiasi di worker (su uno o più host) parsa e calcola   ║
+║  le metriche, il coordinatore calcola la classifica a lavoro finito. ║
+║                                                                      ║
+║  Uso:  python queue_cnc.py  submit --queue q.sqlite  <pdf/cartelle>  ║
+║        python queue_cnc.py  work   --queue q.sqlite  [--processes N] ║
+║        python queue_cnc.py  status --queue q.sqlite                  ║
+║        python queue_cnc.py  rank   --queue q.sqlite  [--wait]        ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    name        TEXT PRIMARY KEY,
+    created_at  TEXT NOT NULL,
+    tool_life_s INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY,
+    batch       TEXT NOT NULL REFERENCES batches(name),
+    path        TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    claimed_at  REAL,
+    heartbeat   REAL,
+    finished_at REAL,
+    error       TEXT,
+    parsed      TEXT,
+    metrics     TEXT,
+    UNIQUE (batch, path)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(batch, status);
+"""
+
+# Stati di un job: pending → running → done | failed (running scaduto → di nuovo claimabile)
+STATUSES = ('pending', 'running', 'done', 'failed')
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. CODA
+# ═══════════════════════════════════════════════════════════════════
+
+def connect(queue_path: str) -> sqlite3.Connection:
+    # Journal di default (non WAL): il WAL non funziona su filesystem di rete
+    conn = sqlite3.connect(queue_path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def submit(queue_path: str, batch: str, pdfs: list, tool_life_s: int, retry_failed: bool = False):
+    """Inserisce i PDF nella coda del batch. Restituisce (nuovi, già presenti, riaccodati)."""
+    from multi_benchmark_cnc import ArchiveMember, ARCHIVE_SEP
+
+    conn = connect(queue_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR IGNORE INTO batches (name, created_at, tool_life_s) VALUES (?, ?, ?)",
+                     (batch, datetime.now().isoformat(timespec='seconds'), tool_life_s))
+        added = 0
+        for p in pdfs:
+            # Membri di archivio: 'archivio!/membro', riletti dal worker
+            path = (f"{p.archive.resolve()}{ARCHIVE_SEP}{p.member}" if isinstance(p, ArchiveMember)
+                    else str(Path(p).resolve()))
+            cur = conn.execute("INSERT OR IGNORE INTO jobs (batch, path) VALUES (?, ?)", (batch, path))
+            added += cur.rowcount
+        requeued = 0
+        if retry_failed:
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, error = NULL "
+                "WHERE batch = ? AND status = 'failed'", (batch,)).rowcount
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return added, len(pdfs) - added, requeued
+
+
+def claim(conn, batch: str, worker: str, stale_s: float, max_attempts: int):
+    """
+    Assegna al worker un job in attesa, o un job 'running' il cui heartbeat è
+    più vecchio di stale_s (worker caduto). Restituisce (id, path, tool_life_s) o None.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'claim scaduto troppe volte' "
+            "WHERE batch = ? AND status = 'running' AND heartbeat < ? AND attempts >= ?",
+            (batch, now - stale_s, max_attempts))
+        row = conn.execute(
+            "SELECT j.id, j.path, b.tool_life_s FROM jobs j JOIN batches b ON b.name = j.batch "
+            "WHERE j.batch = ? AND (j.status = 'pending' OR (j.status = 'running' AND j.heartbeat < ?)) "
+            "ORDER BY j.id LIMIT 1", (batch, now - stale_s)).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "claimed_at = ?, heartbeat = ?, error = NULL WHERE id = ?",
+                (worker, now, now, row[0]))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+def remaining(conn, batch: str) -> int:
+    return conn.execute("SELECT COUNT(*) FROM jobs WHERE batch = ? AND status IN ('pending', 'running')",
+                        (batch,)).fetchone()[0]
+
+
+class Heartbeat(threading.Thread):
+    """Aggiorna periodicamente l'heartbeat del job in corso, finché il parsing non termina."""
+
+    def __init__(self, queue_path: str, job_id: int, worker: str, interval: float):
+        super().__init__(daemon=True)
+        self.queue_path, self.job_id, self.worker, self.interval = queue_path, job_id, worker, interval
+        self.stop = threading.Event()
+
+    def run(self):
+        conn = connect(self.queue_path)
+        try:
+            while not self.stop.wait(self.interval):
+                conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                             (time.time(), self.job_id, self.worker))
+        finally:
+            conn.close()
+
+
+def work_loop(queue_path: str, batch: str, stale_s: float = 300, max_attempts: int = 3,
+              page_cache_path: str = None, poll_s: float = 2.0, wait: bool = False) -> int:
+    """
+    Ciclo di un worker: claim → parse_pdf() + compute_metrics() → scrittura del
+    risultato. Termina quando il batch non ha più job da fare (o mai, con wait).
+    Restituisce il numero di job completati.
+    """
+    from multi_benchmark_cnc import (PageTextCache, parse_pdf, compute_metrics, metrics_json, read_archive_member,
+                                     ARCHIVE_SEP)
+
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    page_cache = PageTextCache(page_cache_path) if page_cache_path else None
+    conn = connect(queue_path)
+    done = 0
+    try:
+        while True:
+            job = claim(conn, batch, worker, stale_s, max_attempts)
+            if job is None:
+                if not wait and remaining(conn, batch) == 0:
+                    return done
+                time.sleep(poll_s)
+                continue
+
+            job_id, path, tool_life_s = job
+            print(f"  [{worker}] job #{job_id}: {Path(path).name} ...", flush=True)
+            beat = Heartbeat(queue_path, job_id, worker, max(1.0, stale_s / 3))
+            beat.start()
+            try:
+                data = read_archive_member(path) if ARCHIVE_SEP in path else None
+                parsed = parse_pdf(path, data=data, page_cache=page_cache)
+                m = compute_metrics(parsed, tool_life_s)
+                if m is None:
+                    raise ValueError("nessuna operazione trovata nel PDF")
+                status, error = 'done', None
+            except Exception as e:
+                parsed, m = None, None
+                status, error = 'failed', f"{type(e).__name__}: {e}"
+            finally:
+                beat.stop.set()
+                beat.join()
+
+            # Riaccoda gli errori finché restano tentativi; scrive solo se il claim è ancora nostro
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN ? = 'failed' AND attempts < ? THEN 'pending' ELSE ? END, "
+                "error = ?, parsed = ?, metrics = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, max_attempts, status, error,
+                 json.dumps(parsed, ensure_ascii=False) if parsed else None,
+                 metrics_json(m) if m else None, time.time(), job_id, worker))
+            conn.execute("COMMIT")
+            if cur.rowcount == 0:
+                print(f"  [{worker}] job #{job_id}: claim scaduto e riassegnato, risultato scartato", flush=True)
+            elif status == 'done':
+                done += 1
+            else:
+                print(f"  [{worker}] job #{job_id}: {error}", flush=True)
+    finally:
+        conn.close()
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. COORDINATORE
+# ═══════════════════════════════════════════════════════════════════
+
+def batch_status(conn, batch: str) -> dict:
+    counts = dict.fromkeys(STATUSES, 0)
+    for status, n in conn.execute("SELECT status, COUNT(*) FROM jobs WHERE batch = ? GROUP BY status", (batch,)):
+        counts[status] = n
+    return counts
+
+
+def rank_batch(queue_path: str, batch: str, tool_life_s: int = None):
+    """
+    Classifica del batch dai record delle metriche scritti dai worker, in ordine
+    di inserimento. Con tool_life_s le metriche vengono ricalcolate dai dati parsati.
+    Restituisce (metrics_list, drivers, cat_scores, totals, falliti).
+    """
+    from multi_benchmark_cnc import compute_metrics, compute_all_scores, dedupe_group_names
+
+    conn = connect(queue_path)
+    try:
+        rows = conn.execute("SELECT parsed, metrics FROM jobs WHERE batch = ? AND status = 'done' ORDER BY id",
+                            (batch,)).fetchall()
+        failed = conn.execute("SELECT path, error FROM jobs WHERE batch = ? AND status = 'failed' ORDER BY id",
+                              (batch,)).fetchall()
+    finally:
+        conn.close()
+
+    metrics_list = []
+    for parsed, metrics in rows:
+        if tool_life_s is not None:
+            m = compute_metrics(json.loads(parsed), tool_life_s)
+        else:
+            m = json.loads(metrics)
+            m['strategies'] = set(m['strategies'])
+        metrics_list.append(m)
+    if len(metrics_list) < 2:
+        sys.exit(f"Errore: servono almeno 2 gruppi completati nel batch. Trovati: {len(metrics_list)}")
+    dedupe_group_names(metrics_list)
+    drivers, cat_scores, totals = compute_all_scores(metrics_list)
+    return metrics_list, drivers, cat_scores, totals, failed
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def cmd_submit(args):
+    from multi_benchmark_cnc import collect_pdfs
+
+    pdfs = collect_pdfs(args.inputs)
+    if not pdfs:
+        sys.exit("Errore: nessun file PDF da accodare")
+    added, present, requeued = submit(args.queue, args.batch, pdfs, args.tool_life * 60, args.retry_failed)
+    print(f"\n  Batch '{args.batch}': {added} job accodati, {present} già presenti"
+          + (f", {requeued} falliti riaccodati" if requeued else "") + "\n")
+
+
+def cmd_work(args):
+    kwargs = dict(stale_s=args.stale, max_attempts=args.max_attempts,
+                  page_cache_path=args.page_cache, poll_s=args.poll, wait=args.wait)
+    if args.processes <= 1:
+        n = work_loop(args.queue, args.batch, **kwargs)
+        print(f"\n  Worker terminato: {n} job completati\n")
+        return
+    import multiprocessing
+    procs = [multiprocessing.Process(target=work_loop, args=(args.queue, args.batch), kwargs=kwargs)
+             for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    print(f"\n  {args.processes} worker terminati\n")
+
+
+def cmd_status(args):
+    conn = connect(args.queue)
+    try:
+        batches = [args.batch] if args.batch else \
+            [r[0] for r in conn.execute("SELECT name FROM batches ORDER BY created_at")]
+        print(f"\n  {'Batch':<24} {'Attesa':>7} {'In corso':>9} {'Fatti':>7} {'Falliti':>8}")
+        print(f"  {'─' * 24} {'─' * 7} {'─' * 9} {'─' * 7} {'─' * 8}")
+        for batch in batches:
+            c = batch_status(conn, batch)
+            print(f"  {batch:<24} {c['pending']:>7} {c['running']:>9} {c['done']:>7} {c['failed']:>8}")
+        now = time.time()
+        for batch in batches:
+            for job_id, path, worker, hb, attempts in conn.execute(
+                    "SELECT id, path, worker, heartbeat, attempts FROM jobs "
+                    "WHERE batch = ? AND status = 'running' ORDER BY id", (batch,)):
+                print(f"    ▸ #{job_id} {Path(path).name} — {worker}, tentativo {attempts}, "
+                      f"heartbeat {now - hb:.0f} s fa")
+            for job_id, path, error in conn.execute(
+                    "SELECT id, path, error FROM jobs WHERE batch = ? AND status = 'failed' ORDER BY id", (batch,)):
+                print(f"    ✗ #{job_id} {Path(path).name} — {error}")
+    finally:
+        conn.close()
+    print()
+
+
+def cmd_rank(args):
+    from multi_benchmark_cnc import print_multi_report, export_multi_xlsx
+
+    conn = connect(args.queue)
+    try:
+        while True:
+            c = batch_status(conn, args.batch)
+            if c['pending'] + c['running'] == 0:
+                break
+            if not args.wait:
+                sys.exit(f"Errore: batch '{args.batch}' non completato "
+                         f"({c['pending']} in attesa, {c['running']} in corso). Usa --wait per attendere.")
+            time.sleep(args.poll)
+    finally:
+        conn.close()
+
+    tool_life_s = args.tool_life * 60 if args.tool_life is not None else None
+    *result, failed = rank_batch(args.queue, args.batch, tool_life_s)
+    print_multi_report(*result)
+    for path, error in failed:
+        print(f"  ⚠ Escluso (fallito): {Path(path).name} — {error}")
+    if args.xlsx:
+        export_multi_xlsx(*result, args.xlsx)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Coda di lavoro distribuita",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python queue_cnc.py submit --queue /mnt/shared/q.sqlite --batch archivio ./archivio/
+  python queue_cnc.py work   --queue /mnt/shared/q.sqlite --batch archivio --processes 4
+  python queue_cnc.py status --queue /mnt/shared/q.sqlite
+  python queue_cnc.py rank   --queue /mnt/shared/q.sqlite --batch archivio --wait --xlsx archivio.xlsx
+        """)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_submit = sub.add_parser('submit', help='Accoda PDF (file e/o cartelle) in un batch')
+    p_work = sub.add_parser('work', help='Avvia uno o più worker che elaborano i job del batch')
+    p_status = sub.add_parser('status', help='Stato dei job per batch')
+    p_rank = sub.add_parser('rank', help='Classifica del batch a lavoro finito (coordinatore)')
+    for p in (p_submit, p_work, p_status, p_rank):
+        p.add_argument('--queue', required=True, help='File SQLite della coda (su disco condiviso)')
+    for p in (p_submit, p_work, p_rank):
+        p.add_argument('--batch', default='default', help='Nome del batch (default: default)')
+    p_status.add_argument('--batch', default=None, help='Solo questo batch (default: tutti)')
+    p_submit.add_argument('inputs', nargs='+', help='File PDF, archivi zip/tar e/o cartelle da accodare')
+    p_submit.add_argument('--tool-life', type=int, default=20,
+                          help='Soglia vita utile utensile in minuti per le metriche (default: 20)')
+    p_submit.add_argument('--retry-failed', action='store_true', help='Riaccoda i job falliti del batch')
+    p_work.add_argument('--processes', type=int, default=1, help='Worker locali da avviare (default: 1)')
+    p_work.add_argument('--stale', type=float, default=300,
+                        help='Secondi senza heartbeat dopo cui un job in corso viene riassegnato (default: 300)')
+    p_work.add_argument('--max-attempts', type=int, default=3, help='Tentativi massimi per job (default: 3)')
+    p_work.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+    p_work.add_argument('--poll', type=float, default=2.0, help='Intervallo di polling in secondi (default: 2)')
+    p_work.add_argument('--wait', action='store_true', help='Resta in attesa di nuovi job invece di terminare')
+    p_rank.add_argument('--wait', action='store_true', help='Attende che tutti i job siano completati')
+    p_rank.add_argument('--poll', type=float, default=5.0, help='Intervallo di polling in secondi (default: 5)')
+    p_rank.add_argument('--tool-life', type=int, default=None,
+                        help='Ricalcola le metriche con questa soglia in minuti (default: quella del batch)')
+    p_rank.add_argument('--xlsx', help='Esporta risultati in file Excel', default=None)
+
+    args = parser.parse_args()
+    if args.command != 'submit' and not Path(args.queue).exists():
+        sys.exit(f"Errore: coda non trovata: {args.queue}")
+    {'submit': cmd_submit, 'work': cmd_work, 'status': cmd_status, 'rank': cmd_rank}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║        CNC OPERATION SHEET — REPORT HTML STATICO (OFFLINE)           ║
+║                                                                      ║
+║  Un unico file HTML, senza dipendenze esterne: classifica, matrice   ║
+║  dei punteggi per driver e vita utile per utensile sono incorporati  ║
+║  come JSON compatto e mostrati in tabelle virtualizzate (solo le     ║
+║  righe visibili sono nel DOM), con ordinamento e filtri. Anche una   ║
+║  classifica da 1000 gruppi si apre subito nel browser.               ║
+║                                                                      ║
+║  Uso:  python report_html_cnc.py  <risultati.jsonl>  -o report.html  ║
+║        python multi_benchmark_cnc.py  <pdf...>  --html report.html   ║
+║                                                                      ║
+║  Il file .jsonl è quello scritto da multi_benchmark_cnc.py --jsonl.  ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. DATI INCORPORATI
+# ═══════════════════════════════════════════════════════════════════
+
+def html_payload(metrics_list, drivers, cat_scores, totals, title: str) -> dict:
+    """
+    Dati del report in forma compatta: liste parallele per gruppo, indici al
+    posto dei nomi ripetuti e tempi per utensile come coppie piatte
+    [indice Product, secondi, ...]. Le stringhe di visualizzazione dei driver
+    sono quelle del report console, così i valori coincidono.
+    """
+    from multi_benchmark_cnc import CATEGORY_WEIGHTS
+    groups = [m['group'] for m in metrics_list]
+    cats = list(CATEGORY_WEIGHTS)
+    products = sorted(set(p for m in metrics_list for p in m['tool_time']))
+    prod_index = {p: k for k, p in enumerate(products)}
+    tools = []
+    for m in metrics_list:
+        flat = []
+        for p, t in m['tool_time'].items():
+            flat += [prod_index[p], t]
+        tools.append(flat)
+    return {
+        'title': title,
+        'generated': time.strftime('%Y-%m-%d %H:%M'),
+        'tool_life_s': metrics_list[0]['tool_life_s'],
+        'groups': groups,
+        'totals': totals,
+        'cats': cats,
+        'weights': [CATEGORY_WEIGHTS[c] for c in cats],
+        'cat_scores': [[round(cs.get(c, 0), 1) for c in cats] for cs in cat_scores],
+        'drivers': [[cats.index(cat) if cat in cats else -1, name] for cat, name, _, _, _ in drivers],
+        'scores': [list(scores) for _, _, _, scores, _ in drivers],
+        'display': [list(displays) for _, _, _, _, displays in drivers],
+        'products': products,
+        'tools': tools,
+    }
+
+
+def render_html(payload: dict) -> str:
+    # JSON dentro <script>: "</" va spezzato perché il browser non chiuda il tag
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    return (HTML_TEMPLATE
+            .replace('__TITLE__', _escape(payload['title']))
+            .replace('__DATA__', data))
+
+
+def _escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def export_html(metrics_list, drivers, cat_scores, totals, html_path: str, title: str = None) -> int:
+    """Scrive il report HTML e ne restituisce la dimensione in byte."""
+    title = title or f"Vendor Rating — {len(metrics_list)} gruppi"
+    html = render_html(html_payload(metrics_list, drivers, cat_scores, totals, title))
+    Path(html_path).write_text(html, encoding='utf-8')
+    return len(html.encode('utf-8'))
+
+
+def load_jsonl(jsonl_path: str):
+    """
+    Ricostruisce metriche, driver, categorie e totali dai record di
+    multi_benchmark_cnc.py --jsonl. I gruppi sono quelli finali dei record
+    'ranking', collegati ai record 'file' tramite il percorso.
+    """
+    files, drivers, ranking = {}, [], []
+    with open(jsonl_path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            r = json.loads(line)
+            if r['type'] == 'file' and r.get('metrics'):
+                files[r['path']] = r['metrics']
+            elif r['type'] == 'driver':
+                drivers.append(r)
+            elif r['type'] == 'ranking':
+                ranking.append(r)
+    if not ranking:
+        raise ValueError(f"nessun record 'ranking' in {jsonl_path}: il run è terminato prima dello scoring?")
+    # Ordine dei gruppi = ordine di input (percorso nei record 'file')
+    order = {path: k for k, path in enumerate(files)}
+    ranking.sort(key=lambda r: order.get(r['path'], len(order)))
+    metrics_list, cat_scores, totals = [], [], []
+    for r in ranking:
+        m = files.get(r['path'], {})
+        metrics_list.append({'group': r['group'], 'tool_time': m.get('tool_time', {}),
+                             'tool_life_s': m.get('tool_life_s', 1200)})
+        cat_scores.append(r['categories'])
+        totals.append(r['total'])
+    groups = [m['group'] for m in metrics_list]
+    driver_rows = [(d['category'], d['name'], [d['values'][g] for g in groups],
+                    [d['scores'][g] for g in groups], [d['display'][g] for g in groups])
+                   for d in drivers]
+    return metrics_list, driver_rows, cat_scores, totals
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. PAGINA (HTML + CSS + JS, SENZA RISORSE ESTERNE)
+# ═══════════════════════════════════════════════════════════════════
+
+HTML_TEMPLATE = r"""<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>__TITLE__</title>
+<style>
+  body { font: 13px/1.4 Arial, Helvetica, sans-serif; margin: 0; color: #222; background: #f4f6fa; }
+  header { background: #2f5496; color: #fff; padding: 12px 20px; }
+  header h1 { font-size: 18px; margin: 0 0 4px; }
+  header .meta { opacity: .85; }
+  .podio { margin-top: 6px; }
+  .podio span { margin-right: 18px; font-weight: bold; }
+  nav { padding: 8px 20px 0; }
+  nav button { border: 1px solid #c5cfe0; border-bottom: 0; background: #e3e9f4; padding: 6px 14px;
+               cursor: pointer; font: inherit; border-radius: 4px 4px 0 0; }
+  nav button.on { background: #fff; font-weight: bold; }
+  section { display: none; background: #fff; margin: 0 20px 20px; padding: 10px; border: 1px solid #c5cfe0; }
+  section.on { display: block; }
+  .tools { margin-bottom: 8px; display: flex; gap: 12px; align-items: center; flex-wrap: wrap; }
+  .tools input[type=search] { width: 240px; padding: 4px 6px; }
+  .count { color: #666; }
+  .vt { overflow: auto; height: calc(100vh - 190px); min-height: 240px; border: 1px solid #d9dee8; }
+  .vt-h, .r { display: grid; }
+  .vt-h { position: sticky; top: 0; z-index: 1; background: #2f5496; color: #fff; font-weight: bold; }
+  .vt-h div { padding: 6px; cursor: pointer; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;
+              border-right: 1px solid #4a6db0; user-select: none; }
+  .vt-h div.asc::after { content: " ▲"; }
+  .vt-h div.desc::after { content: " ▼"; }
+  .space { position: relative; }
+  .r { position: absolute; left: 0; right: 0; height: 26px; border-bottom: 1px solid #eef0f4; }
+  .r:hover { background: #f0f5ff; }
+  .r div { padding: 0 6px; line-height: 26px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+  .n { text-align: right; font-variant-numeric: tabular-nums; }
+  .hi { background: #e2efda; } .mid { background: #fff2cc; } .lo { background: #fce4d6; }
+  .ok { color: #2e7d32; } .warn { color: #ff8c00; } .over { color: #c00000; font-weight: bold; }
+  footer { color: #888; padding: 0 20px 20px; }
+</style>
+</head>
+<body>
+<header>
+  <h1 id="titolo"></h1>
+  <div class="meta" id="meta"></div>
+  <div class="podio" id="podio"></div>
+</header>
+<nav>
+  <button data-tab="classifica" class="on">Classifica</button>
+  <button data-tab="driver">Scorecard driver</button>
+  <button data-tab="vita">Vita utile</button>
+</nav>
+<section id="classifica" class="on">
+  <div class="tools"><input type="search" placeholder="Filtra gruppo…"><span class="count"></span></div>
+  <div class="host"></div>
+</section>
+<section id="driver">
+  <div class="tools"><input type="search" placeholder="Filtra gruppo…">
+    <label><input type="checkbox" class="raw"> valori invece dei punteggi</label><span class="count"></span></div>
+  <div class="host"></div>
+</section>
+<section id="vita">
+  <div class="tools"><input type="search" placeholder="Filtra gruppo o Product…">
+    <select class="stato"><option value="">Tutti gli stati</option><option>OK</option><option>Moderato</option>
+      <option>Attenzione</option><option>SUPERATO</option></select><span class="count"></span></div>
+  <div class="host"></div>
+</section>
+<footer>Report generato da multi_benchmark_cnc.py — file autonomo, consultabile offline.</footer>
+<script type="application/json" id="dati">__DATA__</script>
+<script>
+(function () {
+  'use strict';
+  var D = JSON.parse(document.getElementById('dati').textContent);
+  var N = D.groups.length, ROW = 26, OVERSCAN = 12;
+
+  function esc(s) {
+    return String(s).replace(/[&<>"]/g, function (c) {
+      return { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;' }[c];
+    });
+  }
+  function pad(n) { return (n < 10 ? '0' : '') + n; }
+  function fmtTime(s) {
+    s = Math.floor(s);
+    var h = Math.floor(s / 3600), m = Math.floor(s % 3600 / 60), sec = s % 60;
+    return h > 0 ? h + 'h ' + pad(m) + 'm ' + pad(sec) + 's' : m + 'm ' + pad(sec) + 's';
+  }
+  function band(v) { return v >= 90 ? 'hi' : v >= 70 ? 'mid' : 'lo'; }
+
+  // Posizioni in classifica
+  var order = D.groups.map(function (_, i) { return i; });
+  order.sort(function (a, b) { return D.totals[b] - D.totals[a]; });
+  var pos = new Array(N);
+  order.forEach(function (g, k) { pos[g] = k + 1; });
+
+  // ── Tabella virtualizzata: nel DOM solo le righe visibili (+ margine) ──
+  function VTable(section, cols, n, match) {
+    this.cols = cols; this.all = []; this.match = match;
+    for (var i = 0; i < n; i++) this.all.push(i);
+    this.rows = this.all.slice(); this.sortCol = -1; this.dir = 1;
+    this.count = section.querySelector('.count');
+    var host = section.querySelector('.host');
+    var widths = cols.map(function (c) { return (c.w || 110) + 'px'; }).join(' ');
+    var total = cols.reduce(function (s, c) { return s + (c.w || 110); }, 0);
+    host.innerHTML = '<div class="vt"><div class="vt-h" style="grid-template-columns:' + widths +
+      ';min-width:' + total + 'px">' + cols.map(function (c, k) {
+        return '<div data-k="' + k + '" title="' + esc(c.title || c.label) + '">' + esc(c.label) + '</div>';
+      }).join('') + '</div><div class="space" style="min-width:' + total + 'px"></div></div>';
+    this.box = host.firstChild; this.head = this.box.firstChild; this.space = this.box.lastChild;
+    this.style = 'grid-template-columns:' + widths;
+    var self = this, pending = false;
+    this.box.addEventListener('scroll', function () {
+      if (pending) return;
+      pending = true;
+      requestAnimationFrame(function () { pending = false; self.render(); });
+    });
+    this.head.addEventListener('click', function (e) {
+      var k = e.target.getAttribute('data-k');
+      if (k !== null) self.sort(+k);
+    });
+    this.refresh();
+  }
+  VTable.prototype.filter = function (text, extra) {
+    var t = text.trim().toLowerCase(), match = this.match;
+    this.rows = this.all.filter(function (i) { return (!t || match(i, t)) && (!extra || extra(i)); });
+    this.applySort();
+    this.refresh();
+  };
+  VTable.prototype.sort = function (k) {
+    this.dir = this.sortCol === k ? -this.dir : (this.cols[k].num ? -1 : 1);
+    this.sortCol = k;
+    this.applySort();
+    var dir = this.dir;
+    Array.prototype.forEach.call(this.head.children, function (el, j) {
+      el.className = j === k ? (dir > 0 ? 'asc' : 'desc') : '';
+    });
+    this.refresh();
+  };
+  VTable.prototype.applySort = function () {
+    if (this.sortCol < 0) return;
+    var value = this.cols[this.sortCol].value, dir = this.dir;
+    this.rows.sort(function (a, b) {
+      var x = value(a), y = value(b);
+      return (x < y ? -1 : x > y ? 1 : a - b) * dir;
+    });
+  };
+  VTable.prototype.refresh = function () {
+    this.space.style.height = this.rows.length * ROW + 'px';
+    this.count.textContent = this.rows.length + ' di ' + this.all.length + ' righe';
+    this.render();
+  };
+  VTable.prototype.render = function () {
+    var h = this.box.clientHeight || 600, top = Math.max(0, this.box.scrollTop - this.head.offsetHeight);
+    var first = Math.max(0, Math.floor(top / ROW) - OVERSCAN);
+    var last = Math.min(this.rows.length, Math.ceil((top + h) / ROW) + OVERSCAN);
+    var out = [], cols = this.cols;
+    for (var k = first; k < last; k++) {
+      var i = this.rows[k];
+      out.push('<div class="r" style="top:' + k * ROW + 'px;' + this.style + '">');
+      for (var c = 0; c < cols.length; c++) {
+        var cell = cols[c].cell(i);
+        out.push('<div class="' + (cols[c].num ? 'n ' : '') + (cell[1] || '') + '"' +
+                 (cell[2] ? ' title="' + esc(cell[2]) + '"' : '') + '>' + esc(cell[0]) + '</div>');
+      }
+      out.push('</div>');
+    }
+    this.space.innerHTML = out.join('');
+  };
+
+  // ── Intestazione ──
+  document.getElementById('titolo').textContent = D.title;
+  document.getElementById('meta').textContent = N + ' gruppi — vita utile ' + D.tool_life_s / 60 +
+    ' min — generato il ' + D.generated + ' — pesi: ' +
+    D.cats.map(function (c, k) { return c + ' ' + Math.round(D.weights[k] * 100) + '%'; }).join(' | ');
+  document.getElementById('podio').innerHTML = order.slice(0, 3).map(function (g, k) {
+    return '<span>' + ['🥇', '🥈', '🥉'][k] + ' ' + esc(D.groups[g]) + ' ' + D.totals[g].toFixed(1) + '</span>';
+  }).join('');
+
+  function groupMatch(i, t) { return D.groups[i].toLowerCase().indexOf(t) >= 0; }
+  var baseCols = [
+    { label: 'Pos.', w: 60, num: true, value: function (i) { return -pos[i]; },
+      cell: function (i) { return [pos[i] + '°']; } },
+    { label: 'Gruppo', w: 200, value: function (i) { return D.groups[i]; },
+      cell: function (i) { return [D.groups[i]]; } },
+    { label: 'Totale', w: 80, num: true, value: function (i) { return D.totals[i]; },
+      cell: function (i) { return [D.totals[i].toFixed(1), band(D.totals[i])]; } }
+  ];
+
+  // ── Classifica per categoria ──
+  var classifica = new VTable(document.getElementById('classifica'), baseCols.concat(D.cats.map(function (c, k) {
+    return { label: c + ' (' + Math.round(D.weights[k] * 100) + '%)', w: 150, num: true,
+      value: function (i) { return D.cat_scores[i][k]; },
+      cell: function (i) { var v = D.cat_scores[i][k]; return [v.toFixed(1), band(v)]; } };
+  })), N, groupMatch);
+  classifica.sort(0);
+
+  // ── Matrice dei punteggi per driver ──
+  var showRaw = false;
+  var driverTable = new VTable(document.getElementById('driver'), baseCols.concat(D.drivers.map(function (d, k) {
+    var label = (d[0] >= 0 ? D.cats[d[0]] + ' — ' : '') + d[1];
+    return { label: d[1], title: label, w: 140, num: true,
+      value: function (i) { return D.scores[k][i]; },
+      cell: function (i) {
+        var s = D.scores[k][i], disp = D.display[k][i];
+        return showRaw ? [disp, band(s), s.toFixed(1) + '/100'] : [s.toFixed(1), band(s), disp];
+      } };
+  })), N, groupMatch);
+  driverTable.sort(0);
+
+  // ── Vita utile: una riga per (gruppo, Product) ──
+  var rg = [], rp = [], rt = [];
+  D.tools.forEach(function (flat, g) {
+    for (var j = 0; j < flat.length; j += 2) { rg.push(g); rp.push(flat[j]); rt.push(flat[j + 1]); }
+  });
+  function stato(r) {
+    var pct = rt[r] / D.tool_life_s;
+    return pct > 1 ? ['SUPERATO', 'over'] : pct > 0.75 ? ['Attenzione', 'warn'] :
+           pct > 0.5 ? ['Moderato', ''] : ['OK', 'ok'];
+  }
+  var vita = new VTable(document.getElementById('vita'), [
+    { label: 'Gruppo', w: 200, value: function (r) { return D.groups[rg[r]]; },
+      cell: function (r) { return [D.groups[rg[r]]]; } },
+    { label: 'Pos.', w: 60, num: true, value: function (r) { return -pos[rg[r]]; },
+      cell: function (r) { return [pos[rg[r]] + '°']; } },
+    { label: 'Product', w: 220, value: function (r) { return D.products[rp[r]]; },
+      cell: function (r) { return [D.products[rp[r]]]; } },
+    { label: 'Tempo', w: 110, num: true, value: function (r) { return rt[r]; },
+      cell: function (r) { return [fmtTime(rt[r])]; } },
+    { label: '% vita', w: 90, num: true, value: function (r) { return rt[r]; },
+      cell: function (r) { var s = stato(r); return [(rt[r] / D.tool_life_s * 100).toFixed(1) + '%', s[1]]; } },
+    { label: 'Stato', w: 110, value: function (r) { return rt[r]; },
+      cell: function (r) { var s = stato(r); return [s[0], s[1]]; } }
+  ], rg.length, function (r, t) {
+    return D.groups[rg[r]].toLowerCase().indexOf(t) >= 0 || D.products[rp[r]].toLowerCase().indexOf(t) >= 0;
+  });
+  vita.sort(3);
+
+  // ── Filtri e schede ──
+  var tables = { classifica: classifica, driver: driverTable, vita: vita };
+  function applyFilter(id) {
+    var section = document.getElementById(id), text = section.querySelector('input[type=search]').value;
+    var select = section.querySelector('.stato'), want = select ? select.value : '';
+    tables[id].filter(text, want ? function (r) { return stato(r)[0] === want; } : null);
+  }
+  Object.keys(tables).forEach(function (id) {
+    var section = document.getElementById(id);
+    section.querySelector('input[type=search]').addEventListener('input', function () { applyFilter(id); });
+    var select = section.querySelector('.stato');
+    if (select) select.addEventListener('change', function () { applyFilter(id); });
+  });
+  document.querySelector('#driver .raw').addEventListener('change', function (e) {
+    showRaw = e.target.checked;
+    driverTable.render();
+  });
+  Array.prototype.forEach.call(document.querySelectorAll('nav button'), function (btn) {
+    btn.addEventListener('click', function () {
+      Array.prototype.forEach.call(document.querySelectorAll('nav button, section'), function (el) {
+        el.classList.remove('on');
+      });
+      btn.classList.add('on');
+      document.getElementById(btn.getAttribute('data-tab')).classList.add('on');
+      tables[btn.getAttribute('data-tab')].render();
+    });
+  });
+})();
+</script>
+</body>
+</html>
+"""
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Report HTML statico da un run --jsonl",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python multi_benchmark_cnc.py ./consegne/ --jsonl risultati.jsonl
+  python report_html_cnc.py risultati.jsonl -o report.html
+  python report_html_cnc.py risultati.jsonl -o report.html --title "Classe 5B — Verifica 2"
+        """)
+    parser.add_argument('jsonl', help='File JSON Lines scritto da multi_benchmark_cnc.py --jsonl')
+    parser.add_argument('-o', '--output', default=None, help='File HTML di uscita (default: <jsonl>.html)')
+    parser.add_argument('--title', default=None, help='Titolo del report')
+
+    args = parser.parse_args()
+    try:
+        metrics_list, drivers, cat_scores, totals = load_jsonl(args.jsonl)
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit(f"Errore: {e}")
+    output = args.output or str(Path(args.jsonl).with_suffix('.html'))
+    size = export_html(metrics_list, drivers, cat_scores, totals, output, args.title)
+    print(f"  ✓ Report HTML ({len(metrics_list)} gruppi, {size / 1024:.0f} KB) salvato in: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — SEQUENZA CON MINIMO CAMBI UTENSILE     ║
+║                                                                      ║
+║  Per ogni setup cerca l'ordine delle operazioni che minimizza i      ║
+║  cambi utensile, rispettando le precedenze dedotte dalle strategie   ║
+║  (sfacciatura → sgrossatura → finitura, foratura dopo sfacciatura):  ║
+║  l'ottimo raggiungibile con gli stessi utensili e operazioni.        ║
+║                                                                      ║
+║  Uso:  python sequencing_cnc.py  <pdf/cartelle/archivi>  [--order]   ║
+║                                                                      ║
+║  Usato anche da benchmark_cnc.py e multi_benchmark_cnc.py con        ║
+║  --tc-optimum (driver "Efficienza sequenza utensili").               ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import heapq
+import sys
+from pathlib import Path
+
+# Fase di lavorazione di ogni strategia; le strategie non elencate (Unknown,
+# smussi non riconosciuti, ...) non hanno vincoli di precedenza
+PHASES = {
+    'Facing': 'sfacciatura',
+    'Adaptive': 'sgrossatura', 'Pocket': 'sgrossatura', 'Slot': 'sgrossatura',
+    'Contour': 'finitura', 'Contour 2D': 'finitura', 'Scallop': 'finitura', 'Parallel': 'finitura',
+    'Pencil': 'finitura', 'Steep and Shallow': 'finitura', 'Spiral': 'finitura',
+    'Morphed Spiral': 'finitura', 'Radial': 'finitura', 'Ramp': 'finitura', 'Flat': 'finitura',
+    'Trace': 'finitura',
+    'Drilling': 'foratura', 'Bore': 'foratura', 'Thread': 'foratura', 'Circular': 'foratura',
+}
+
+# Fase → fasi che devono seguirla
+PRECEDES = {
+    'sfacciatura': {'sgrossatura', 'finitura', 'foratura'},
+    'sgrossatura': {'finitura'},
+}
+
+# Stati massimi esplorati per setup prima di interrompere la ricerca
+MAX_STATES = 1_000
+# Stati della frontiera da cui completare la sequenza quando la ricerca si interrompe
+FALLBACK_STATES = 5
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. VINCOLI DI PRECEDENZA
+# ═══════════════════════════════════════════════════════════════════
+
+def precedence_masks(ops: list) -> list:
+    """
+    Per ogni operazione, bitmask delle operazioni che devono precederla.
+
+    Il vincolo vale solo tra coppie già in quest'ordine nello sheet: una finitura
+    resta dopo le sgrossature che la precedevano (sono le sue), ma una sgrossatura
+    eseguita dopo una finitura non viene anticipata. Così l'ordine originale è
+    sempre ammissibile e l'ottimo non è mai peggiore dello sheet.
+    """
+    phases = [PHASES.get(o['strategy']) for o in ops]
+    masks = []
+    for j, pj in enumerate(phases):
+        m = 0
+        for i in range(j):
+            if pj in PRECEDES.get(phases[i], ()):
+                m |= 1 << i
+        masks.append(m)
+    return masks
+
+
+def count_tool_changes(ops: list) -> int:
+    """Cambi utensile tra operazioni consecutive (come tc_total di compute_metrics())."""
+    return sum(1 for a, b in zip(ops, ops[1:]) if a['tool_t'] != b['tool_t'])
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. SOLVER (BEST-FIRST BRANCH AND BOUND CON MEMOIZZAZIONE)
+# ═══════════════════════════════════════════════════════════════════
+
+def _take_tool(mask: int, ops_of_tool: list, pred: list) -> int:
+    """
+    Esegue tutte le operazioni disponibili dell'utensile (indici `ops_of_tool`),
+    comprese quelle sbloccate strada facendo. Eseguirle subito è sempre ottimo:
+    spostare prima un'operazione già montata non aggiunge cambi e non viola precedenze.
+    """
+    progress = True
+    while progress:
+        progress = False
+        for j in ops_of_tool:
+            if not mask >> j & 1 and not pred[j] & ~mask:
+                mask |= 1 << j
+                progress = True
+    return mask
+
+
+def _leaf_tools(mask: int, tool_mask: list, pred: list, n: int) -> list:
+    """
+    Utensili "foglia": tutte le operazioni rimaste sono disponibili e nessun'altra
+    operazione le attende. Montarli una volta in fondo alla sequenza è ottimo
+    (costano esattamente un cambio ciascuno), quindi escono dalla ricerca.
+    """
+    pending = blocked = 0
+    for j in range(n):
+        if not mask >> j & 1:
+            pending |= pred[j]
+            if pred[j] & ~mask:
+                blocked |= 1 << j
+    busy = pending | blocked
+    return [t for t, tm in enumerate(tool_mask) if tm & ~mask and not tm & ~mask & busy]
+
+
+def _closure(pred: list) -> tuple:
+    """Antenati e discendenti (chiusura transitiva delle precedenze) come bitmask."""
+    n = len(pred)
+    anc = list(pred)
+    for j in range(n):
+        m = pred[j]
+        for i in range(j):
+            if m >> i & 1:
+                anc[j] |= anc[i]
+    desc = [0] * n
+    for j in range(n):
+        for i in range(j):
+            if anc[j] >> i & 1:
+                desc[i] |= 1 << j
+    return anc, desc
+
+
+def _cut_classes(phases: list, tool_of: list, n_tools: int, k1: int, k2: int) -> list:
+    """
+    Classi delle operazioni rispetto a due tagli della sequenza: k1 separa le
+    sfacciature con indice < k1 da tutte le operazioni successive che le attendono,
+    k2 separa sfacciature e sgrossature con indice < k2 dalle finiture successive.
+    Nessun ordine ammissibile può invertirle, quindi ogni operazione cade in un
+    segmento noto (0 = prima di k1, 1 = tra i tagli, 2 = dopo k2) o in uno di due
+    adiacenti. Per utensile, bitmask dei segmenti ammessi: 0, 1, 2, 0-1, 1-2.
+    """
+    classes = [[0] * 5 for _ in range(n_tools)]
+    for j, phase in enumerate(phases):
+        if phase == 'sfacciatura':
+            c = 0 if j < k1 else 3 if j < k2 else None
+        elif phase == 'sgrossatura':
+            c = 3 if j < k1 else 1 if j < k2 else 4
+        elif phase == 'foratura':
+            c = 4 if j >= k1 else None
+        elif phase == 'finitura':
+            c = 2 if j >= k2 else 4 if j >= k1 else None
+        else:
+            c = None
+        if c is not None:
+            classes[tool_of[j]][c] |= 1 << j
+    return classes
+
+
+def _segments(rest: int, cls: list) -> int:
+    """
+    Segmenti dei tagli di _cut_classes() occupati dalle operazioni `rest` di un
+    utensile: ogni segmento richiede almeno un montaggio, e solo un montaggio può
+    scavalcare ciascun taglio (tutto ciò che sta prima precede tutto ciò che sta dopo).
+    """
+    c0, c1, c2, c01, c12 = (c & rest for c in cls)
+    s0, s1, s2 = bool(c0), bool(c1), bool(c2)
+    if c01 and not (s0 or s1) or c12 and not (s1 or s2):
+        s1 = True
+    return max(1, s0 + s1 + s2)
+
+
+def min_tool_changes(ops: list, max_states: int = MAX_STATES) -> tuple:
+    """
+    Ordine delle operazioni di un setup con il minimo numero di cambi utensile.
+
+    Ogni passo monta un utensile tra quelli con operazioni disponibili e le esegue
+    tutte, gli utensili foglia vengono accodati alla fine; dopo un passo l'utensile
+    montato non ha più operazioni disponibili, quindi lo stato è solo l'insieme
+    delle operazioni eseguite. La ricerca best-first (A*) usa come stima il massimo
+    di due limiti inferiori dei montaggi ancora necessari:
+
+      · utensili da montare, +1 per quelli con due operazioni separate da
+        un'operazione di altro utensile e per ogni coppia di utensili che si
+        attendono a vicenda;
+      · i segmenti occupati da ogni utensile rispetto ai due tagli di fase
+        (_segments), meno i 2 montaggi che possono scavalcarli; i tagli sono
+        scelti una volta sola sul setup completo.
+
+    Nessuno dei due supera il costo reale, quindi il primo stato finale estratto
+    è ottimo. Gli stati che non possono battere l'ordine greedy vengono scartati.
+
+    Returns:
+        (cambi minimi, ordine come lista di indici, esatto) — se la ricerca supera
+        max_states si restituisce il miglior ordine trovato, con esatto = False.
+    """
+    n = len(ops)
+    if n < 2:
+        return 0, list(range(n)), True
+    tools = sorted({o['tool_t'] for o in ops})
+    tool_of = [tools.index(o['tool_t']) for o in ops]
+    tool_ops = [[] for _ in tools]
+    tool_mask = [0] * len(tools)
+    for j, t in enumerate(tool_of):
+        tool_ops[t].append(j)
+        tool_mask[t] |= 1 << j
+    pred = precedence_masks(ops)
+    anc, desc = _closure(pred)
+    full = (1 << n) - 1
+
+    # Tagli di fase: la coppia (k1, k2) con il limite più stretto sul setup completo
+    phases = [PHASES.get(o['strategy']) for o in ops]
+    k1s = [0] + [j + 1 for j, p in enumerate(phases) if p == 'sfacciatura']
+    k2s = [j + 1 for j, p in enumerate(phases) if p in ('sfacciatura', 'sgrossatura')]
+    classes = max((_cut_classes(phases, tool_of, len(tools), k1, k2)
+                   for k1 in k1s for k2 in sorted({k for k in k2s if k >= k1} | {k1})),
+                  key=lambda c: sum(_segments(tm, cls) for tm, cls in zip(tool_mask, c)))
+
+    def h(mask):
+        todo = full & ~mask
+        est, cut, rests, reaches = 0, 0, [], []
+        for tm, cls in zip(tool_mask, classes):
+            rest = tm & todo
+            if not rest:
+                continue
+            others = todo & ~tm
+            after = 0
+            bits = rest
+            while bits:
+                j = (bits & -bits).bit_length() - 1
+                bits &= bits - 1
+                if anc[j] & after & others:
+                    est += 2
+                    cut += max(2, _segments(rest, cls))
+                    break
+                after |= desc[j]
+            else:
+                rests.append(rest)
+                reaches.append(after)
+                cut += _segments(rest, cls)
+        est += len(rests)
+        # Utensili che si attendono a vicenda (senza split): tutti tranne uno vanno rimontati
+        L = len(rests)
+        waits = [sum(1 << b for b in range(L) if reach & rests[b]) for reach in reaches]
+        mutual = [sum(1 << b for b in range(L) if b != a and waits[b] >> a & 1 and waits[a] >> b & 1)
+                  for a in range(L)]
+        free = (1 << L) - 1
+        while free:
+            a = (free & -free).bit_length() - 1
+            free &= free - 1
+            cand = mutual[a] & free
+            while cand:
+                b = (cand & -cand).bit_length() - 1
+                free &= ~(1 << b)
+                est += 1
+                cand &= mutual[b] & ~(1 << b)
+        # Ai tagli: ogni utensile vale il massimo tra i due limiti, meno i 2 scavalcamenti
+        return max(est, cut - 2)
+
+    def prune(mask):
+        """Toglie gli utensili foglia: (nuova mask, operazioni accodate per utensile)."""
+        tail = [tool_mask[t] & ~mask for t in _leaf_tools(mask, tool_mask, pred, n)]
+        for rest in tail:
+            mask |= rest
+        return mask, tail
+
+    greedy_order = _greedy_order(tool_ops, tool_of, pred, n)
+    greedy = sum(1 for a, b in zip(greedy_order, greedy_order[1:]) if tool_of[a] != tool_of[b])
+
+    # Ogni montaggio costa 1, compreso il primo: a fine ricerca si sottrae 1
+    mask0, tail0 = prune(0)
+    parent = {mask0: (None, -1, tail0)}
+    best_g = {mask0: len(tail0)}
+    heap = [(len(tail0) + h(mask0), -len(tail0), mask0)]
+    expanded = 0
+    while heap:
+        f, g, mask = heapq.heappop(heap)
+        g = -g
+        if g > best_g[mask]:
+            continue
+        if mask == full:
+            return g - 1, _order(parent, mask, tool_of, pred, n), True
+        expanded += 1
+        if expanded > max_states:
+            break
+        for t in {tool_of[j] for j in range(n) if not mask >> j & 1 and not pred[j] & ~mask}:
+            nmask, tail = prune(_take_tool(mask, tool_ops[t], pred))
+            ng = g + 1 + len(tail)
+            if ng < best_g.get(nmask, ng + 1):
+                fn = ng + h(nmask)
+                if fn > greedy + 1:
+                    continue
+                best_g[nmask] = ng
+                parent[nmask] = (mask, t, tail)
+                heapq.heappush(heap, (fn, -ng, nmask))
+
+    # Ricerca interrotta: dagli stati più promettenti della frontiera si scende
+    # scegliendo ogni volta il passo con la stima più bassa, e si tiene il migliore
+    # tra questi ordini, quello greedy e quello originale
+    candidates = [list(range(n)), greedy_order]
+    for f, g, mask in heapq.nsmallest(FALLBACK_STATES, heap):
+        if -g != best_g[mask]:
+            continue
+        chain = dict(parent)
+        while mask != full:
+            steps = []
+            for t in {tool_of[j] for j in range(n) if not mask >> j & 1 and not pred[j] & ~mask}:
+                nmask, tail = prune(_take_tool(mask, tool_ops[t], pred))
+                steps.append((len(tail) + h(nmask), -bin(nmask).count('1'), t, nmask, tail))
+            _, _, t, nmask, tail = min(steps)
+            chain[nmask] = (mask, t, tail)
+            mask = nmask
+        candidates.append(_order(chain, full, tool_of, pred, n))
+    order = min(candidates, key=lambda o: sum(1 for a, b in zip(o, o[1:]) if tool_of[a] != tool_of[b]))
+    return count_tool_changes([ops[j] for j in order]), order, False
+
+
+def _order(parent: dict, mask: int, tool_of: list, pred: list, n: int) -> list:
+    """Ricostruisce l'ordine delle operazioni dalla catena di stati della ricerca."""
+    chain, tails = [], []
+    while mask is not None:
+        prev, t, tail = parent[mask]
+        chain.append((mask, t))
+        tails.extend(reversed(tail))
+        mask = prev
+    order, mask = [], 0
+    leaf_ops = 0
+    for leaf in tails:
+        leaf_ops |= leaf
+    for nmask, t in reversed(chain[:-1]):
+        # Ripete le esecuzioni di _take_tool (senza gli utensili foglia, accodati in fondo)
+        target = nmask & ~leaf_ops
+        while mask != target:
+            for j in range(n):
+                if target >> j & 1 and not mask >> j & 1 and tool_of[j] == t and not pred[j] & ~(mask | leaf_ops):
+                    mask |= 1 << j
+                    order.append(j)
+    for leaf in reversed(tails):
+        order.extend(j for j in range(n) if leaf >> j & 1)
+    return order
+
+
+def _greedy_order(tool_ops: list, tool_of: list, pred: list, n: int) -> list:
+    """Ordine greedy: monta ogni volta l'utensile che sblocca più operazioni."""
+    order, mask, full = [], 0, (1 << n) - 1
+    while mask != full:
+        avail = {tool_of[j] for j in range(n) if not mask >> j & 1 and not pred[j] & ~mask}
+        t = max(sorted(avail), key=lambda t: bin(_take_tool(mask, tool_ops[t], pred)).count('1'))
+        nmask = _take_tool(mask, tool_ops[t], pred)
+        order.extend(j for j in range(n) if nmask >> j & 1 and not mask >> j & 1)
+        mask = nmask
+    return order
+
+
+def optimal_tool_changes(parsed: dict) -> list:
+    """[(cambi attuali, cambi minimi, ordine, esatto)] per ogni setup di un PDF parsato."""
+    out = []
+    for setup in parsed['setups']:
+        ops = setup['operations']
+        best, order, exact = min_tool_changes(ops)
+        out.append((count_tool_changes(ops), best, order, exact))
+    return out
+
+
+def tc_optimum(parsed: dict) -> tuple:
+    """
+    (cambi utensile minimi dell'intero sheet, esatto) — metriche 'tc_optimal' e
+    'tc_optimal_exact' di --tc-optimum. Se la ricerca si interrompe anche su un
+    solo setup il totale è solo il miglior ordine trovato, non l'ottimo.
+    """
+    per_setup = optimal_tool_changes(parsed)
+    return sum(best for _, best, _, _ in per_setup), all(exact for *_, exact in per_setup)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. OUTPUT CONSOLE
+# ═══════════════════════════════════════════════════════════════════
+
+def tool_runs(ops: list, order: list) -> str:
+    """Sequenza compatta degli utensili: T1(2) → T3(1) → ..."""
+    runs = []
+    for j in order:
+        t = ops[j]['tool_t']
+        if runs and runs[-1][0] == t:
+            runs[-1][1] += 1
+        else:
+            runs.append([t, 1])
+    return " → ".join(f"{t}({k})" for t, k in runs)
+
+
+def print_sequencing(results: list, show_order: bool):
+    """results: [(gruppo, parsed, optimal_tool_changes(parsed))]"""
+    W = 88
+    print("\n" + "═" * W)
+    print(f"{'SEQUENZA OTTIMA — MINIMO CAMBI UTENSILE':^{W}}")
+    print("precedenze: sfacciatura → sgrossatura → finitura, sfacciatura → foratura".center(W))
+    print("═" * W)
+    print(f"\n  {'GRUPPO':<16} {'Setup':>5} {'Op.':>5} {'Cambi':>7} {'Ottimo':>7} {'Evitabili':>10} {'Efficienza':>11}")
+    print(f"  {'─' * 16} {'─' * 5} {'─' * 5} {'─' * 7} {'─' * 7} {'─' * 10} {'─' * 11}")
+    for group, parsed, per_setup in results:
+        for si, (actual, best, order, exact) in enumerate(per_setup):
+            eff = best / actual * 100 if actual else 100.0
+            mark = "" if exact else " ≈"
+            print(f"  {group if si == 0 else '':<16} {si + 1:>5} {len(order):>5} {actual:>7} "
+                  f"{f'{best}{mark}':>7} {actual - best:>10} {eff:>10.1f}%")
+        tot_a = sum(r[0] for r in per_setup)
+        tot_b = sum(r[1] for r in per_setup)
+        eff = tot_b / tot_a * 100 if tot_a else 100.0
+        print(f"  {'':<16} {'TOT':>5} {'':>5} {tot_a:>7} {tot_b:>7} {tot_a - tot_b:>10} {eff:>10.1f}%")
+    if show_order:
+        for group, parsed, per_setup in results:
+            for si, (_, best, order, _) in enumerate(per_setup):
+                ops = parsed['setups'][si]['operations']
+                print(f"\n  {group} — setup {si + 1}")
+                print(f"    attuale: {tool_runs(ops, range(len(ops)))}")
+                print(f"    ottimo:  {tool_runs(ops, order)}")
+    print(f"\n  ≈ = ricerca interrotta dopo {MAX_STATES} stati: miglior ordine trovato, non garantito ottimo")
+    print("═" * W + "\n")
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Sequenza con minimo cambi utensile",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python sequencing_cnc.py CASO_B/B_OPERATION_SHEET/
+  python sequencing_cnc.py NC02_SHEET.pdf --order
+  python multi_benchmark_cnc.py ./pdf_folder/ --tc-optimum
+        """)
+    parser.add_argument('inputs', nargs='+', help='File PDF, archivi zip/tar e/o cartelle')
+    parser.add_argument('--order', action='store_true', help='Mostra la sequenza utensili attuale e ottima')
+    parser.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+
+    args = parser.parse_args()
+    from multi_benchmark_cnc import collect_pdfs, parse_pdf, pdf_data, extract_short_name, PageTextCache
+
+    pdfs = collect_pdfs(args.inputs)
+    if not pdfs:
+        sys.exit("Errore: nessun file PDF trovato")
+    page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+    results = []
+    for pdf in pdfs:
+        print(f"  Parsing {pdf.name} ...")
+        parsed = parse_pdf(str(pdf), data=pdf_data(pdf), page_cache=page_cache)
+        results.append((extract_short_name(parsed['name'], Path(str(pdf)).stem), parsed,
+                        optimal_tool_changes(parsed)))
+    print_sequencing(results, args.order)
+
+
+if __name__ == '__main__':
+    main()
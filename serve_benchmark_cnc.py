@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — SERVIZIO HTTP LOCALE DI SCORING        ║
+║                                                                      ║
+║  Processo persistente che espone il multi-benchmark via HTTP:        ║
+║  interprete, import e PDF già parsati restano in memoria tra una     ║
+║  richiesta e l'altra (cache LRU per contenuto del PDF).              ║
+║                                                                      ║
+║  Uso:  python serve_benchmark_cnc.py  [--host H] [--port P]          ║
+║                                                                      ║
+║  Opzioni:                                                            ║
+║    --cache-size <N>      PDF parsati tenuti in memoria (default: 256)║
+║    --tool-life <minuti>  Soglia vita utile di default (default: 20)  ║
+╚══════════════════════════════════════════════════════════════════════╝
+
+Endpoint:
+    POST /sheets?name=<file.pdf>    corpo = PDF  → {id, group, name, n_ops, cached}
+    GET  /sheets                    elenco dei PDF in cache
+    GET  /sheets/<id>/metrics       metriche (compute_metrics) — ?tool_life=<min>
+    POST /rank                      {"ids": [...], "tool_life": 20} → classifica JSON
+    POST /rank.xlsx                 come /rank, risponde con il file Excel
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from multi_benchmark_cnc import (
+    CATEGORY_WEIGHTS, parse_pdf, compute_metrics, compute_all_scores,
+    dedupe_group_names, export_multi_xlsx,
+)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. CACHE DEI PDF PARSATI
+# ═══════════════════════════════════════════════════════════════════
+
+class ParsedCache:
+    """
+    Cache LRU thread-safe dei PDF parsati, indicizzata per SHA-256 del contenuto.
+    Conserva l'output di parse_pdf() (non le metriche, che dipendono dalla
+    soglia di vita utile e si ricalcolano in pochi microsecondi).
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sheet_id: str):
+        with self._lock:
+            parsed = self._items.get(sheet_id)
+            if parsed is not None:
+                self._items.move_to_end(sheet_id)
+            return parsed
+
+    def put(self, sheet_id: str, parsed: dict):
+        with self._lock:
+            self._items[sheet_id] = parsed
+            self._items.move_to_end(sheet_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def items(self):
+        with self._lock:
+            return list(self._items.items())
+
+
+# PDFium (pre-scan con pypdfium2) non ammette chiamate da thread paralleli,
+# nemmeno su documenti diversi: i parsing degli upload vengono serializzati.
+_parse_lock = threading.Lock()
+
+
+def add_sheet(cache: ParsedCache, data: bytes, name: str):
+    """Parsa un PDF (o lo recupera dalla cache). Restituisce (id, parsed, cached)."""
+    sheet_id = hashlib.sha256(data).hexdigest()
+    parsed = cache.get(sheet_id)
+    if parsed is not None:
+        return sheet_id, parsed, True
+    with _parse_lock:
+        parsed = parse_pdf(name, data=data)
+    cache.put(sheet_id, parsed)
+    return sheet_id, parsed, False
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. SERIALIZZAZIONE
+# ═══════════════════════════════════════════════════════════════════
+
+def jsonable(obj):
+    """Converte set/tuple annidati in liste, per json.dumps."""
+    if isinstance(obj, dict):
+        return {k: jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (set, frozenset)):
+        return sorted(jsonable(v) for v in obj)
+    if isinstance(obj, (list, tuple)):
+        return [jsonable(v) for v in obj]
+    return obj
+
+
+def rank_sheets(cache: ParsedCache, ids: list, tool_life_s: int):
+    """
+    Calcola metriche e classifica per i PDF indicati.
+    Restituisce (metrics_list, drivers, cat_scores, totals); solleva KeyError
+    per id non presenti in cache e ValueError se restano meno di 2 gruppi validi.
+    """
+    metrics_list = []
+    for sheet_id in ids:
+        parsed = cache.get(sheet_id)
+        if parsed is None:
+            raise KeyError(sheet_id)
+        m = compute_metrics(parsed, tool_life_s)
+        if m is not None:
+            m['sheet_id'] = sheet_id
+            metrics_list.append(m)
+    if len(metrics_list) < 2:
+        raise ValueError(f"servono almeno 2 gruppi validi, trovati: {len(metrics_list)}")
+    dedupe_group_names(metrics_list)
+    drivers, cat_scores, totals = compute_all_scores(metrics_list)
+    return metrics_list, drivers, cat_scores, totals
+
+
+def ranking_payload(metrics_list, drivers, cat_scores, totals) -> dict:
+    N = len(metrics_list)
+    ranking = sorted(range(N), key=lambda i: totals[i], reverse=True)
+    return {
+        'ranking': [
+            {'position': pos, 'group': metrics_list[i]['group'],
+             'sheet_id': metrics_list[i].get('sheet_id'),
+             'total': totals[i], 'categories': cat_scores[i]}
+            for pos, i in enumerate(ranking, 1)
+        ],
+        'weights': CATEGORY_WEIGHTS,
+        'drivers': [
+            {'category': cat, 'driver': name, 'values': raws, 'scores': scores, 'display': displays}
+            for cat, name, raws, scores, displays in drivers
+        ],
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. HANDLER HTTP
+# ═══════════════════════════════════════════════════════════════════
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    server_version = "BenchmarkCNC/1.0"
+
+    # Impostati da make_server()
+    cache = None
+    default_tool_life = 20
+
+    def _send(self, status: int, body: bytes, content_type: str, extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra_headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, payload):
+        body = json.dumps(jsonable(payload), ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8")
+
+    def _error(self, status: int, message: str):
+        self._json(status, {'error': message})
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _tool_life_s(self, value) -> int:
+        """Soglia in secondi; ValueError se non è un numero intero di minuti > 0."""
+        minutes = int(value if value is not None else self.default_tool_life)
+        if minutes <= 0:
+            raise ValueError(f"tool_life deve essere > 0: {minutes}")
+        return minutes * 60
+
+    # ── GET ──
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+
+        if parts == ["sheets"]:
+            self._json(200, [
+                {'id': sid, 'name': p['name'], 'path': p.get('path'),
+                 'n_ops': sum(len(s['operations']) for s in p['setups'])}
+                for sid, p in self.cache.items()
+            ])
+            return
+
+        if len(parts) == 3 and parts[0] == "sheets" and parts[2] == "metrics":
+            parsed = self.cache.get(parts[1])
+            if parsed is None:
+                self._error(404, f"sheet non trovato: {parts[1]}")
+                return
+            try:
+                tool_life_s = self._tool_life_s(query.get('tool_life', [None])[0])
+            except ValueError:
+                self._error(400, "tool_life non valido")
+                return
+            m = compute_metrics(parsed, tool_life_s)
+            if m is None:
+                self._error(422, "nessuna operazione trovata nel PDF")
+                return
+            self._json(200, m.resolve())
+            return
+
+        self._error(404, f"endpoint non trovato: {url.path}")
+
+    # ── POST ──
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/sheets":
+            data = self._body()
+            if not data.startswith(b"%PDF"):
+                self._error(400, "il corpo della richiesta non è un PDF")
+                return
+            name = query.get('name', ['upload.pdf'])[0]
+            try:
+                sheet_id, parsed, cached = add_sheet(self.cache, data, name)
+            except Exception as e:
+                self._error(422, f"parsing fallito: {e}")
+                return
+            m = compute_metrics(parsed, self._tool_life_s(None))
+            self._json(200, {
+                'id': sheet_id, 'name': parsed['name'],
+                'group': m['group'] if m else None,
+                'n_ops': sum(len(s['operations']) for s in parsed['setups']),
+                'cached': cached,
+            })
+            return
+
+        if url.path in ("/rank", "/rank.xlsx"):
+            try:
+                req = json.loads(self._body() or b"{}")
+                ids = list(req['ids'])
+                tool_life_s = self._tool_life_s(req.get('tool_life'))
+            except (ValueError, KeyError, TypeError):
+                self._error(400, 'corpo atteso: {"ids": [...], "tool_life": <minuti>}')
+                return
+            try:
+                result = rank_sheets(self.cache, ids, tool_life_s)
+            except KeyError as e:
+                self._error(404, f"sheet non trovato: {e.args[0]}")
+                return
+            except ValueError as e:
+                self._error(422, str(e))
+                return
+
+            if url.path == "/rank":
+                self._json(200, ranking_payload(*result))
+                return
+
+            fd, tmp = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+            try:
+                export_multi_xlsx(*result, tmp)
+                with open(tmp, "rb") as f:
+                    body = f.read()
+            finally:
+                os.unlink(tmp)
+            if not body:
+                self._error(500, "export Excel non disponibile (openpyxl non installato?)")
+                return
+            self._send(200, body,
+                       "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                       {"Content-Disposition": 'attachment; filename="classifica.xlsx"'})
+            return
+
+        self._error(404, f"endpoint non trovato: {url.path}")
+
+
+def make_server(host: str, port: int, cache_size: int = 256, tool_life: int = 20):
+    handler = type("Handler", (ScoringHandler,), {
+        'cache': ParsedCache(cache_size),
+        'default_tool_life': tool_life,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Servizio HTTP locale di scoring",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempio:
+  python serve_benchmark_cnc.py --port 8765
+  curl --data-binary @NC02.pdf "http://127.0.0.1:8765/sheets?name=NC02.pdf"
+  curl -d '{"ids": ["<id1>", "<id2>"]}' http://127.0.0.1:8765/rank
+        """)
+    parser.add_argument('--host', default='127.0.0.1', help='Indirizzo di ascolto (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Porta di ascolto (default: 8765)')
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help='Numero massimo di PDF parsati in memoria (default: 256)')
+    parser.add_argument('--tool-life', type=int, default=20,
+                        help='Soglia vita utile di default in minuti (default: 20)')
+    args = parser.parse_args()
+    if args.tool_life <= 0:
+        parser.error("--tool-life deve essere un intero positivo")
+
+    server = make_server(args.host, args.port, args.cache_size, args.tool_life)
+    print(f"\n  Servizio di scoring in ascolto su http://{args.host}:{args.port}  (Ctrl+C per terminare)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — CICLI QUASI DUPLICATI (MINHASH/LSH)    ║
+║                                                                      ║
+║  Confronta le sequenze di operazioni (strategia, utensile T,         ║
+║  Product, distanze arrotondate) di migliaia di sheet e segnala le    ║
+║  coppie sospette senza confrontare tutte le N² coppie: firme         ║
+║  MinHash sugli shingle di operazioni e bucket LSH a bande.           ║
+║                                                                      ║
+║  Uso:  python similarity_cnc.py  <pdf/cartelle/archivi> [opzioni]    ║
+║        python similarity_cnc.py  --from-db results.sqlite [opzioni]  ║
+║                                                                      ║
+║  Opzioni:                                                            ║
+║    --threshold X    Similarità minima segnalata (default: 0.5)       ║
+║    --shingle K      Operazioni consecutive per shingle (default: 3)  ║
+║    --perms N        Permutazioni MinHash (default: 128)              ║
+║    --show N         Coppie con allineamento dettagliato (default: 3) ║
+║    --jobs N         Processi worker per il parsing                   ║
+║    --page-cache F   Cache SQLite del testo delle pagine              ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import difflib
+import hashlib
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Primo di Mersenne 2^61 - 1: hash universali (a·x + b) mod P
+MERSENNE_P = (1 << 61) - 1
+
+# Cifre significative delle distanze nel token di un'operazione: piccole
+# differenze (ricalcolo del percorso, tolleranze) non cambiano il token
+DIST_DIGITS = 2
+
+# Seme fisso delle permutazioni: firme confrontabili tra esecuzioni diverse
+MINHASH_SEED = 1
+
+# Peso dei falsi negativi nella scelta dei parametri LSH (0.5 = simmetrico)
+FN_WEIGHT = 0.9
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. RAPPRESENTAZIONE DELLE OPERAZIONI
+# ═══════════════════════════════════════════════════════════════════
+
+def round_dist(d) -> str:
+    """Distanza arrotondata a DIST_DIGITS cifre significative (es. 2069.87 → '2.1e+03')."""
+    return f"{d or 0:.{DIST_DIGITS}g}"
+
+
+def op_token(o: dict) -> str:
+    """Token di un'operazione: strategia, utensile, Product e distanze arrotondate."""
+    return "|".join((o['strategy'], o['tool_t'], o['product'],
+                     round_dist(o['cutting_dist']), round_dist(o['rapid_dist'])))
+
+
+def sheet_shingles(parsed: dict, k: int) -> set:
+    """
+    Shingle dello sheet: sequenze di k operazioni consecutive all'interno di
+    ogni setup, ridotte a interi a 64 bit. Un setup con meno di k operazioni
+    contribuisce con un unico shingle.
+    """
+    out = set()
+    for setup in parsed['setups']:
+        tokens = [op_token(o) for o in setup['operations']]
+        windows = [tokens[i:i + k] for i in range(len(tokens) - k + 1)] or ([tokens] if tokens else [])
+        for w in windows:
+            digest = hashlib.blake2b("\n".join(w).encode(), digest_size=8).digest()
+            out.add(int.from_bytes(digest, 'big') % MERSENNE_P)
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. MINHASH E LSH
+# ═══════════════════════════════════════════════════════════════════
+
+def make_permutations(n_perm: int, seed: int = MINHASH_SEED) -> list:
+    rng = random.Random(seed)
+    return [(rng.randrange(1, MERSENNE_P), rng.randrange(0, MERSENNE_P)) for _ in range(n_perm)]
+
+
+def minhash(shingles: set, perms: list) -> tuple:
+    """Firma MinHash: per ogni permutazione il minimo hash degli shingle."""
+    return tuple(min((a * x + b) % MERSENNE_P for x in shingles) for a, b in perms)
+
+
+def lsh_params(n_perm: int, threshold: float) -> tuple:
+    """
+    (bande, righe per banda) con bande × righe ≤ n_perm che minimizzano la somma
+    pesata delle probabilità di falsi positivi (sotto soglia) e falsi negativi
+    (sopra). Una coppia con similarità s diventa candidata con probabilità
+    1 - (1 - s^r)^b. I candidati vengono verificati con il Jaccard esatto, quindi
+    un falso positivo costa poco: si privilegia il recall (FN_WEIGHT).
+    """
+    steps = 200
+
+    def area(r, b, lo, hi, above):
+        total = 0.0
+        for i in range(steps):
+            s = lo + (hi - lo) * (i + 0.5) / steps
+            p = 1 - (1 - s ** r) ** b
+            total += (1 - p if above else p) * (hi - lo) / steps
+        return total
+
+    best = None
+    for r in range(1, n_perm + 1):
+        b = n_perm // r
+        err = (1 - FN_WEIGHT) * area(r, b, 0.0, threshold, False) + FN_WEIGHT * area(r, b, threshold, 1.0, True)
+        if best is None or err < best[0]:
+            best = (err, b, r)
+    return best[1], best[2]
+
+
+def lsh_candidates(signatures: list, bands: int, rows: int) -> set:
+    """Coppie (i, j) con i < j che condividono almeno un bucket in una banda."""
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        lo = band * rows
+        for i, sig in enumerate(signatures):
+            buckets[sig[lo:lo + rows]].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    candidates.add((members[x], members[y]))
+    return candidates
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def find_similar(sheets: list, threshold: float, k: int, n_perm: int):
+    """
+    Coppie di sheet con similarità di Jaccard (sugli shingle) ≥ threshold.
+    LSH riduce i confronti ai soli candidati, verificati poi con il Jaccard esatto.
+    Restituisce (coppie [(sim, stima MinHash, i, j)], n° candidati, (bande, righe)).
+    """
+    perms = make_permutations(n_perm)
+    shingles = [sheet_shingles(s['parsed'], k) for s in sheets]
+    indexed = [i for i, sh in enumerate(shingles) if sh]
+    signatures = [minhash(shingles[i], perms) for i in indexed]
+    bands, rows = lsh_params(n_perm, threshold)
+    candidates = lsh_candidates(signatures, bands, rows)
+
+    pairs = []
+    for x, y in candidates:
+        i, j = indexed[x], indexed[y]
+        sim = jaccard(shingles[i], shingles[j])
+        if sim >= threshold:
+            estimate = sum(p == q for p, q in zip(signatures[x], signatures[y])) / n_perm
+            pairs.append((sim, estimate, i, j))
+    pairs.sort(key=lambda p: (-p[0], p[2], p[3]))
+    return pairs, len(candidates), (bands, rows)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. ALLINEAMENTO DELLE OPERAZIONI
+# ═══════════════════════════════════════════════════════════════════
+
+def flat_ops(parsed: dict) -> list:
+    """Operazioni dello sheet in ordine, con il numero di setup (1-based)."""
+    return [dict(o, setup=si + 1) for si, s in enumerate(parsed['setups']) for o in s['operations']]
+
+
+def align_ops(ops_a: list, ops_b: list) -> list:
+    """
+    Allinea due sequenze di operazioni sui token: [(tag, op_a, op_b)] con tag
+    '=' token identico, '~' operazione modificata, '-' solo in A, '+' solo in B.
+    """
+    ta, tb = [op_token(o) for o in ops_a], [op_token(o) for o in ops_b]
+    out = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, ta, tb, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            out.extend(('=', ops_a[i], ops_b[j]) for i, j in zip(range(i1, i2), range(j1, j2)))
+            continue
+        n = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        out.extend(('~', ops_a[i1 + d], ops_b[j1 + d]) for d in range(n))
+        out.extend(('-', ops_a[i], None) for i in range(i1 + n, i2))
+        out.extend(('+', None, ops_b[j]) for j in range(j1 + n, j2))
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 4. OUTPUT CONSOLE
+# ═══════════════════════════════════════════════════════════════════
+
+def _both(a, b) -> str:
+    return str(a) if a == b else f"{a}→{b}"
+
+
+def print_pairs(sheets: list, pairs: list, alignments: dict, n_candidates: int, lsh: tuple,
+                threshold: float, k: int, elapsed: float):
+    from multi_benchmark_cnc import fmt_time
+
+    W = 100
+    N = len(sheets)
+    print("\n" + "═" * W)
+    print(f"{'SIMILARITÀ DEI CICLI — SHEET QUASI DUPLICATI':^{W}}")
+    print(f"{N} sheet, shingle di {k} operazioni, soglia {threshold:.2f}".center(W))
+    print("═" * W)
+    print(f"\n  LSH {lsh[0]} bande × {lsh[1]} righe: {n_candidates} coppie candidate su "
+          f"{N * (N - 1) // 2} possibili, {len(pairs)} sopra soglia ({elapsed:.2f} s)")
+
+    if not pairs:
+        print("\n  Nessuna coppia sospetta.")
+        print("═" * W + "\n")
+        return
+
+    print(f"\n  {'#':>4}  {'Sheet A':<16} {'Sheet B':<16} {'Similarità':>10} {'MinHash':>8} "
+          f"{'Op. identiche':>14} {'Tempo A':>10} {'Tempo B':>10}")
+    print(f"  {'─' * 4}  {'─' * 16} {'─' * 16} {'─' * 10} {'─' * 8} {'─' * 14} {'─' * 10} {'─' * 10}")
+    for n, (sim, estimate, i, j) in enumerate(pairs, 1):
+        a, b = sheets[i], sheets[j]
+        same = sum(tag == '=' for tag, _, _ in alignments[i, j])
+        total = max(a['n_ops'], b['n_ops'])
+        print(f"  {n:>4}  {a['group'][:16]:<16} {b['group'][:16]:<16} {sim:>10.2f} {estimate:>8.2f} "
+              f"{f'{same}/{total}':>14} {fmt_time(a['cycle_time_s']):>10} {fmt_time(b['cycle_time_s']):>10}")
+    print("═" * W + "\n")
+
+
+def print_alignment(sheets: list, pair: tuple, alignment: list, n: int):
+    from multi_benchmark_cnc import fmt_time
+
+    W = 100
+    sim, _, i, j = pair
+    a, b = sheets[i], sheets[j]
+    print("─" * W)
+    print(f"  #{n}  {a['group']} ↔ {b['group']} — similarità {sim:.2f}")
+    print(f"       A: {a['label']}")
+    print(f"       B: {b['label']}")
+    print("─" * W)
+    print(f"\n       {'A':>7} {'B':>7}  {'Strategia':<20} {'T':<14} {'Product':<24} {'Tempo A':>9} {'Tempo B':>9}")
+    print(f"       {'─' * 7} {'─' * 7}  {'─' * 20} {'─' * 14} {'─' * 24} {'─' * 9} {'─' * 9}")
+    for tag, oa, ob in alignment:
+        ref_a = f"{oa['setup']}·{oa['op_num']}" if oa else ""
+        ref_b = f"{ob['setup']}·{ob['op_num']}" if ob else ""
+        o1, o2 = oa or ob, ob or oa
+        t_a = fmt_time(oa['cycle_time_s']) if oa else ""
+        t_b = fmt_time(ob['cycle_time_s']) if ob else ""
+        print(f"    {tag}  {ref_a:>7} {ref_b:>7}  {_both(o1['strategy'], o2['strategy'])[:20]:<20} "
+              f"{_both(o1['tool_t'], o2['tool_t'])[:14]:<14} {_both(o1['product'], o2['product'])[:24]:<24} "
+              f"{t_a:>9} {t_b:>9}")
+    print(f"\n  Legenda: = identica   ~ modificata   - solo in A   + solo in B   (setup·operazione)\n")
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 5. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def _sheet(parsed: dict, group: str, label: str) -> dict:
+    return {'parsed': parsed, 'group': group, 'label': label,
+            'n_ops': sum(len(s['operations']) for s in parsed['setups']),
+            'cycle_time_s': sum(s['cycle_time_s'] for s in parsed['setups'])}
+
+
+def load_sheets(args) -> list:
+    """Sheet parsati dai PDF indicati e/o dall'archivio --from-db."""
+    from multi_benchmark_cnc import (collect_pdfs, parse_pdf, pdf_data, extract_short_name,
+                                     dedupe_group_names, ingest_pdfs, PageTextCache)
+
+    sheets = []
+    if args.from_db:
+        from warehouse_cnc import connect, load_parsed
+        conn = connect(args.from_db)
+        try:
+            rows = conn.execute(
+                "SELECT f.id, (SELECT g.group_name FROM group_results g WHERE g.file_id = f.id "
+                "ORDER BY g.run_id DESC LIMIT 1) FROM files f ORDER BY f.id").fetchall()
+            for file_id, group in rows:
+                parsed = load_parsed(conn, file_id)
+                sheets.append(_sheet(parsed, group or extract_short_name(parsed['name']), parsed['path']))
+        finally:
+            conn.close()
+
+    pdfs = collect_pdfs(args.inputs) if args.inputs else []
+    slots = [None] * len(pdfs)
+
+    def on_parsed(i, pdf_path, parsed):
+        print(f"  Parsing {pdf_path.name} ... {sum(len(s['operations']) for s in parsed['setups'])} operazioni")
+        slots[i] = _sheet(parsed, extract_short_name(parsed['name'], Path(str(pdf_path)).stem), str(pdf_path))
+
+    if args.jobs > 1:
+        ingest_pdfs(pdfs, on_parsed, workers=args.jobs, prefetch=2 * args.jobs, page_cache_path=args.page_cache)
+    else:
+        page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+        for i, pdf in enumerate(pdfs):
+            on_parsed(i, pdf, parse_pdf(str(pdf), data=pdf_data(pdf), page_cache=page_cache))
+    sheets.extend(slots)
+    dedupe_group_names(sheets)
+    return sheets
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Cicli quasi duplicati (MinHash/LSH)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python similarity_cnc.py CASO_A/A_GRUPPI_SELEZIONATI/
+  python similarity_cnc.py ./consegne/ consegne_2024.zip --threshold 0.7 --show 5
+  python similarity_cnc.py --from-db results.sqlite --threshold 0.6
+  python similarity_cnc.py ./archivio/ --jobs 4 --page-cache pagine.sqlite
+        """)
+    parser.add_argument('inputs', nargs='*', help='File PDF, archivi zip/tar e/o cartelle')
+    parser.add_argument('--from-db', help='Usa i PDF archiviati da multi_benchmark_cnc.py --db')
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help='Similarità di Jaccard minima segnalata, 0–1 (default: 0.5)')
+    parser.add_argument('--shingle', type=int, default=3,
+                        help='Operazioni consecutive per shingle (default: 3)')
+    parser.add_argument('--perms', type=int, default=128, help='Permutazioni MinHash (default: 128)')
+    parser.add_argument('--show', type=int, default=3,
+                        help='Coppie più simili con allineamento delle operazioni (default: 3)')
+    parser.add_argument('--jobs', type=int, default=1, help='Processi worker per il parsing (default: 1)')
+    parser.add_argument('--page-cache', default=None, help='Cache SQLite del testo delle pagine')
+
+    args = parser.parse_args()
+    if not args.inputs and not args.from_db:
+        parser.error("indicare PDF, archivi o cartelle, oppure --from-db")
+    if args.from_db and not Path(args.from_db).exists():
+        sys.exit(f"Errore: database non trovato: {args.from_db}")
+    if not 0 < args.threshold <= 1:
+        sys.exit("Errore: --threshold deve essere compreso tra 0 e 1")
+    if args.shingle < 1 or args.perms < 1:
+        sys.exit("Errore: --shingle e --perms devono essere positivi")
+
+    sheets = load_sheets(args)
+    if len(sheets) < 2:
+        sys.exit("Errore: servono almeno 2 sheet da confrontare")
+
+    t0 = time.perf_counter()
+    pairs, n_candidates, lsh = find_similar(sheets, args.threshold, args.shingle, args.perms)
+    elapsed = time.perf_counter() - t0
+    alignments = {(i, j): align_ops(flat_ops(sheets[i]['parsed']), flat_ops(sheets[j]['parsed']))
+                  for _, _, i, j in pairs}
+    print_pairs(sheets, pairs, alignments, n_candidates, lsh, args.threshold, args.shingle, elapsed)
+    for n, (sim, estimate, i, j) in enumerate(pairs[:args.show], 1):
+        print_alignment(sheets, (sim, estimate, i, j), alignments[i, j], n)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════╗
+║         CNC OPERATION SHEET — ARCHIVIO STORICO SQLITE                ║
+║                                                                      ║
+║  Interroga l'archivio scritto da  multi_benchmark_cnc.py --db  e     ║
+║  ricalcola classifiche su qualsiasi sottoinsieme storico senza       ║
+║  riaprire i PDF (le operazioni parsate sono salvate nel database).   ║
+║                                                                      ║
+║  Uso:  python warehouse_cnc.py  runs   --db results.sqlite           ║
+║        python warehouse_cnc.py  groups --db results.sqlite           ║
+║        python warehouse_cnc.py  rank   --db results.sqlite [filtri]  ║
+║        python warehouse_cnc.py  libraries --db results.sqlite        ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    created_at  TEXT NOT NULL,
+    case_name   TEXT NOT NULL,
+    tool_life_s INTEGER NOT NULL,
+    n_groups    INTEGER NOT NULL,
+    argv        TEXT,
+    machine     TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id      INTEGER PRIMARY KEY,
+    sha256  TEXT NOT NULL UNIQUE,
+    path    TEXT,
+    name    TEXT
+);
+CREATE TABLE IF NOT EXISTS setups (
+    file_id      INTEGER NOT NULL REFERENCES files(id),
+    setup_idx    INTEGER NOT NULL,
+    program      TEXT,
+    cycle_time_s INTEGER,
+    n_operations INTEGER,
+    n_tools      INTEGER,
+    PRIMARY KEY (file_id, setup_idx)
+);
+CREATE TABLE IF NOT EXISTS operations (
+    file_id      INTEGER NOT NULL REFERENCES files(id),
+    setup_idx    INTEGER NOT NULL,
+    op_idx       INTEGER NOT NULL,
+    op_num       INTEGER,
+    op_total     INTEGER,
+    description  TEXT,
+    strategy     TEXT,
+    tool_t       TEXT,
+    product      TEXT,
+    cutting_dist REAL,
+    rapid_dist   REAL,
+    max_feedrate REAL,
+    cycle_time_s INTEGER,
+    PRIMARY KEY (file_id, setup_idx, op_idx)
+);
+CREATE TABLE IF NOT EXISTS group_results (
+    run_id     INTEGER NOT NULL REFERENCES runs(id),
+    file_id    INTEGER NOT NULL REFERENCES files(id),
+    group_name TEXT NOT NULL,
+    position   INTEGER NOT NULL,
+    total      REAL NOT NULL,
+    metrics    TEXT NOT NULL,
+    PRIMARY KEY (run_id, group_name)
+);
+CREATE TABLE IF NOT EXISTS category_scores (
+    run_id   INTEGER NOT NULL REFERENCES runs(id),
+    file_id  INTEGER NOT NULL REFERENCES files(id),
+    category TEXT NOT NULL,
+    score    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS driver_scores (
+    run_id   INTEGER NOT NULL REFERENCES runs(id),
+    file_id  INTEGER NOT NULL REFERENCES files(id),
+    category TEXT NOT NULL,
+    driver   TEXT NOT NULL,
+    raw      REAL,
+    score    REAL NOT NULL,
+    display  TEXT
+);
+CREATE TABLE IF NOT EXISTS library_tools (
+    run_id      INTEGER NOT NULL REFERENCES runs(id),
+    product     TEXT NOT NULL,
+    library     TEXT NOT NULL,
+    type        TEXT,
+    diameter    REAL,
+    description TEXT,
+    PRIMARY KEY (run_id, product)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_case ON runs(case_name);
+CREATE INDEX IF NOT EXISTS idx_group_results_group ON group_results(group_name);
+CREATE INDEX IF NOT EXISTS idx_group_results_file ON group_results(file_id);
+CREATE INDEX IF NOT EXISTS idx_category_scores_run ON category_scores(run_id, file_id);
+CREATE INDEX IF NOT EXISTS idx_driver_scores_run ON driver_scores(run_id, file_id);
+CREATE INDEX IF NOT EXISTS idx_library_tools_library ON library_tools(library);
+"""
+
+OP_FIELDS = ('op_num', 'op_total', 'description', 'strategy', 'tool_t', 'product',
+             'cutting_dist', 'rapid_dist', 'max_feedrate', 'cycle_time_s')
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 1. SCRITTURA (usata da multi_benchmark_cnc.py --db)
+# ═══════════════════════════════════════════════════════════════════
+
+def connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    # Archivi creati prima della colonna runs.machine
+    if 'machine' not in {row[1] for row in conn.execute("PRAGMA table_info(runs)")}:
+        conn.execute("ALTER TABLE runs ADD COLUMN machine TEXT")
+    return conn
+
+
+def file_sha256(parsed: dict) -> str:
+    """Hash del PDF di origine (calcolato in parse_pdf o, in mancanza, rileggendo il file)."""
+    if parsed.get('sha256'):
+        return parsed['sha256']
+    h = hashlib.sha256()
+    with open(parsed['path'], 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _store_file(conn, parsed: dict) -> int:
+    """Registra il PDF e le sue operazioni una sola volta per contenuto (sha256)."""
+    sha = file_sha256(parsed)
+    row = conn.execute("SELECT id FROM files WHERE sha256 = ?", (sha,)).fetchone()
+    if row:
+        return row[0]
+    cur = conn.execute("INSERT INTO files (sha256, path, name) VALUES (?, ?, ?)",
+                       (sha, str(parsed.get('path', '')), parsed['name']))
+    file_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO setups VALUES (?, ?, ?, ?, ?, ?)",
+        [(file_id, si, s['program'], s['cycle_time_s'], s['n_operations'], s['n_tools'])
+         for si, s in enumerate(parsed['setups'])])
+    conn.executemany(
+        f"INSERT INTO operations VALUES (?, ?, ?, {', '.join('?' * len(OP_FIELDS))})",
+        [(file_id, si, oi, *(o[f] for f in OP_FIELDS))
+         for si, s in enumerate(parsed['setups'])
+         for oi, o in enumerate(s['operations'])])
+    return file_id
+
+
+def save_run(db_path: str, case_name: str, tool_life_s: int, parsed_list: list,
+             metrics_list: list, drivers: list, cat_scores: list, totals: list,
+             argv: list = None, machine: str = None, libraries: dict = None) -> int:
+    """
+    Salva un run completo in un'unica transazione: operazioni parsate (una volta per
+    file), metriche di compute_metrics(), punteggi per driver e categoria, posizione.
+    parsed_list e metrics_list sono allineati (stesso gruppo allo stesso indice).
+    machine è il profilo di --machine: metriche e punteggi usano i tempi ricalcolati,
+    le operazioni archiviate restano quelle dello sheet. libraries sono le librerie
+    utensili del run (load_libraries() di magazine_cnc.py, da --library).
+    Restituisce l'id del run.
+    """
+    from multi_benchmark_cnc import metrics_json
+
+    N = len(metrics_list)
+    ranking = sorted(range(N), key=lambda i: totals[i], reverse=True)
+    position = {idx: pos for pos, idx in enumerate(ranking, 1)}
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO runs (created_at, case_name, tool_life_s, n_groups, argv, machine) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), case_name, tool_life_s, N,
+                 json.dumps(argv) if argv else None, machine))
+            run_id = cur.lastrowid
+            file_ids = [_store_file(conn, p) for p in parsed_list]
+            conn.executemany(
+                "INSERT INTO group_results VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, file_ids[i], m['group'], position[i], totals[i], metrics_json(m))
+                 for i, m in enumerate(metrics_list)])
+            conn.executemany(
+                "INSERT INTO category_scores VALUES (?, ?, ?, ?)",
+                [(run_id, file_ids[i], cat, score)
+                 for i in range(N) for cat, score in cat_scores[i].items()])
+            conn.executemany(
+                "INSERT INTO driver_scores VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, file_ids[i], cat, name, raws[i], scores[i], displays[i])
+                 for cat, name, raws, scores, displays in drivers for i in range(N)])
+            conn.executemany(
+                "INSERT INTO library_tools VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, product, t['library'], t['type'], t['diameter'], t['description'])
+                 for product, t in (libraries or {}).items()])
+    finally:
+        conn.close()
+    return run_id
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 2. LETTURA E RICALCOLO
+# ═══════════════════════════════════════════════════════════════════
+
+def load_parsed(conn, file_id: int) -> dict:
+    """Ricostruisce l'output di parse_pdf() dalle tabelle setups/operations."""
+    path, name, sha = conn.execute(
+        "SELECT path, name, sha256 FROM files WHERE id = ?", (file_id,)).fetchone()
+    setups = []
+    for si, program, ct, n_ops, n_tools in conn.execute(
+            "SELECT setup_idx, program, cycle_time_s, n_operations, n_tools FROM setups "
+            "WHERE file_id = ? ORDER BY setup_idx", (file_id,)):
+        ops = [dict(zip(OP_FIELDS, row)) for row in conn.execute(
+            f"SELECT {', '.join(OP_FIELDS)} FROM operations WHERE file_id = ? AND setup_idx = ? "
+            "ORDER BY op_idx", (file_id, si))]
+        setups.append({'program': program, 'cycle_time_s': ct, 'n_operations': n_ops,
+                       'n_tools': n_tools, 'operations': ops})
+    return {'name': name, 'setups': setups, 'path': path, 'sha256': sha}
+
+
+def select_files(conn, cases=None, runs=None, groups=None, latest=False) -> list:
+    """
+    Selezione storica: (file_id, group_name) dei gruppi che soddisfano i filtri.
+    Ogni PDF compare una sola volta; con latest=True resta solo il run più recente
+    di ciascun gruppo.
+    """
+    where, params = [], []
+    for col, values in (('r.case_name', cases), ('r.id', runs), ('g.group_name', groups)):
+        if values:
+            where.append(f"{col} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    sql = ("SELECT g.file_id, g.group_name, r.id FROM group_results g JOIN runs r ON r.id = g.run_id"
+           + (" WHERE " + " AND ".join(where) if where else "")
+           + " ORDER BY r.id DESC, g.position")
+    selected, seen_files, seen_groups = [], set(), set()
+    for file_id, group, _ in conn.execute(sql, params):
+        if file_id in seen_files or (latest and group in seen_groups):
+            continue
+        seen_files.add(file_id)
+        seen_groups.add(group)
+        selected.append((file_id, group))
+    return selected
+
+
+def rank_history(db_path: str, tool_life_s: int, **filters):
+    """Classifica su un sottoinsieme storico, ricalcolata dalle operazioni salvate."""
+    from multi_benchmark_cnc import compute_metrics, compute_all_scores, dedupe_group_names
+
+    conn = connect(db_path)
+    try:
+        metrics_list = []
+        for file_id, group in select_files(conn, **filters):
+            m = compute_metrics(load_parsed(conn, file_id), tool_life_s)
+            if m is not None:
+                m['group'] = group
+                metrics_list.append(m)
+    finally:
+        conn.close()
+    if len(metrics_list) < 2:
+        sys.exit(f"Errore: servono almeno 2 gruppi nella selezione. Trovati: {len(metrics_list)}")
+    dedupe_group_names(metrics_list)
+    drivers, cat_scores, totals = compute_all_scores(metrics_list)
+    return metrics_list, drivers, cat_scores, totals
+
+
+# ═══════════════════════════════════════════════════════════════════
+# 3. MAIN
+# ═══════════════════════════════════════════════════════════════════
+
+def cmd_runs(args):
+    conn = connect(args.db)
+    rows = conn.execute(
+        "SELECT id, created_at, case_name, n_groups, tool_life_s, machine FROM runs"
+        + (" WHERE case_name = ?" if args.case else "") + " ORDER BY id",
+        (args.case,) if args.case else ()).fetchall()
+    conn.close()
+    print(f"\n  {'Run':>5}  {'Data':<19}  {'Caso':<28} {'Gruppi':>6}  {'Vita':>7}  {'Macchina':<12}")
+    print(f"  {'─' * 5}  {'─' * 19}  {'─' * 28} {'─' * 6}  {'─' * 7}  {'─' * 12}")
+    for run_id, created, case, n, tl, machine in rows:
+        print(f"  {run_id:>5}  {created:<19}  {case:<28} {n:>6}  {tl // 60:>3} min  {machine or '—':<12}")
+    print()
+
+
+def cmd_groups(args):
+    conn = connect(args.db)
+    where, params = [], []
+    if args.case:
+        where.append("r.case_name = ?"); params.append(args.case)
+    if args.group:
+        where.append(f"g.group_name IN ({', '.join('?' * len(args.group))})"); params.extend(args.group)
+    rows = conn.execute(
+        "SELECT g.group_name, r.id, r.created_at, r.case_name, g.position, r.n_groups, g.total "
+        "FROM group_results g JOIN runs r ON r.id = g.run_id"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY g.group_name, r.id", params).fetchall()
+    conn.close()
+    print(f"\n  {'Gruppo':<12} {'Run':>5}  {'Data':<19}  {'Caso':<28} {'Pos.':>7}  {'Score':>6}")
+    print(f"  {'─' * 12} {'─' * 5}  {'─' * 19}  {'─' * 28} {'─' * 7}  {'─' * 6}")
+    for group, run_id, created, case, pos, n, total in rows:
+        print(f"  {group:<12} {run_id:>5}  {created:<19}  {case:<28} {f'{pos}/{n}':>7}  {total:>6.1f}")
+    print()
+
+
+def cmd_libraries(args):
+    conn = connect(args.db)
+    where, params = [], []
+    if args.case:
+        where.append("r.case_name = ?"); params.append(args.case)
+    if args.library:
+        where.append(f"l.library IN ({', '.join('?' * len(args.library))})"); params.extend(args.library)
+    rows = conn.execute(
+        "SELECT l.library, r.id, r.created_at, r.case_name, COUNT(*), "
+        "SUM(l.product IN (SELECT o.product FROM operations o JOIN group_results g ON g.file_id = o.file_id "
+        "WHERE g.run_id = r.id)) "
+        "FROM library_tools l JOIN runs r ON r.id = l.run_id"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " GROUP BY l.library, r.id ORDER BY l.library, r.id", params).fetchall()
+    conn.close()
+    print(f"\n  {'Libreria':<28} {'Run':>5}  {'Data':<19}  {'Caso':<20} {'Utensili':>8}  {'Usati':>5}")
+    print(f"  {'─' * 28} {'─' * 5}  {'─' * 19}  {'─' * 20} {'─' * 8}  {'─' * 5}")
+    for library, run_id, created, case, n, used in rows:
+        print(f"  {library[:28]:<28} {run_id:>5}  {created:<19}  {case[:20]:<20} {n:>8}  {used:>5}")
+    print()
+
+
+def cmd_rank(args):
+    from multi_benchmark_cnc import print_multi_report, export_multi_xlsx
+
+    result = rank_history(args.db, args.tool_life * 60, cases=args.case, runs=args.run,
+                          groups=args.group, latest=args.latest)
+    print_multi_report(*result)
+    if args.xlsx:
+        export_multi_xlsx(*result, args.xlsx)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CNC Operation Sheet — Archivio storico SQLite",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Esempi:
+  python warehouse_cnc.py runs   --db results.sqlite
+  python warehouse_cnc.py groups --db results.sqlite --case CASO_A
+  python warehouse_cnc.py rank   --db results.sqlite --case CASO_A --case CASO_B --latest
+  python warehouse_cnc.py rank   --db results.sqlite --run 3 --run 7 --tool-life 15 --xlsx storico.xlsx
+  python warehouse_cnc.py libraries --db results.sqlite --case CASO_A
+        """)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_runs = sub.add_parser('runs', help='Elenco dei run archiviati')
+    p_groups = sub.add_parser('groups', help='Storico di posizioni e punteggi per gruppo')
+    p_rank = sub.add_parser('rank', help='Classifica su un sottoinsieme storico (senza PDF)')
+    p_libs = sub.add_parser('libraries', help='Librerie utensili archiviate con i run (--library)')
+    for p in (p_runs, p_groups, p_rank, p_libs):
+        p.add_argument('--db', required=True, help='File SQLite scritto da multi_benchmark_cnc.py --db')
+    p_runs.add_argument('--case', help='Solo i run di questo caso')
+    p_groups.add_argument('--case', help='Solo i run di questo caso')
+    p_groups.add_argument('--group', action='append', help='Solo questi gruppi (ripetibile)')
+    p_rank.add_argument('--case', action='append', help='Filtra per caso (ripetibile)')
+    p_rank.add_argument('--run', type=int, action='append', help='Filtra per id run (ripetibile)')
+    p_rank.add_argument('--group', action='append', help='Filtra per gruppo (ripetibile)')
+    p_rank.add_argument('--latest', action='store_true',
+                        help='Per ogni gruppo usa solo il run più recente')
+    p_rank.add_argument('--tool-life', type=int, default=20,
+                        help='Soglia vita utile utensile in minuti (default: 20)')
+    p_rank.add_argument('--xlsx', help='Esporta risultati in file Excel', default=None)
+    p_libs.add_argument('--case', help='Solo i run di questo caso')
+    p_libs.add_argument('--library', action='append', help='Solo queste librerie (ripetibile)')
+
+    args = parser.parse_args()
+    if not Path(args.db).exists():
+        sys.exit(f"Errore: database non trovato: {args.db}")
+    {'runs': cmd_runs, 'groups': cmd_groups, 'rank': cmd_rank,
+     'libraries': cmd_libraries}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()